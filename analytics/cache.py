@@ -0,0 +1,87 @@
+"""
+Short-lived caching for dashboard widgets.
+
+Entries are keyed by widget, user scope (admin vs. one commercial user) and the
+dashboard filter params, and stamped with a global version that is bumped
+whenever prospect data changes (see ``analytics.rollups``). A bump makes every
+older entry unreachable, so the TTL only bounds staleness for data that changes
+outside the ORM.
+
+The version lives in the cache itself, so invalidation only reaches processes
+sharing that cache. With the default per-process ``LocMemCache``, a write
+handled by one web process (or by ``run_background_jobs``) leaves the others
+serving stale widgets for up to ``ANALYTICS_CACHE_TTL``; production needs a
+shared backend (``check --deploy`` warns, see ``analytics.checks``).
+
+Stampede protection: the first request for a missing key takes a short lock
+with ``cache.add`` and computes the value; concurrent requests for the same key
+wait for it instead of running the same aggregation in parallel.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'analytics:version'
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+# GET params that change dashboard results; anything else (cache busters, etc.) is ignored
+FILTER_PARAMS = ('date_from', 'date_to', 'country', 'owner_id')
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted version never resurrects old entries
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached dashboard widget."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def cache_key(widget, user, params, versioned=True):
+    scope = 'all' if user.is_admin() else f'user:{user.pk}'
+    filters = '&'.join(f'{name}={params.get(name)}' for name in FILTER_PARAMS if params.get(name))
+    digest = hashlib.md5(filters.encode('utf-8')).hexdigest()
+    version = f'v{get_version()}' if versioned else 'unversioned'
+    return f'analytics:{widget}:{version}:{scope}:{digest}'
+
+
+def cached_widget(widget, user, params, compute, versioned=True, timeout=None):
+    """Return ``compute()`` for this widget/scope/filters, cached for ``ANALYTICS_CACHE_TTL`` seconds.
+
+    ``versioned=False`` stores an entry that survives version bumps (for
+    closed historical periods) for ``timeout`` seconds instead.
+    """
+    key = cache_key(widget, user, params, versioned)
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # Someone else is computing this entry; wait briefly for their result
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return compute()
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout or settings.ANALYTICS_CACHE_TTL)
+    finally:
+        cache.delete(lock_key)
+    return value
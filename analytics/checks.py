@@ -0,0 +1,23 @@
+"""
+System checks for the analytics app.
+"""
+from django.conf import settings
+from django.core import checks
+
+LOCAL_MEMORY_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Widget invalidation needs a cache shared by every web and worker process."""
+    if settings.CACHES['default']['BACKEND'] != LOCAL_MEMORY_CACHE:
+        return []
+    return [checks.Warning(
+        'The default cache is per-process local memory.',
+        hint=(
+            'Dashboard widgets are invalidated by bumping a version in the cache; other web '
+            'processes and run_background_jobs never see the bump and serve stale widgets for up '
+            'to ANALYTICS_CACHE_TTL seconds. Set CACHE_BACKEND/CACHE_LOCATION to Redis or Memcached.'
+        ),
+        id='analytics.W001',
+    )]
@@ -0,0 +1,36 @@
+"""
+Rebuild analytics rollups from the Prospect table.
+
+Usage:
+  python manage.py backfill_rollups                    # every day with prospects
+  python manage.py backfill_rollups --since 2026-01-01
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.models import Prospect
+from analytics.rollups import rebuild_days
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ProspectDailyRollup rows (run once after deploying rollups, or to repair them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-days', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        days = Prospect.objects.order_by().dates('created_at', 'day')
+        if options['since']:
+            try:
+                days = days.filter(created_at__date__gte=date.fromisoformat(options['since']))
+            except ValueError:
+                raise CommandError('--since must be a YYYY-MM-DD date')
+
+        days = list(days)
+        batch_days = max(1, options['batch_days'])
+        for start in range(0, len(days), batch_days):
+            rebuild_days(days[start:start + batch_days])
+            self.stdout.write(f'Rebuilt {min(start + batch_days, len(days))}/{len(days)} days')
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt for {len(days)} days'))
@@ -0,0 +1,164 @@
+"""
+Benchmark the top-leads and stale-leads queries.
+
+Usage:
+  python manage.py benchmark_leads                    # 1M prospects
+  python manage.py benchmark_leads --rows 100000 --repeat 100
+  python manage.py benchmark_leads --rows 0 --keep    # reuse prospects kept by an earlier run
+
+Bulk-inserts synthetic prospects spread over several owners, then times
+``analytics.services.top_leads`` and ``stale_leads`` for the admin scope (all
+prospects) and for a single owner, next to the previous single-query stale-lead
+form. Reports p50/p95/max in milliseconds and the query plans, written as JSON
+so runs can be compared across releases.
+
+Run it against a scratch database: benchmark rows use the ``@bench.example.com``
+domain and are deleted afterwards unless --keep is given.
+"""
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import User
+from crm.models import Prospect
+from analytics.services import top_leads, stale_leads, STALE_AFTER_DAYS, LEADS_LIMIT
+
+BENCH_DOMAIN = 'bench.example.com'
+INSERT_BATCH_SIZE = 5000
+
+
+def legacy_stale_leads(prospects):
+    """The original ``IS NULL OR < cutoff`` form, kept for comparison."""
+    cutoff = timezone.now() - timedelta(days=STALE_AFTER_DAYS)
+    return list(prospects.filter(
+        Q(last_interaction_at__isnull=True) | Q(last_interaction_at__lt=cutoff)
+    ).values('id', 'name', 'email', 'country', 'score').order_by('-created_at')[:LEADS_LIMIT])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark top/stale lead queries on a large prospect table and store the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Prospects to insert (0 to reuse existing benchmark rows)')
+        parser.add_argument('--owners', type=int, default=20, help='Number of benchmark owners')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per query')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+        parser.add_argument('--output', help='JSON output path (default: benchmarks/leads-<timestamp>.json)')
+        parser.add_argument('--keep', action='store_true', help='Keep benchmark prospects and owners instead of deleting them')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        owners = self._owners(options['owners'])
+        try:
+            if options['rows']:
+                self.stdout.write(self.style.NOTICE(f'Inserting {options["rows"]} prospects...'))
+                self._insert(options['rows'], owners)
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('ANALYZE')
+
+            owner_prospects = Prospect.objects.filter(owner=owners[0])
+            cases = {
+                'top_leads_all': lambda: top_leads(Prospect.objects.all()),
+                'top_leads_owner': lambda: top_leads(owner_prospects),
+                'stale_leads_all': lambda: stale_leads(Prospect.objects.all()),
+                'stale_leads_owner': lambda: stale_leads(owner_prospects),
+                'legacy_stale_leads_all': lambda: legacy_stale_leads(Prospect.objects.all()),
+                'legacy_stale_leads_owner': lambda: legacy_stale_leads(owner_prospects),
+            }
+            results = {}
+            for name, run in cases.items():
+                results[name] = self._time(run, options['repeat'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"{name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms, max {results[name]['max_ms']} ms"
+                ))
+
+            plans = {
+                'top_leads_owner': owner_prospects.filter(priority_level=Prospect.HIGH).order_by('-score')[:LEADS_LIMIT].explain(),
+                'stale_leads_owner_uncontacted': owner_prospects.filter(last_interaction_at__isnull=True).order_by('-created_at')[:LEADS_LIMIT].explain(),
+                'stale_leads_owner_lapsed': owner_prospects.filter(last_interaction_at__lt=timezone.now()).order_by('-created_at')[:LEADS_LIMIT].explain(),
+            }
+            prospect_count = Prospect.objects.count()
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+        output = Path(options['output'] or settings.BASE_DIR / 'benchmarks' / f'leads-{timezone.now():%Y%m%d-%H%M%S}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'benchmark': 'leads',
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'prospects': prospect_count,
+            'owners': len(owners),
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'results': results,
+            'plans': plans,
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def _owners(self, count):
+        owners = []
+        for i in range(count):
+            email = f'owner{i}@{BENCH_DOMAIN}'
+            owner, _ = User.objects.get_or_create(email=email, defaults={'username': email, 'role': User.COMMERCIAL})
+            owners.append(owner)
+        return owners
+
+    def _insert(self, rows, owners):
+        """Bulk-insert prospects: 20% high priority, 40% never contacted, 30% contacted over 30 days ago."""
+        now = timezone.now()
+        countries = list(settings.COUNTRIES.keys())
+        start = Prospect.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').count()
+        for offset in range(0, rows, INSERT_BATCH_SIZE):
+            batch = []
+            for i in range(start + offset, start + min(offset + INSERT_BATCH_SIZE, rows)):
+                contact = random.random()
+                if contact < 0.4:
+                    last_interaction_at = None
+                elif contact < 0.7:
+                    last_interaction_at = now - timedelta(days=random.randint(31, 365))
+                else:
+                    last_interaction_at = now - timedelta(days=random.randint(0, 29))
+                batch.append(Prospect(
+                    name=f'Bench School {i}',
+                    email=f'school{i}@{BENCH_DOMAIN}',
+                    country=random.choice(countries),
+                    owner=random.choice(owners),
+                    score=random.randint(0, 100),
+                    priority_level=Prospect.HIGH if random.random() < 0.2 else Prospect.LOW,
+                    last_interaction_at=last_interaction_at,
+                ))
+            Prospect.objects.bulk_create(batch)
+
+    def _time(self, run, repeat):
+        run()  # warm up caches
+        timings = []
+        for _i in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'max_ms': round(timings[-1], 2),
+        }
+
+    def _cleanup(self):
+        # Benchmark prospects have no related rows; a raw delete skips per-row signals
+        prospects = Prospect.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        deleted = prospects._raw_delete(prospects.db)
+        User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+        if deleted:
+            self.stdout.write(self.style.WARNING(f'Removed {deleted} benchmark prospects'))
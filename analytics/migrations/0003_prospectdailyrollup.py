@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_rename_analytics_dashboardview_user_idx_analytics_d_user_id_4b4e1d_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProspectDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('country', models.CharField(max_length=50, verbose_name='country')),
+                ('stage', models.CharField(max_length=20, verbose_name='stage')),
+                ('priority_level', models.CharField(max_length=10, verbose_name='priority level')),
+                ('score_bucket', models.PositiveSmallIntegerField(verbose_name='score bucket')),
+                ('prospects', models.PositiveIntegerField(default=0, verbose_name='prospects')),
+                ('responded', models.PositiveIntegerField(default=0, help_text='Prospects with at least one interaction', verbose_name='responded')),
+                ('score_total', models.PositiveIntegerField(default=0, verbose_name='score total')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='analytics_p_day_841706_idx'), models.Index(fields=['owner', 'day'], name='analytics_p_owner_i_b26713_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_prospectdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dashboardview',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    """Fold rows sharing a key (left by concurrent day rebuilds) into one."""
+    Rollup = apps.get_model('analytics', 'ProspectDailyRollup')
+    key = ('day', 'owner_id', 'country', 'stage', 'priority_level', 'score_bucket')
+    duplicates = Rollup.objects.values(*key).annotate(rows=models.Count('id')).filter(rows__gt=1).order_by()
+    for values in duplicates:
+        values.pop('rows')
+        rows = list(Rollup.objects.filter(**values).order_by('pk'))
+        keep = rows[0]
+        for row in rows[1:]:
+            keep.prospects += row.prospects
+            keep.responded += row.responded
+            keep.score_total += row.score_total
+        Rollup.objects.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+        keep.save(update_fields=['prospects', 'responded', 'score_total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_dashboard_view_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRollupDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='day')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='prospectdailyrollup',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='prospectdailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', False)), fields=('day', 'owner', 'country', 'stage', 'priority_level', 'score_bucket'), name='rollup_unique_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='prospectdailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('day', 'country', 'stage', 'priority_level', 'score_bucket'), name='rollup_unique_key_no_owner'),
+        ),
+    ]
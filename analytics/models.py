@@ -1,9 +1,10 @@
 """
-Analytics models - mostly for tracking dashboard usage.
+Analytics models - dashboard usage tracking and pre-aggregated rollups.
 """
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 
 class DashboardView(models.Model):
@@ -14,7 +15,8 @@ class DashboardView(models.Model):
         on_delete=models.CASCADE,
         related_name='dashboard_views'
     )
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Set when the view is recorded, not when the buffered row is inserted
+    viewed_at = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     
     class Meta:
@@ -25,3 +27,72 @@ class DashboardView(models.Model):
     
     def __str__(self):
         return f"{self.user.email} viewed dashboard at {self.viewed_at}"
+
+
+class ProspectDailyRollup(models.Model):
+    """Prospect counts per creation day and current owner/country/stage/priority/score bucket.
+
+    Prospect and interaction saves/deletes adjust the counters of the affected
+    rows in place; bulk writes mark their days in ``PendingRollupDay`` for the
+    background worker to rebuild. See ``analytics.rollups``.
+    """
+    
+    # Score buckets match the dashboard score distribution: 0-20, 20-40, ... 80-100
+    SCORE_BUCKET_SIZE = 20
+    SCORE_BUCKETS = 5
+    
+    day = models.DateField(_('day'))
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        # Not SET_NULL: the rows would collide with existing ownerless ones.
+        # Deleting a user marks their prospects' days for a rebuild instead.
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    country = models.CharField(_('country'), max_length=50)
+    stage = models.CharField(_('stage'), max_length=20)
+    priority_level = models.CharField(_('priority level'), max_length=10)
+    score_bucket = models.PositiveSmallIntegerField(_('score bucket'))
+    prospects = models.PositiveIntegerField(_('prospects'), default=0)
+    responded = models.PositiveIntegerField(
+        _('responded'),
+        default=0,
+        help_text=_('Prospects with at least one interaction')
+    )
+    score_total = models.PositiveIntegerField(_('score total'), default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['day']),
+            models.Index(fields=['owner', 'day']),
+        ]
+        constraints = [
+            # One row per key, so concurrent increments land on the same row.
+            # NULLs never collide in a unique index, hence a separate ownerless constraint.
+            models.UniqueConstraint(
+                fields=['day', 'owner', 'country', 'stage', 'priority_level', 'score_bucket'],
+                condition=models.Q(owner__isnull=False),
+                name='rollup_unique_key',
+            ),
+            models.UniqueConstraint(
+                fields=['day', 'country', 'stage', 'priority_level', 'score_bucket'],
+                condition=models.Q(owner__isnull=True),
+                name='rollup_unique_key_no_owner',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.country}/{self.stage}: {self.prospects}"
+
+
+class PendingRollupDay(models.Model):
+    """A day whose rollup rows must be rebuilt by the background worker (after a bulk write)."""
+    
+    day = models.DateField(_('day'), unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return str(self.day)
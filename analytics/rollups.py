@@ -0,0 +1,265 @@
+"""
+Maintenance of ``ProspectDailyRollup``.
+
+A rollup row is keyed by the prospect's creation day and its current owner,
+country, stage, priority and score bucket. Two paths keep the rows current:
+
+- ``save()``/``delete()`` of a prospect or an interaction (see
+  ``analytics.signals``) apply per-key deltas in the same transaction: the
+  prospect's contribution moves from the row of its old key to the row of its
+  new one with ``F()`` increments. The old key comes from a snapshot taken when
+  the prospect was loaded, so a save that leaves the key and score alone costs
+  no queries.
+- ``bulk_create``, ``bulk_update`` and ``QuerySet.update`` skip signals, so those
+  code paths call ``schedule_rollup_refresh`` themselves. It records the days
+  in ``PendingRollupDay``; the background worker rebuilds them with
+  ``refresh_pending_days``, one GROUP BY per batch of days however many writes
+  touched them. Deltas for a day waiting for its rebuild are skipped.
+
+A unique constraint on the key makes concurrent increments land on one row.
+Every prospect save or delete also bumps the dashboard cache version on commit,
+since cached widgets show fields outside the key (names, last interaction).
+"""
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Sum, Value, When
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from crm.models import Interaction, Prospect
+from .cache import bump_version
+from .models import PendingRollupDay, ProspectDailyRollup
+
+# Prospect fields the rollup key and counters are derived from
+STATE_FIELDS = ('created_at', 'owner_id', 'country', 'stage', 'priority_level', 'score')
+KEY_FIELDS = ('day', 'owner_id', 'country', 'stage', 'priority_level', 'score_bucket')
+# Days rebuilt per transaction, and per ``refresh_pending_days`` call
+REFRESH_BATCH_DAYS = 31
+REFRESH_MAX_DAYS = 366
+
+_pending = threading.local()
+
+
+def score_bucket_expression(field='score'):
+    """SQL expression mapping a score to its ``ProspectDailyRollup`` bucket index."""
+    size = ProspectDailyRollup.SCORE_BUCKET_SIZE
+    last = ProspectDailyRollup.SCORE_BUCKETS - 1
+    return Case(
+        *[When(**{f'{field}__lt': size * (bucket + 1)}, then=Value(bucket)) for bucket in range(last)],
+        default=Value(last),
+        output_field=IntegerField(),
+    )
+
+
+def score_bucket(score):
+    """Python twin of ``score_bucket_expression``."""
+    return min(max(score or 0, 0) // ProspectDailyRollup.SCORE_BUCKET_SIZE, ProspectDailyRollup.SCORE_BUCKETS - 1)
+
+
+def rebuild_days(days):
+    """Recompute the rollup rows for the given dates from the Prospect table.
+
+    Used by ``backfill_rollups`` and ``refresh_pending_days``; other writers
+    apply deltas instead.
+    """
+    days = set(days)
+    if not days:
+        return
+    rows = (
+        Prospect.objects.filter(created_at__date__in=days)
+        .annotate(day=TruncDate('created_at'), score_bucket=score_bucket_expression())
+        .order_by()
+        .values('day', 'owner_id', 'country', 'stage', 'priority_level', 'score_bucket')
+        .annotate(
+            prospect_count=Count('id'),
+            responded=Count('id', filter=Exists(Interaction.objects.filter(prospect=OuterRef('pk')))),
+            score_total=Sum('score'),
+        )
+    )
+    with transaction.atomic():
+        ProspectDailyRollup.objects.filter(day__in=days).delete()
+        ProspectDailyRollup.objects.bulk_create([
+            ProspectDailyRollup(
+                day=row['day'],
+                owner_id=row['owner_id'],
+                country=row['country'],
+                stage=row['stage'],
+                priority_level=row['priority_level'],
+                score_bucket=row['score_bucket'],
+                prospects=row['prospect_count'],
+                responded=row['responded'],
+                score_total=max(row['score_total'] or 0, 0),
+            )
+            for row in rows
+        ])
+
+
+def schedule_rollup_refresh(days):
+    """Mark days for a rebuild by the background worker (after bulk writes that skip signals)."""
+    days = {day for day in days if day is not None}
+    if days:
+        PendingRollupDay.objects.bulk_create([PendingRollupDay(day=day) for day in days], ignore_conflicts=True)
+
+
+def schedule_prospect_refresh(queryset):
+    """Mark the creation days of every prospect in ``queryset`` for a rebuild (call before ``update()``)."""
+    schedule_rollup_refresh(queryset.order_by().dates('created_at', 'day'))
+
+
+def refresh_pending_days(max_days=REFRESH_MAX_DAYS, batch_days=REFRESH_BATCH_DAYS):
+    """Rebuild days marked by ``schedule_rollup_refresh``. Returns the number of days rebuilt.
+
+    Each batch is claimed with ``select_for_update(skip_locked=True)`` and
+    unmarked before its rebuild, so concurrent workers never rebuild the same
+    day, and a bulk write committing meanwhile marks the day again.
+    """
+    rebuilt = 0
+    while rebuilt < max_days:
+        with transaction.atomic():
+            days = list(
+                PendingRollupDay.objects.select_for_update(skip_locked=True)
+                .order_by('day').values_list('day', flat=True)[:min(batch_days, max_days - rebuilt)]
+            )
+            if not days:
+                break
+            PendingRollupDay.objects.filter(day__in=days).delete()
+            rebuild_days(days)
+        rebuilt += len(days)
+    if rebuilt:
+        bump_version()
+    return rebuilt
+
+
+def prospect_day(prospect):
+    return timezone.localdate(prospect.created_at) if prospect.created_at else None
+
+
+def remember_state(prospect):
+    """Snapshot the rollup fields of a prospect loaded from the database (``post_init``).
+
+    Left empty for new instances and for instances loaded with some of those
+    fields deferred.
+    """
+    values = prospect.__dict__
+    if prospect.pk is None or any(field not in values for field in STATE_FIELDS):
+        prospect._rollup_state = None
+    else:
+        prospect._rollup_state = {field: values[field] for field in STATE_FIELDS}
+
+
+def _state_key(state):
+    return (
+        timezone.localdate(state['created_at']), state['owner_id'], state['country'],
+        state['stage'], state['priority_level'], score_bucket(state['score']),
+    )
+
+
+def _has_interactions(prospect_id):
+    return Interaction.objects.filter(prospect_id=prospect_id).exists()
+
+
+def _add(deltas, key, prospects, responded, score_total):
+    current = deltas.get(key, (0, 0, 0))
+    deltas[key] = (current[0] + prospects, current[1] + responded, current[2] + score_total)
+
+
+def prospect_saved(prospect, created, update_fields=None):
+    """Move the prospect's contribution from its previous rollup key to its current one."""
+    old = getattr(prospect, '_rollup_state', None)
+    # Widgets such as top_leads and stale_leads show fields outside the rollup key
+    schedule_bump()
+    if not created and old is None:
+        # No snapshot of what the row looked like before (e.g. loaded with ``only()``)
+        schedule_rollup_refresh([prospect_day(prospect)])
+        return
+
+    new = {}
+    for field in STATE_FIELDS:
+        name = 'owner' if field == 'owner_id' else field
+        if old is None or update_fields is None or field in update_fields or name in update_fields:
+            new[field] = getattr(prospect, field)
+        else:
+            new[field] = old[field]
+
+    deltas = {}
+    if created or old is None:
+        # A new prospect has no interactions yet
+        _add(deltas, _state_key(new), 1, 0, new['score'] or 0)
+    elif _state_key(old) != _state_key(new):
+        responded = int(_has_interactions(prospect.pk))
+        _add(deltas, _state_key(old), -1, -responded, -(old['score'] or 0))
+        _add(deltas, _state_key(new), 1, responded, new['score'] or 0)
+    elif old['score'] != new['score']:
+        _add(deltas, _state_key(new), 0, 0, (new['score'] or 0) - (old['score'] or 0))
+    prospect._rollup_state = new
+    apply_deltas(deltas)
+
+
+def prospect_deleted(prospect):
+    state = getattr(prospect, '_rollup_state', None) or {field: getattr(prospect, field) for field in STATE_FIELDS}
+    # Cascade deletes run first, so the interactions are usually gone (and already counted out)
+    responded = int(_has_interactions(prospect.pk))
+    schedule_bump()
+    apply_deltas({_state_key(state): (-1, -responded, -(state['score'] or 0))})
+
+
+def interaction_saved(interaction, created):
+    """A prospect's first interaction makes it count as responded."""
+    if created and not Interaction.objects.filter(prospect_id=interaction.prospect_id).exclude(pk=interaction.pk).exists():
+        _adjust_responded(interaction.prospect_id, 1)
+
+
+def interaction_deleted(interaction):
+    if not _has_interactions(interaction.prospect_id):
+        _adjust_responded(interaction.prospect_id, -1)
+
+
+def _adjust_responded(prospect_id, delta):
+    state = Prospect.objects.filter(pk=prospect_id).values(*STATE_FIELDS).first()
+    if state is not None:
+        apply_deltas({_state_key(state): (0, delta, 0)})
+
+
+def apply_deltas(deltas):
+    """Add ``{key: (prospects, responded, score_total)}`` to the rollup rows, creating missing ones."""
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+    pending = set(PendingRollupDay.objects.filter(day__in={key[0] for key in deltas}).values_list('day', flat=True))
+    for key, (prospects, responded, score_total) in deltas.items():
+        if key[0] in pending:
+            continue  # the worker's rebuild of this day will include the change
+        lookup = dict(zip(KEY_FIELDS, key))
+        rows = ProspectDailyRollup.objects.filter(**lookup)
+        changes = {
+            'prospects': Greatest(F('prospects') + prospects, 0),
+            'responded': Greatest(F('responded') + responded, 0),
+            'score_total': Greatest(F('score_total') + score_total, 0),
+        }
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                ProspectDailyRollup.objects.create(
+                    **lookup, prospects=max(prospects, 0), responded=max(responded, 0), score_total=max(score_total, 0),
+                )
+        except IntegrityError:
+            # A concurrent transaction created the row since our update
+            rows.update(**changes)
+    schedule_bump()
+
+
+def schedule_bump():
+    """Drop the cached dashboard widgets once the current transaction commits."""
+    # Registered on every call: callbacks of a rolled-back transaction are
+    # discarded, and a later commit must still drop the cached widgets.
+    _pending.bump = True
+    transaction.on_commit(_flush_bump)
+
+
+def _flush_bump():
+    if getattr(_pending, 'bump', False):
+        _pending.bump = False
+        # Prospect data changed: drop cached dashboard widgets
+        bump_version()
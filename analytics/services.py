@@ -0,0 +1,460 @@
+"""
+Analytics service helpers.
+
+Aggregations live here so the JSON views stay thin and the same numbers can be
+reused by other endpoints. Dashboard counts are read from ``ProspectDailyRollup``
+(see ``analytics.rollups``), so their cost depends on the date range rather than
+on the number of prospects. Widget views cache these results through
+``analytics.cache``.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Coalesce, Greatest, Lag, TruncDay
+from django.utils import timezone
+
+from accounts.models import User
+from crm.models import Interaction, Prospect, StageTransition
+from .models import DashboardView, ProspectDailyRollup
+
+STALE_AFTER_DAYS = 30
+LEADS_LIMIT = 10
+
+ROLLUP_WIDGETS = ('kpis', 'country', 'stage', 'score')
+DASHBOARD_WIDGETS = ROLLUP_WIDGETS + ('top_leads', 'stale_leads')
+
+# Histogram fields: Prospect column and value range (values above max go in the last bin)
+HISTOGRAM_FIELDS = {
+    'score': {'column': 'score', 'min': 0, 'max': 100},
+}
+HISTOGRAM_SPLITS = {'owner': 'owner_id', 'country': 'country'}
+
+# Funnel order; LOST is an exit, not a funnel step
+FUNNEL_STAGES = [stage for stage, _label in Prospect.STAGE_CHOICES if stage != Prospect.LOST]
+
+
+def scoped_rollups(user, params):
+    """Return rollup rows visible to ``user`` filtered by dashboard GET params.
+
+    Supports ``date_from``/``date_to`` (prospect creation day, inclusive),
+    ``country`` and, for admins, ``owner_id``.
+    """
+    queryset = ProspectDailyRollup.objects.all()
+
+    # Commercial users see only their prospects
+    if not user.is_admin():
+        queryset = queryset.filter(owner=user)
+    elif params.get('owner_id'):
+        queryset = queryset.filter(owner_id=params.get('owner_id'))
+
+    if params.get('date_from'):
+        queryset = queryset.filter(day__gte=params.get('date_from'))
+    if params.get('date_to'):
+        queryset = queryset.filter(day__lte=params.get('date_to'))
+    if params.get('country'):
+        queryset = queryset.filter(country=params.get('country'))
+
+    return queryset.order_by()
+
+
+def _kpi_payload(total, responded, high_priority, stage_counts):
+    converted = stage_counts.get(Prospect.CONVERTED, 0)
+    return {
+        'total_prospects': total,
+        'converted': converted,
+        'demos_scheduled': stage_counts.get(Prospect.DEMO_SCHEDULED, 0),
+        'response_rate': round(responded / total * 100, 1) if total > 0 else 0,
+        'high_priority': high_priority,
+        'stage_breakdown': [
+            {'stage': stage, 'count': stage_counts[stage]}
+            for stage, _label in Prospect.STAGE_CHOICES
+            if stage_counts.get(stage)
+        ],
+        'conversion_rate': round(converted / total * 100, 1) if total > 0 else 0,
+    }
+
+
+def _country_payload(country_counts):
+    ordered = sorted(country_counts.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'labels': [country for country, _count in ordered],
+        'data': [count for _country, count in ordered],
+    }
+
+
+def _stage_payload(stage_counts):
+    return {
+        'labels': [label for _stage, label in Prospect.STAGE_CHOICES],
+        'data': [stage_counts.get(stage, 0) for stage, _label in Prospect.STAGE_CHOICES],
+    }
+
+
+def _score_payload(bucket_counts):
+    size = ProspectDailyRollup.SCORE_BUCKET_SIZE
+    return {
+        'labels': [f'{bucket * size}-{(bucket + 1) * size}' for bucket in range(ProspectDailyRollup.SCORE_BUCKETS)],
+        'data': [bucket_counts.get(bucket, 0) for bucket in range(ProspectDailyRollup.SCORE_BUCKETS)],
+    }
+
+
+def kpi_summary(rollups):
+    """Compute dashboard KPIs from rollup rows in a single query.
+
+    Every KPI is a conditional ``Sum`` over the same scan of the rollup table.
+    """
+    aggregates = {
+        'total_prospects': Sum('prospects'),
+        'responded': Sum('responded'),
+        'high_priority': Sum('prospects', filter=Q(priority_level=Prospect.HIGH)),
+    }
+    for stage, _label in Prospect.STAGE_CHOICES:
+        aggregates[f'stage_{stage}'] = Sum('prospects', filter=Q(stage=stage))
+    row = {key: value or 0 for key, value in rollups.aggregate(**aggregates).items()}
+
+    stage_counts = {stage: row[f'stage_{stage}'] for stage, _label in Prospect.STAGE_CHOICES}
+    return _kpi_payload(row['total_prospects'], row['responded'], row['high_priority'], stage_counts)
+
+
+def country_breakdown(rollups):
+    """Return ``{'labels': [...], 'data': [...]}`` ordered by prospect count."""
+    return _country_payload(dict(rollups.values_list('country').annotate(count=Sum('prospects'))))
+
+
+def stage_breakdown(rollups):
+    """Return counts for every pipeline stage, in pipeline order."""
+    return _stage_payload(dict(rollups.values_list('stage').annotate(count=Sum('prospects'))))
+
+
+def score_distribution(rollups):
+    """Return prospect counts per score bucket (0-20, 20-40, ... 80-100)."""
+    return _score_payload(dict(rollups.values_list('score_bucket').annotate(count=Sum('prospects'))))
+
+
+def rollup_widgets(rollups, widgets):
+    """Compute several rollup-backed widgets from one GROUP BY query.
+
+    The rollup rows are grouped once by every dimension the widgets need and
+    folded in Python, so ``kpis``, ``country``, ``stage`` and ``score`` together
+    cost a single query.
+    """
+    total = responded = high_priority = 0
+    country_counts, stage_counts, bucket_counts = Counter(), Counter(), Counter()
+    rows = rollups.values_list('country', 'stage', 'priority_level', 'score_bucket').annotate(
+        count=Sum('prospects'), responded_count=Sum('responded'),
+    )
+    for country, stage, priority_level, bucket, count, responded_count in rows:
+        total += count
+        responded += responded_count
+        if priority_level == Prospect.HIGH:
+            high_priority += count
+        country_counts[country] += count
+        stage_counts[stage] += count
+        bucket_counts[bucket] += count
+
+    builders = {
+        'kpis': lambda: _kpi_payload(total, responded, high_priority, stage_counts),
+        'country': lambda: _country_payload(country_counts),
+        'stage': lambda: _stage_payload(stage_counts),
+        'score': lambda: _score_payload(bucket_counts),
+    }
+    return {widget: builders[widget]() for widget in widgets}
+
+
+def scoped_prospects(user, params=None):
+    """Return prospects visible to ``user``, optionally filtered like ``scoped_rollups``."""
+    params = params or {}
+    queryset = Prospect.objects.all()
+
+    if not user.is_admin():
+        queryset = queryset.filter(owner=user)
+    elif params.get('owner_id'):
+        queryset = queryset.filter(owner_id=params.get('owner_id'))
+
+    if params.get('date_from'):
+        queryset = queryset.filter(created_at__date__gte=params.get('date_from'))
+    if params.get('date_to'):
+        queryset = queryset.filter(created_at__date__lte=params.get('date_to'))
+    if params.get('country'):
+        queryset = queryset.filter(country=params.get('country'))
+
+    return queryset
+
+
+def top_leads(prospects):
+    """Return the highest scoring high priority leads."""
+    leads = prospects.filter(priority_level=Prospect.HIGH).order_by('-score').values(
+        'id', 'name', 'score', 'stage', 'country', 'email'
+    )[:LEADS_LIMIT]
+    return {'leads': list(leads)}
+
+
+def stale_leads(prospects):
+    """Return the newest leads with no interaction in ``STALE_AFTER_DAYS`` days.
+
+    The ``IS NULL OR < cutoff`` condition is split into two branches that each
+    walk their own index (``prospect_*uncontacted_idx`` and ``prospect_*lapsed_idx``)
+    newest first and stop after ``LEADS_LIMIT`` rows. The branches are combined
+    with ``UNION ALL`` where the database allows ordered compound queries; on
+    SQLite they run as two queries merged here.
+    """
+    cutoff = timezone.now() - timedelta(days=STALE_AFTER_DAYS)
+    fields = ('id', 'name', 'email', 'country', 'score', 'created_at')
+    branches = [
+        prospects.filter(last_interaction_at__isnull=True).order_by('-created_at').values(*fields)[:LEADS_LIMIT],
+        prospects.filter(last_interaction_at__lt=cutoff).order_by('-created_at').values(*fields)[:LEADS_LIMIT],
+    ]
+    if connection.features.supports_slicing_ordering_in_compound:
+        rows = list(branches[0].union(branches[1], all=True).order_by('-created_at')[:LEADS_LIMIT])
+    else:
+        rows = sorted([*branches[0], *branches[1]], key=lambda row: row['created_at'], reverse=True)[:LEADS_LIMIT]
+    for row in rows:
+        del row['created_at']
+    return {'leads': rows}
+
+
+def dashboard_payload(user, params, widgets):
+    """Return ``{widget: data}`` for the requested ``DASHBOARD_WIDGETS``.
+
+    Rollup widgets share one query (see ``rollup_widgets``); lead lists add one
+    query each.
+    """
+    payload = {}
+    requested_rollups = [widget for widget in widgets if widget in ROLLUP_WIDGETS]
+    if requested_rollups:
+        payload.update(rollup_widgets(scoped_rollups(user, params), requested_rollups))
+    if 'top_leads' in widgets or 'stale_leads' in widgets:
+        prospects = scoped_prospects(user)
+        if 'top_leads' in widgets:
+            payload['top_leads'] = top_leads(prospects)
+        if 'stale_leads' in widgets:
+            payload['stale_leads'] = stale_leads(prospects)
+    return payload
+
+
+def validate_histogram(field, bin_width, split=None):
+    """Raise ``ValueError`` unless ``histogram`` accepts these arguments."""
+    if field not in HISTOGRAM_FIELDS:
+        raise ValueError(f'Unknown histogram field: {field}')
+    if split is not None and split not in HISTOGRAM_SPLITS:
+        raise ValueError(f'Unknown histogram split: {split}')
+    if bin_width <= 0:
+        raise ValueError('Bin width must be positive')
+
+
+def histogram(user, params, field='score', bin_width=ProspectDailyRollup.SCORE_BUCKET_SIZE, split=None):
+    """Count prospects per ``bin_width`` bin of ``field`` with one GROUP BY.
+
+    ``split`` (``owner`` or ``country``) returns one series per value instead of a
+    single ``data`` list. Score histograms whose bin width is a multiple of the
+    rollup bucket size are regrouped from ``ProspectDailyRollup``; other widths
+    group the scoped prospects on ``(value - min) / bin_width``.
+
+    Raises ``ValueError`` for invalid arguments (see ``validate_histogram``).
+    """
+    validate_histogram(field, bin_width, split)
+    spec = HISTOGRAM_FIELDS[field]
+    bins = max(1, -(-(spec['max'] - spec['min']) // bin_width))
+    split_column = HISTOGRAM_SPLITS.get(split)
+    group_by = [split_column] if split_column else []
+
+    bucket_size = ProspectDailyRollup.SCORE_BUCKET_SIZE
+    if field == 'score' and bin_width % bucket_size == 0:
+        rows = scoped_rollups(user, params).values_list(*group_by, 'score_bucket').annotate(count=Sum('prospects'))
+        rows = [(*row[:-2], row[-2] * bucket_size // bin_width, row[-1]) for row in rows]
+    else:
+        bin_expression = ExpressionWrapper((F(spec['column']) - spec['min']) / bin_width, output_field=IntegerField())
+        rows = (
+            scoped_prospects(user, params).filter(**{f'{spec["column"]}__isnull': False})
+            .annotate(bin=bin_expression)
+            .values_list(*group_by, 'bin')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+
+    series = {}
+    for *key, bin_index, count in rows:
+        data = series.setdefault(key[0] if key else None, [0] * bins)
+        data[min(max(bin_index, 0), bins - 1)] += count
+
+    labels = [
+        f'{spec["min"] + index * bin_width}-{min(spec["min"] + (index + 1) * bin_width, spec["max"])}'
+        for index in range(bins)
+    ]
+    result = {'field': field, 'bin_width': bin_width, 'labels': labels}
+    if split:
+        result['split'] = split
+        result['series'] = [{'key': key, 'data': data} for key, data in sorted(series.items(), key=lambda item: str(item[0]))]
+    else:
+        result['data'] = series.get(None, [0] * bins)
+    return result
+
+
+def _funnel_index(field):
+    """SQL expression mapping a stage column to its ``FUNNEL_STAGES`` position (-1 for LOST)."""
+    return Case(
+        *[When(**{field: stage}, then=Value(index)) for index, stage in enumerate(FUNNEL_STAGES)],
+        default=Value(-1),
+        output_field=IntegerField(),
+    )
+
+
+def stage_funnel(prospects):
+    """Return how many ``prospects`` ever reached each funnel stage, in one query.
+
+    A prospect's furthest stage is the highest of its current stage and every
+    stage in its ``StageTransition`` rows; it counts for that stage and all
+    earlier ones. ``conversion`` is the percentage of the previous step reaching a step.
+    """
+    furthest_transition = (
+        StageTransition.objects.filter(prospect=OuterRef('pk'))
+        .values('prospect')
+        .annotate(furthest=Max(Greatest(_funnel_index('from_stage'), _funnel_index('to_stage'))))
+        .values('furthest')
+    )
+    furthest_counts = dict(
+        prospects.annotate(furthest=Greatest(
+            _funnel_index('stage'), Coalesce(Subquery(furthest_transition), Value(-1)), Value(0),
+        ))
+        .order_by().values_list('furthest').annotate(count=Count('id'))
+    )
+
+    reached, running = [], 0
+    for index in reversed(range(len(FUNNEL_STAGES))):
+        running += furthest_counts.get(index, 0)
+        reached.insert(0, running)
+    labels = dict(Prospect.STAGE_CHOICES)
+    return {
+        'labels': [labels[stage] for stage in FUNNEL_STAGES],
+        'data': reached,
+        'conversion': [100.0 if index == 0 else (round(count / reached[index - 1] * 100, 1) if reached[index - 1] else 0)
+                       for index, count in enumerate(reached)],
+    }
+
+
+def stage_velocity(prospects):
+    """Return the average days prospects spend in each stage before leaving it.
+
+    Time in a stage runs from the previous transition (``LAG`` over the
+    prospect's transitions, or its creation for the first one) to the
+    transition out of it. Prospects still sitting in a stage are not counted.
+    """
+    rows = (
+        StageTransition.objects.filter(prospect__in=prospects.values('pk'))
+        .annotate(entered_at=Coalesce(
+            Window(Lag('changed_at'), partition_by=[F('prospect_id')], order_by=F('changed_at').asc()),
+            F('prospect__created_at'),
+        ))
+        .order_by()
+        .values_list('from_stage', 'entered_at', 'changed_at')
+    )
+    totals, counts = Counter(), Counter()
+    for stage, entered_at, left_at in rows.iterator():
+        totals[stage] += (left_at - entered_at).total_seconds()
+        counts[stage] += 1
+
+    return {
+        'stages': [
+            {
+                'stage': stage,
+                'label': label,
+                'transitions': counts[stage],
+                'avg_days': round(totals[stage] / counts[stage] / 86400, 1) if counts[stage] else None,
+            }
+            for stage, label in Prospect.STAGE_CHOICES
+        ],
+    }
+
+
+def _per_owner(queryset, owner_path, aggregate):
+    """Correlated subquery returning ``aggregate`` over ``queryset`` rows of the outer user (0 when none)."""
+    return Coalesce(Subquery(
+        queryset.filter(**{owner_path: OuterRef('pk')}).order_by()
+        .values(owner_path).annotate(value=aggregate).values('value')
+    ), 0)
+
+
+def leaderboard(params):
+    """Return per-owner performance for commercial users, in one query.
+
+    Prospects owned, average score and response rate describe the current
+    pipeline (from the rollups); interactions, demos and conversions count
+    events between ``date_from`` and ``date_to`` (inclusive, all time by default).
+    """
+    period = {}
+    if params.get('date_from'):
+        period['__date__gte'] = params.get('date_from')
+    if params.get('date_to'):
+        period['__date__lte'] = params.get('date_to')
+
+    def in_period(field):
+        return {f'{field}{lookup}': value for lookup, value in period.items()}
+
+    transitions = StageTransition.objects.filter(**in_period('changed_at'))
+    rows = (
+        User.objects.filter(role=User.COMMERCIAL, is_active=True)
+        .annotate(
+            prospect_count=_per_owner(ProspectDailyRollup.objects.all(), 'owner', Sum('prospects')),
+            responded_count=_per_owner(ProspectDailyRollup.objects.all(), 'owner', Sum('responded')),
+            score_total=_per_owner(ProspectDailyRollup.objects.all(), 'owner', Sum('score_total')),
+            interaction_count=_per_owner(Interaction.objects.filter(**in_period('date')), 'prospect__owner', Count('pk')),
+            demo_count=_per_owner(transitions.filter(to_stage=Prospect.DEMO_SCHEDULED), 'prospect__owner', Count('pk')),
+            conversion_count=_per_owner(transitions.filter(to_stage=Prospect.CONVERTED), 'prospect__owner', Count('pk')),
+        )
+        .order_by('-conversion_count', '-demo_count', '-prospect_count', 'email')
+        .values(
+            'pk', 'email', 'first_name', 'last_name', 'prospect_count', 'responded_count', 'score_total',
+            'interaction_count', 'demo_count', 'conversion_count',
+        )
+    )
+    return {
+        'owners': [
+            {
+                'owner_id': row['pk'],
+                'name': f"{row['first_name']} {row['last_name']}".strip() or row['email'],
+                'prospects': row['prospect_count'],
+                'interactions': row['interaction_count'],
+                'demos': row['demo_count'],
+                'conversions': row['conversion_count'],
+                'avg_score': round(row['score_total'] / row['prospect_count'], 1) if row['prospect_count'] else 0,
+                'response_rate': round(row['responded_count'] / row['prospect_count'] * 100, 1) if row['prospect_count'] else 0,
+            }
+            for row in rows
+        ],
+    }
+
+
+def usage_summary(params):
+    """Summarise dashboard views between ``date_from`` and ``date_to`` (last 30 days by default).
+
+    Returns daily view and distinct-user counts plus the most active users.
+    """
+    date_from = params.get('date_from') or (timezone.localdate() - timedelta(days=29)).isoformat()
+    views = DashboardView.objects.filter(viewed_at__date__gte=date_from)
+    if params.get('date_to'):
+        views = views.filter(viewed_at__date__lte=params.get('date_to'))
+
+    daily = (
+        views.annotate(day=TruncDay('viewed_at')).order_by('day')
+        .values_list('day').annotate(views=Count('id'), users=Count('user', distinct=True))
+    )
+    top_users = (
+        views.order_by().values('user_id', 'user__email')
+        .annotate(views=Count('id'), last_viewed_at=Max('viewed_at'))
+        .order_by('-views', 'user__email')[:LEADS_LIMIT]
+    )
+    totals = views.aggregate(views=Count('id'), users=Count('user', distinct=True))
+    return {
+        'total_views': totals['views'],
+        'active_users': totals['users'],
+        'labels': [day.date().isoformat() for day, _views, _users in daily],
+        'views': [count for _day, count, _users in daily],
+        'users': [users for _day, _count, users in daily],
+        'top_users': [
+            {'user_id': row['user_id'], 'email': row['user__email'], 'views': row['views'], 'last_viewed_at': row['last_viewed_at']}
+            for row in top_users
+        ],
+    }
@@ -0,0 +1,40 @@
+"""
+Keep analytics rollups in sync with prospect and interaction writes.
+"""
+from django.conf import settings
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from crm.models import Interaction, Prospect
+from . import rollups
+
+
+@receiver(post_init, sender=Prospect)
+def prospect_loaded(sender, instance, **kwargs):
+    rollups.remember_state(instance)
+
+
+@receiver(post_save, sender=Prospect)
+def prospect_saved(sender, instance, created, update_fields=None, **kwargs):
+    rollups.prospect_saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=Prospect)
+def prospect_deleted(sender, instance, **kwargs):
+    rollups.prospect_deleted(instance)
+
+
+@receiver(post_save, sender=Interaction)
+def interaction_saved(sender, instance, created, **kwargs):
+    rollups.interaction_saved(instance, created)
+
+
+@receiver(post_delete, sender=Interaction)
+def interaction_deleted(sender, instance, **kwargs):
+    rollups.interaction_deleted(instance)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def owner_deleted(sender, instance, **kwargs):
+    # Their prospects become ownerless without signals (SET_NULL); rebuild those days
+    rollups.schedule_prospect_refresh(Prospect.objects.filter(owner=instance))
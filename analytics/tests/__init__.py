@@ -0,0 +1 @@
+# analytics tests package
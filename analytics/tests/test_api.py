@@ -0,0 +1,214 @@
+from django.core.cache import cache
+from django.db.models import Avg
+from django.utils import timezone
+from datetime import timedelta
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from accounts.models import User
+from crm.models import Prospect, Interaction
+from analytics.checks import check_shared_cache
+from analytics.models import PendingRollupDay, ProspectDailyRollup
+from analytics.rollups import rebuild_days, refresh_pending_days, schedule_prospect_refresh
+from analytics.services import kpi_summary, scoped_rollups, rollup_widgets, country_breakdown, stage_breakdown, score_distribution, histogram, leaderboard, stale_leads, scoped_prospects
+from crm.services import ProspectService
+
+
+class KPIDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='kpi@test.com', username='kpi@test.com', role=User.COMMERCIAL)
+        self.other = User.objects.create(email='other@test.com', username='other@test.com', role=User.COMMERCIAL)
+        self.client = Client()
+        self.client.force_login(self.user)
+        # Rollups are rebuilt on commit; run those callbacks inside the test transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            self.converted = Prospect.objects.create(name='A', email='a@school.com', country='NG', owner=self.user, stage=Prospect.CONVERTED, priority_level=Prospect.HIGH, score=85)
+            Prospect.objects.create(name='B', email='b@school.com', country='NG', owner=self.user, stage=Prospect.DEMO_SCHEDULED, score=45)
+            Prospect.objects.create(name='C', email='c@school.com', country='EG', owner=self.user, score=5)
+            Prospect.objects.create(name='D', email='d@school.com', country='EG', owner=self.other, stage=Prospect.CONVERTED)
+            Interaction.objects.create(prospect=self.converted, interaction_type=Interaction.CALL, summary='Call')
+            Interaction.objects.create(prospect=self.converted, interaction_type=Interaction.EMAIL, summary='Email')
+
+    def test_kpis_single_query(self):
+        with self.assertNumQueries(1):
+            kpi_summary(scoped_rollups(self.user, {}))
+
+    def test_kpis_scoped_to_user(self):
+        data = self.client.get(reverse('analytics:api_kpis')).json()
+        self.assertEqual(data['total_prospects'], 3)
+        self.assertEqual(data['converted'], 1)
+        self.assertEqual(data['demos_scheduled'], 1)
+        self.assertEqual(data['high_priority'], 1)
+        self.assertEqual(data['response_rate'], 33.3)
+        self.assertEqual(data['conversion_rate'], 33.3)
+        self.assertIn({'stage': Prospect.NEW, 'count': 1}, data['stage_breakdown'])
+
+    def test_breakdowns_from_rollups(self):
+        self.assertEqual(self.client.get(reverse('analytics:api_country_breakdown')).json(), {'labels': ['NG', 'EG'], 'data': [2, 1]})
+        self.assertEqual(self.client.get(reverse('analytics:api_score_distribution')).json()['data'], [1, 0, 1, 0, 1])
+        stage = self.client.get(reverse('analytics:api_stage_breakdown')).json()
+        self.assertEqual(sum(stage['data']), 3)
+
+    def _rollup_rows(self):
+        return sorted(ProspectDailyRollup.objects.filter(prospects__gt=0).values_list(
+            'owner_id', 'country', 'stage', 'priority_level', 'score_bucket', 'prospects', 'responded', 'score_total',
+        ))
+
+    def test_rollups_follow_bulk_updates_after_worker_rebuild(self):
+        queryset = Prospect.objects.filter(owner=self.user)
+        schedule_prospect_refresh(queryset)
+        queryset.update(stage=Prospect.LOST)
+        self.assertTrue(PendingRollupDay.objects.exists())
+
+        # A save on a day waiting for its rebuild leaves the rows to the worker
+        prospect = Prospect.objects.get(email='c@school.com')
+        prospect.stage = Prospect.ENGAGED
+        prospect.save()
+
+        self.assertEqual(refresh_pending_days(), 1)
+        self.assertFalse(PendingRollupDay.objects.exists())
+        self.assertCountEqual(kpi_summary(scoped_rollups(self.user, {}))['stage_breakdown'], [
+            {'stage': Prospect.LOST, 'count': 2}, {'stage': Prospect.ENGAGED, 'count': 1},
+        ])
+
+    def test_saves_apply_deltas_matching_rebuild(self):
+        prospect = Prospect.objects.get(email='b@school.com')
+        prospect.notes = 'Not a rollup field'
+        with self.assertNumQueries(1):
+            prospect.save()
+
+        prospect.stage, prospect.score = Prospect.LOST, 65
+        # Save, interactions check, pending-day check, one update per key, insert of the new key (+ savepoint)
+        with self.assertNumQueries(8):
+            prospect.save()
+        Interaction.objects.create(prospect=prospect, interaction_type=Interaction.CALL, summary='Call')
+        Interaction.objects.create(prospect=prospect, interaction_type=Interaction.EMAIL, summary='Email')
+        Interaction.objects.filter(prospect=self.converted).first().delete()
+        Prospect.objects.filter(email='c@school.com').get().delete()
+        Prospect.objects.create(name='E', email='e@school.com', country='GH', owner=self.other, score=30)
+        self.assertEqual(kpi_summary(scoped_rollups(self.user, {}))['response_rate'], 100.0)
+        # Cascade-deleted interactions and the prospect itself are both counted out
+        Prospect.objects.get(pk=self.converted.pk).delete()
+        self.assertEqual(kpi_summary(scoped_rollups(self.user, {}))['total_prospects'], 1)
+
+        incremental = self._rollup_rows()
+        rebuild_days(ProspectDailyRollup.objects.values_list('day', flat=True))
+        self.assertEqual(self._rollup_rows(), incremental)
+
+    def test_deleting_owner_rebuilds_their_days(self):
+        self.other.delete()
+        refresh_pending_days()
+        self.assertEqual(ProspectDailyRollup.objects.get(owner=None, country='EG').prospects, 1)
+
+    def test_stale_leads_union_branches(self):
+        now = timezone.now()
+        Prospect.objects.filter(email='a@school.com').update(last_interaction_at=now)
+        Prospect.objects.filter(email='b@school.com').update(last_interaction_at=now - timedelta(days=45))
+        emails = [lead['email'] for lead in stale_leads(scoped_prospects(self.user))['leads']]
+        # Newest first across both branches; recently contacted prospects are excluded
+        self.assertEqual(emails, ['c@school.com', 'b@school.com'])
+
+    def test_widgets_cached_until_prospect_write(self):
+        url = reverse('analytics:api_country_breakdown')
+        self.client.get(url)
+        with self.assertNumQueries(2):  # session + user only
+            self.assertEqual(self.client.get(url).json()['data'], [2, 1])
+        self.assertEqual(self.client.get(url, {'country': 'EG'}).json()['data'], [1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Prospect.objects.create(name='E', email='e@school.com', country='NG', owner=self.user)
+        self.assertEqual(self.client.get(url).json()['data'], [3, 1])
+
+    def test_cached_stale_leads_dropped_by_non_rollup_write(self):
+        url = reverse('analytics:api_stale_leads')
+        self.assertIn('a@school.com', [lead['email'] for lead in self.client.get(url).json()['leads']])
+        # Leaves every rollup key and counter alone
+        self.converted.last_interaction_at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.converted.save()
+        self.assertNotIn('a@school.com', [lead['email'] for lead in self.client.get(url).json()['leads']])
+
+    def test_deploy_check_warns_about_local_memory_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['analytics.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+        leads = self.client.get(reverse('analytics:api_top_leads')).json()['leads']
+        self.assertEqual([lead['email'] for lead in leads], ['a@school.com'])
+
+    def test_rollup_widgets_share_one_query(self):
+        rollups = scoped_rollups(self.user, {})
+        with self.assertNumQueries(1):
+            combined = rollup_widgets(rollups, ['kpis', 'country', 'stage', 'score'])
+        self.assertEqual(combined['kpis'], kpi_summary(rollups))
+        self.assertEqual(combined['country'], country_breakdown(rollups))
+        self.assertEqual(combined['stage'], stage_breakdown(rollups))
+        self.assertEqual(combined['score'], score_distribution(rollups))
+
+    def test_dashboard_payload_widget_selection(self):
+        url = reverse('analytics:api_dashboard')
+        data = self.client.get(url).json()
+        self.assertEqual(set(data), {'kpis', 'country', 'stage', 'score', 'top_leads', 'stale_leads'})
+        self.assertEqual(data['kpis']['total_prospects'], 3)
+
+        data = self.client.get(url, {'widgets': 'country,top_leads', 'country': 'NG'}).json()
+        self.assertEqual(data['country'], {'labels': ['NG'], 'data': [2]})
+        self.assertEqual(len(data['top_leads']['leads']), 1)
+        self.assertNotIn('kpis', data)
+
+        self.assertEqual(self.client.get(url, {'widgets': 'bogus'}).status_code, 400)
+
+    def test_histogram_bins_and_splits(self):
+        # Multiples of the rollup bucket size are regrouped from the rollups
+        self.assertEqual(histogram(self.user, {}, bin_width=40)['data'], [1, 1, 1])
+        self.assertEqual(histogram(self.user, {}, bin_width=20)['data'], score_distribution(scoped_rollups(self.user, {}))['data'])
+
+        # Other widths group the prospects directly, in one query
+        with self.assertNumQueries(1):
+            data = histogram(self.user, {}, bin_width=30, split='country')
+        self.assertEqual(data['labels'], ['0-30', '30-60', '60-90', '90-100'])
+        self.assertEqual(data['series'], [
+            {'key': 'EG', 'data': [1, 0, 0, 0]},
+            {'key': 'NG', 'data': [0, 1, 1, 0]},
+        ])
+
+        url = reverse('analytics:api_histogram')
+        self.assertEqual(self.client.get(url, {'bin_width': 50}).json()['data'], [2, 1])
+        self.assertEqual(self.client.get(url, {'bin_width': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'field': 'bogus'}).status_code, 400)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(email='lb-admin@test.com', username='lb-admin@test.com', role=User.ADMIN)
+        self.rep = User.objects.create(email='rep@test.com', username='rep@test.com', role=User.COMMERCIAL, first_name='Ada')
+        self.idle = User.objects.create(email='idle@test.com', username='idle@test.com', role=User.COMMERCIAL)
+        with self.captureOnCommitCallbacks(execute=True):
+            won = Prospect.objects.create(name='W', email='w@school.com', country='NG', owner=self.rep, score=80)
+            Prospect.objects.create(name='X', email='x@school.com', country='NG', owner=self.rep, score=40)
+            ProspectService.add_interaction(self.rep, won, Interaction.CALL, 'Call', Interaction.POSITIVE)
+            ProspectService.change_stage(self.rep, won, Prospect.DEMO_SCHEDULED)
+            ProspectService.change_stage(self.rep, won, Prospect.CONVERTED)
+
+    def test_leaderboard_single_query(self):
+        with self.assertNumQueries(1):
+            owners = leaderboard({})['owners']
+        # add_interaction re-scores, so compare the average with the live prospects
+        avg_score = Prospect.objects.filter(owner=self.rep).aggregate(avg=Avg('score'))['avg']
+        self.assertEqual(owners[0], {
+            'owner_id': self.rep.pk, 'name': 'Ada', 'prospects': 2, 'interactions': 1, 'demos': 1,
+            'conversions': 1, 'avg_score': round(avg_score, 1), 'response_rate': 50.0,
+        })
+        self.assertEqual(owners[1]['name'], 'idle@test.com')
+        self.assertEqual(leaderboard({'date_to': '2000-01-01'})['owners'][0]['conversions'], 0)
+
+    def test_leaderboard_admin_only(self):
+        client = Client()
+        client.force_login(self.rep)
+        self.assertEqual(client.get(reverse('analytics:api_leaderboard')).status_code, 403)
+        client.force_login(self.admin)
+        self.assertEqual(len(client.get(reverse('analytics:api_leaderboard')).json()['owners']), 2)
+        self.assertEqual(client.get(reverse('analytics:api_leaderboard'), {'date_to': '2026-1-5'}).status_code, 400)
+        self.assertEqual(client.get(reverse('analytics:api_leaderboard'), {'date_from': 'last week'}).status_code, 400)
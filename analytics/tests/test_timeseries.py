@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from crm.models import Prospect, Interaction
+from analytics.timeseries import MAX_BUCKETS, bucket_count, bucket_range, time_series
+
+
+class TimeSeriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='ts@test.com', username='ts@test.com', role=User.COMMERCIAL)
+        self.other = User.objects.create(email='ts-other@test.com', username='ts-other@test.com', role=User.COMMERCIAL)
+        self.today = timezone.localdate()
+        now = timezone.now()
+        for days_ago, owner in [(0, self.user), (0, self.user), (3, self.user), (3, self.other)]:
+            prospect = Prospect.objects.create(name='S', email=f'{days_ago}-{owner.pk}-{Prospect.objects.count()}@school.com', country='NG', owner=owner)
+            Prospect.objects.filter(pk=prospect.pk).update(created_at=now - timedelta(days=days_ago))
+        Interaction.objects.create(prospect=prospect, interaction_type=Interaction.CALL, summary='Call')
+
+    def test_bucket_range(self):
+        self.assertEqual(bucket_range(date(2026, 1, 30), date(2026, 3, 2), 'month'), [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)])
+        self.assertEqual(bucket_range(date(2026, 10, 14), date(2026, 10, 19), 'week'), [date(2026, 10, 12), date(2026, 10, 19)])
+        for interval in ('day', 'week', 'month'):
+            self.assertEqual(bucket_count(date(2025, 2, 27), date(2026, 3, 2), interval), len(bucket_range(date(2025, 2, 27), date(2026, 3, 2), interval)))
+
+    def test_daily_counts_scoped_to_user(self):
+        params = {'date_from': (self.today - timedelta(days=3)).isoformat()}
+        data = time_series(self.user, params, 'prospects', 'day')
+        self.assertEqual(data['data'], [1, 0, 0, 2])
+        self.assertEqual(data['labels'][-1], self.today.isoformat())
+        self.assertEqual(time_series(self.other, params, 'interactions', 'day')['data'], [0, 0, 0, 1])
+
+    def test_closed_buckets_served_from_cache(self):
+        params = {'date_from': (self.today - timedelta(days=3)).isoformat()}
+        time_series(self.user, params, 'prospects', 'day')
+        # Only the open bucket is queried again
+        Prospect.objects.filter(owner=self.user).update(created_at=timezone.now())
+        with self.assertNumQueries(1):
+            data = time_series(self.user, params, 'prospects', 'day')
+        self.assertEqual(data['data'], [1, 0, 0, 3])
+
+    def test_api_validation(self):
+        url = reverse('analytics:api_timeseries')
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(sum(client.get(url, {'metric': 'prospects', 'interval': 'month'}).json()['data']), 3)
+        self.assertEqual(client.get(url, {'metric': 'bogus'}).status_code, 400)
+        self.assertEqual(client.get(url, {'interval': 'year'}).status_code, 400)
+        self.assertEqual(client.get(url, {'date_from': 'nope'}).status_code, 400)
+
+        oldest = self.today - timedelta(days=MAX_BUCKETS['day'] - 1)
+        self.assertEqual(len(client.get(url, {'date_from': oldest.isoformat()}).json()['data']), MAX_BUCKETS['day'])
+        self.assertEqual(client.get(url, {'date_from': (oldest - timedelta(days=1)).isoformat()}).status_code, 400)
+        self.assertEqual(client.get(url, {'interval': 'week', 'date_from': '1900-01-01'}).status_code, 400)
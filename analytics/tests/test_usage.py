@@ -0,0 +1,42 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from accounts.models import User
+from analytics.models import DashboardView
+from analytics.usage import UsageBuffer
+
+
+class UsageBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(email='usage-admin@test.com', username='usage-admin@test.com', role=User.ADMIN)
+        self.user = User.objects.create(email='usage@test.com', username='usage@test.com', role=User.COMMERCIAL)
+
+    def test_views_buffered_until_flush(self):
+        buffer = UsageBuffer(flush_interval=60, max_size=100)
+        buffer.start = lambda: None  # flush by hand instead of from the background thread
+        with self.assertNumQueries(0):
+            for _i in range(3):
+                buffer.add(self.user.pk, '127.0.0.1')
+        self.assertFalse(DashboardView.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(DashboardView.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_unbuffered_writes_immediately(self):
+        UsageBuffer(flush_interval=0, max_size=100).add(self.user.pk)
+        self.assertEqual(DashboardView.objects.count(), 1)
+
+    def test_usage_summary_admin_only(self):
+        DashboardView.objects.bulk_create([DashboardView(user=self.user), DashboardView(user=self.user), DashboardView(user=self.admin)])
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(reverse('analytics:api_usage')).status_code, 403)
+
+        client.force_login(self.admin)
+        data = client.get(reverse('analytics:api_usage')).json()
+        self.assertEqual((data['total_views'], data['active_users']), (3, 2))
+        self.assertEqual(data['views'], [3])
+        self.assertEqual(data['top_users'][0]['email'], 'usage@test.com')
@@ -0,0 +1,161 @@
+"""
+Time-series counts for the analytics API.
+
+Events are bucketed in SQL with ``TruncDay``/``TruncWeek``/``TruncMonth``.
+Closed buckets (everything before the bucket containing today) are cached one
+entry per bucket for ``ANALYTICS_TIMESERIES_TTL`` seconds, so a request only
+queries the open bucket plus whatever closed buckets are missing from the
+cache. Closed buckets are not invalidated by writes: changes that move old
+events between scopes (owner reassignment, deletes) show up once they expire.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from crm.models import Interaction, Prospect, StageTransition
+from emails.models import EmailLog
+
+# metric -> (queryset factory, event datetime field, path from the model to Prospect)
+METRICS = {
+    'prospects': (lambda: Prospect.objects.all(), 'created_at', ''),
+    'interactions': (lambda: Interaction.objects.all(), 'date', 'prospect__'),
+    'emails': (lambda: EmailLog.objects.filter(sent_at__isnull=False), 'sent_at', 'prospect__'),
+    'conversions': (lambda: StageTransition.objects.filter(to_stage=Prospect.CONVERTED), 'changed_at', 'prospect__'),
+}
+
+INTERVALS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Buckets shown when the request gives no date_from
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12}
+# Largest range a request may ask for, in buckets
+MAX_BUCKETS = {'day': 366, 'week': 520, 'month': 120}
+
+
+def bucket_start(day, interval):
+    """Return the first day of the ``interval`` bucket containing ``day`` (weeks start on Monday)."""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, interval):
+    if interval == 'week':
+        return start + timedelta(days=7)
+    if interval == 'month':
+        return start + timedelta(days=calendar.monthrange(start.year, start.month)[1])
+    return start + timedelta(days=1)
+
+
+def bucket_range(date_from, date_to, interval):
+    """Return the bucket start dates covering ``date_from``..``date_to``."""
+    buckets = []
+    current = bucket_start(date_from, interval)
+    while current <= date_to:
+        buckets.append(current)
+        current = next_bucket(current, interval)
+    return buckets
+
+
+def bucket_count(date_from, date_to, interval):
+    """Number of buckets ``bucket_range`` returns, without building them."""
+    if date_from > date_to:
+        return 0
+    if interval == 'month':
+        return (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+    days = (bucket_start(date_to, interval) - bucket_start(date_from, interval)).days
+    return days // (7 if interval == 'week' else 1) + 1
+
+
+def _parse_range(params, interval):
+    today = timezone.localdate()
+    date_to = date.fromisoformat(params['date_to']) if params.get('date_to') else today
+    if params.get('date_from'):
+        date_from = date.fromisoformat(params['date_from'])
+    else:
+        date_from = bucket_start(date_to, interval)
+        for _i in range(DEFAULT_BUCKETS[interval] - 1):
+            date_from = bucket_start(date_from - timedelta(days=1), interval)
+    if date_from > date_to:
+        raise ValueError('date_from must not be after date_to')
+    date_to = min(date_to, today)
+    if bucket_count(date_from, date_to, interval) > MAX_BUCKETS[interval]:
+        raise ValueError(f'Range too long: at most {MAX_BUCKETS[interval]} {interval} buckets')
+    return date_from, date_to
+
+
+def _scoped_events(user, params, metric):
+    factory, _field, prefix = METRICS[metric]
+    queryset = factory()
+    if not user.is_admin():
+        queryset = queryset.filter(**{f'{prefix}owner': user})
+    elif params.get('owner_id'):
+        queryset = queryset.filter(**{f'{prefix}owner_id': params.get('owner_id')})
+    if params.get('country'):
+        queryset = queryset.filter(**{f'{prefix}country': params.get('country')})
+    return queryset
+
+
+def _bucket_cache_key(user, params, metric, interval, start):
+    scope = 'all' if user.is_admin() else f'user:{user.pk}'
+    filters = f"{params.get('owner_id') or ''}:{params.get('country') or ''}"
+    return f'analytics:timeseries:{metric}:{interval}:{scope}:{filters}:{start.isoformat()}'
+
+
+def time_series(user, params, metric, interval='day'):
+    """Return ``{'labels': [...], 'data': [...]}`` event counts per bucket.
+
+    Supports the dashboard filters; ``date_from``/``date_to`` apply to the event
+    date. Raises ``ValueError`` for unknown metrics/intervals or bad dates.
+    """
+    if metric not in METRICS:
+        raise ValueError(f'Unknown metric: {metric}')
+    if interval not in INTERVALS:
+        raise ValueError(f'Unknown interval: {interval}')
+    date_from, date_to = _parse_range(params, interval)
+
+    buckets = bucket_range(date_from, date_to, interval)
+    open_bucket = bucket_start(timezone.localdate(), interval)
+    keys = {start: _bucket_cache_key(user, params, metric, interval, start) for start in buckets if start < open_bucket}
+    cached = cache.get_many(keys.values())
+    counts = {start: cached[key] for start, key in keys.items() if key in cached}
+
+    missing = [start for start in buckets if start not in counts]
+    if missing:
+        _factory, field, _prefix = METRICS[metric]
+        # Count whole buckets, even when date_from/date_to fall inside one
+        rows = (
+            _scoped_events(user, params, metric)
+            .filter(**{
+                f'{field}__date__gte': missing[0],
+                f'{field}__date__lt': next_bucket(missing[-1], interval),
+            })
+            .annotate(bucket=INTERVALS[interval](field))
+            .order_by()
+            .values_list('bucket')
+            .annotate(count=Count('pk'))
+        )
+        fetched = {bucket.date(): count for bucket, count in rows}
+        for start in missing:
+            counts[start] = fetched.get(start, 0)
+        cache.set_many(
+            {keys[start]: counts[start] for start in missing if start in keys},
+            settings.ANALYTICS_TIMESERIES_TTL,
+        )
+
+    return {
+        'metric': metric,
+        'interval': interval,
+        'labels': [start.isoformat() for start in buckets],
+        'data': [counts[start] for start in buckets],
+    }
@@ -8,10 +8,17 @@ app_name = 'analytics'
 
 urlpatterns = [
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('api/dashboard/', views.DashboardDataView.as_view(), name='api_dashboard'),
     path('api/kpis/', views.KPIDataView.as_view(), name='api_kpis'),
     path('api/country-breakdown/', views.CountryBreakdownView.as_view(), name='api_country_breakdown'),
     path('api/stage-breakdown/', views.StageBreakdownView.as_view(), name='api_stage_breakdown'),
     path('api/score-distribution/', views.ScoreDistributionView.as_view(), name='api_score_distribution'),
+    path('api/histogram/', views.HistogramView.as_view(), name='api_histogram'),
+    path('api/funnel/', views.FunnelView.as_view(), name='api_funnel'),
+    path('api/stage-velocity/', views.StageVelocityView.as_view(), name='api_stage_velocity'),
+    path('api/timeseries/', views.TimeSeriesView.as_view(), name='api_timeseries'),
+    path('api/leaderboard/', views.LeaderboardView.as_view(), name='api_leaderboard'),
+    path('api/usage/', views.UsageSummaryView.as_view(), name='api_usage'),
     path('api/top-leads/', views.TopLeadsView.as_view(), name='api_top_leads'),
     path('api/stale-leads/', views.StaleLeadsView.as_view(), name='api_stale_leads'),
 ]
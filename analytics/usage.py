@@ -0,0 +1,32 @@
+"""
+Buffered recording of dashboard views.
+
+Requests only append to an in-process buffer (``edu_expand.buffers``); a
+daemon thread writes it with one ``bulk_create`` every
+``ANALYTICS_USAGE_FLUSH_INTERVAL`` seconds, or sooner once
+``ANALYTICS_USAGE_BUFFER_SIZE`` events are waiting. Events still buffered when
+a process is killed are lost, which is acceptable for adoption tracking.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from edu_expand.buffers import BatchBuffer
+from .models import DashboardView
+
+
+class UsageBuffer(BatchBuffer):
+    """Buffer of ``DashboardView`` rows written with one ``bulk_create`` per batch."""
+
+    def __init__(self, flush_interval, max_size):
+        super().__init__(DashboardView.objects.bulk_create, 'dashboard-usage', flush_interval, max_size)
+
+    def add(self, user_id, ip_address=None):
+        super().add(DashboardView(user_id=user_id, ip_address=ip_address, viewed_at=timezone.now()))
+
+
+dashboard_views = UsageBuffer(settings.ANALYTICS_USAGE_FLUSH_INTERVAL, settings.ANALYTICS_USAGE_BUFFER_SIZE)
+
+
+def record_dashboard_view(request):
+    """Queue a dashboard view for ``request.user`` (written inline only when buffering is disabled)."""
+    dashboard_views.add(request.user.pk, request.META.get('REMOTE_ADDR') or None)
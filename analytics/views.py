@@ -1,15 +1,26 @@
 """
 Analytics views.
 """
+from datetime import date
+
 from django.shortcuts import render
 from django.views.generic import TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.http import JsonResponse, HttpResponseForbidden
+from django.conf import settings
 from django.db.models import Count, Q, Avg
 from django.utils import timezone
-from datetime import timedelta
 
 from crm.models import Prospect, Interaction
+from .cache import cached_widget
+from .models import ProspectDailyRollup
+from .timeseries import time_series
+from .usage import record_dashboard_view
+from .services import (
+    scoped_rollups, scoped_prospects, kpi_summary, country_breakdown, stage_breakdown,
+    score_distribution, top_leads, stale_leads, dashboard_payload, histogram,
+    validate_histogram, stage_funnel, stage_velocity, leaderboard, usage_summary, DASHBOARD_WIDGETS,
+)
 
 
 class CommercialRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -31,6 +42,7 @@ class DashboardView(CommercialRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        record_dashboard_view(self.request)
         
         # Get filter parameters
         date_from = self.request.GET.get('date_from')
@@ -76,166 +88,172 @@ class KPIDataView(CommercialRequiredMixin, View):
     """Get KPI data (AJAX)."""
     
     def get(self, request):
-        queryset = Prospect.objects.all()
-        
-        # Commercial users see only their prospects
-        if not request.user.is_admin():
-            queryset = queryset.filter(owner=request.user)
-        
-        # Filters
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        
-        if date_from:
-            queryset = queryset.filter(created_at__gte=date_from)
-        
-        if date_to:
-            queryset = queryset.filter(created_at__lte=date_to)
-        
-        total_prospects = queryset.count()
-        
-        # Stage breakdown
-        stage_breakdown = queryset.values('stage').annotate(count=Count('id'))
-        
-        # Converted prospects
-        converted = queryset.filter(stage='converted').count()
-        
-        # Demos scheduled
-        demos_scheduled = queryset.filter(stage='demo_scheduled').count()
-        
-        # Response rate (prospects with at least one interaction)
-        responded = queryset.filter(interactions__isnull=False).distinct().count()
-        response_rate = (responded / total_prospects * 100) if total_prospects > 0 else 0
-        
-        # High priority count
-        high_priority = queryset.filter(priority_level='high').count()
-        
-        return JsonResponse({
-            'total_prospects': total_prospects,
-            'converted': converted,
-            'demos_scheduled': demos_scheduled,
-            'response_rate': round(response_rate, 1),
-            'high_priority': high_priority,
-            'stage_breakdown': list(stage_breakdown),
-            'conversion_rate': round((converted / total_prospects * 100), 1) if total_prospects > 0 else 0,
-        })
+        # All KPIs come from one conditional-aggregation query over the rollups
+        return JsonResponse(kpi_summary(scoped_rollups(request.user, request.GET)))
+
+
+class DashboardDataView(CommercialRequiredMixin, View):
+    """Get several dashboard widgets in one response (AJAX).
+
+    ``?widgets=kpis,country`` selects widgets; all of them are returned by default.
+    """
+    
+    def get(self, request):
+        requested = [widget for widget in request.GET.get('widgets', '').split(',') if widget]
+        unknown = set(requested) - set(DASHBOARD_WIDGETS)
+        if unknown:
+            return JsonResponse({'error': f'Unknown widgets: {", ".join(sorted(unknown))}'}, status=400)
+        widgets = [widget for widget in DASHBOARD_WIDGETS if not requested or widget in requested]
+        
+        return JsonResponse(cached_widget(
+            'dashboard:' + ','.join(widgets), request.user, request.GET,
+            lambda: dashboard_payload(request.user, request.GET, widgets),
+        ))
 
 
 class CountryBreakdownView(CommercialRequiredMixin, View):
     """Get country breakdown (AJAX)."""
     
     def get(self, request):
-        queryset = Prospect.objects.all()
-        
-        if not request.user.is_admin():
-            queryset = queryset.filter(owner=request.user)
-        
-        breakdown = queryset.values('country').annotate(count=Count('id')).order_by('-count')
-        
         # Format for Chart.js
-        countries = [item['country'] for item in breakdown]
-        counts = [item['count'] for item in breakdown]
-        
-        return JsonResponse({
-            'labels': countries,
-            'data': counts,
-        })
+        return JsonResponse(cached_widget(
+            'country', request.user, request.GET,
+            lambda: country_breakdown(scoped_rollups(request.user, request.GET)),
+        ))
 
 
 class StageBreakdownView(CommercialRequiredMixin, View):
     """Get stage breakdown (AJAX)."""
     
     def get(self, request):
-        queryset = Prospect.objects.all()
-        
-        if not request.user.is_admin():
-            queryset = queryset.filter(owner=request.user)
-        
-        stages = [
-            Prospect.NEW,
-            Prospect.CONTACTED,
-            Prospect.ENGAGED,
-            Prospect.INTERESTED,
-            Prospect.DEMO_SCHEDULED,
-            Prospect.DEMO_DONE,
-            Prospect.CONVERTED,
-            Prospect.LOST,
-        ]
-        
-        data = []
-        labels = []
-        
-        for stage in stages:
-            count = queryset.filter(stage=stage).count()
-            data.append(count)
-            labels.append(dict(Prospect.STAGE_CHOICES).get(stage, stage))
-        
-        return JsonResponse({
-            'labels': labels,
-            'data': data,
-        })
+        return JsonResponse(cached_widget(
+            'stage', request.user, request.GET,
+            lambda: stage_breakdown(scoped_rollups(request.user, request.GET)),
+        ))
 
 
 class ScoreDistributionView(CommercialRequiredMixin, View):
     """Get score distribution (AJAX)."""
     
     def get(self, request):
-        queryset = Prospect.objects.all()
-        
-        if not request.user.is_admin():
-            queryset = queryset.filter(owner=request.user)
-        
-        # Bin scores into ranges
-        bins = {
-            '0-20': queryset.filter(score__lt=20).count(),
-            '20-40': queryset.filter(score__gte=20, score__lt=40).count(),
-            '40-60': queryset.filter(score__gte=40, score__lt=60).count(),
-            '60-80': queryset.filter(score__gte=60, score__lt=80).count(),
-            '80-100': queryset.filter(score__gte=80).count(),
-        }
-        
-        return JsonResponse({
-            'labels': list(bins.keys()),
-            'data': list(bins.values()),
-        })
+        return JsonResponse(cached_widget(
+            'score', request.user, request.GET,
+            lambda: score_distribution(scoped_rollups(request.user, request.GET)),
+        ))
+
+
+class HistogramView(CommercialRequiredMixin, View):
+    """Get a histogram over a prospect field (AJAX).
+
+    ``?field=score&bin_width=10&split=country`` plus the usual dashboard filters.
+    """
+    
+    def get(self, request):
+        field = request.GET.get('field', 'score')
+        split = request.GET.get('split') or None
+        try:
+            bin_width = int(request.GET.get('bin_width', ProspectDailyRollup.SCORE_BUCKET_SIZE))
+            validate_histogram(field, bin_width, split)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        return JsonResponse(cached_widget(
+            f'histogram:{field}:{bin_width}:{split}', request.user, request.GET,
+            lambda: histogram(request.user, request.GET, field, bin_width, split),
+        ))
+
+
+class FunnelView(CommercialRequiredMixin, View):
+    """Get the conversion funnel from the stage transition log (AJAX)."""
+    
+    def get(self, request):
+        return JsonResponse(cached_widget(
+            'funnel', request.user, request.GET,
+            lambda: stage_funnel(scoped_prospects(request.user, request.GET)),
+        ))
+
+
+class StageVelocityView(CommercialRequiredMixin, View):
+    """Get average time spent in each stage (AJAX)."""
+    
+    def get(self, request):
+        return JsonResponse(cached_widget(
+            'velocity', request.user, request.GET,
+            lambda: stage_velocity(scoped_prospects(request.user, request.GET)),
+        ))
+
+
+class TimeSeriesView(CommercialRequiredMixin, View):
+    """Get event counts over time (AJAX).
+
+    ``?metric=prospects|interactions|emails|conversions&interval=day|week|month``
+    plus the usual dashboard filters.
+    """
+    
+    def get(self, request):
+        try:
+            data = time_series(request.user, request.GET, request.GET.get('metric', 'prospects'), request.GET.get('interval', 'day'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(data)
+
+
+class LeaderboardView(CommercialRequiredMixin, View):
+    """Get per-owner performance (AJAX, admin only).
+
+    Periods that ended before today are cached for ``ANALYTICS_TIMESERIES_TTL``
+    seconds without the version stamp, so prospect writes do not evict them;
+    open periods use the regular widget cache.
+    """
+    
+    def test_func(self):
+        return self.request.user.is_admin()
+    
+    def get(self, request):
+        params = request.GET.copy()
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            if params.get(name):
+                try:
+                    dates[name] = date.fromisoformat(params[name])
+                except ValueError:
+                    return JsonResponse({'error': f'{name} must be a YYYY-MM-DD date'}, status=400)
+                # One cache entry per date, however it was spelled
+                params[name] = dates[name].isoformat()
+        historical = 'date_to' in dates and dates['date_to'] < timezone.localdate()
+        return JsonResponse(cached_widget(
+            'leaderboard', request.user, params,
+            lambda: leaderboard(params),
+            versioned=not historical,
+            timeout=settings.ANALYTICS_TIMESERIES_TTL if historical else None,
+        ))
+
+
+class UsageSummaryView(CommercialRequiredMixin, View):
+    """Get dashboard adoption numbers (AJAX, admin only)."""
+    
+    def test_func(self):
+        return self.request.user.is_admin()
+    
+    def get(self, request):
+        return JsonResponse(cached_widget('usage', request.user, request.GET, lambda: usage_summary(request.GET)))
 
 
 class TopLeadsView(CommercialRequiredMixin, View):
     """Get top 10 high priority leads."""
     
     def get(self, request):
-        queryset = Prospect.objects.all()
-        
-        if not request.user.is_admin():
-            queryset = queryset.filter(owner=request.user)
-        
-        top_leads = queryset.filter(
-            priority_level='high'
-        ).order_by('-score').values(
-            'id', 'name', 'score', 'stage', 'country', 'email'
-        )[:10]
-        
-        return JsonResponse({
-            'leads': list(top_leads)
-        })
+        return JsonResponse(cached_widget(
+            'top_leads', request.user, {},
+            lambda: top_leads(scoped_prospects(request.user)),
+        ))
 
 
 class StaleLeadsView(CommercialRequiredMixin, View):
     """Get leads with no interaction in 30+ days."""
     
     def get(self, request):
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        queryset = Prospect.objects.all()
-        
-        if not request.user.is_admin():
-            queryset = queryset.filter(owner=request.user)
-        
-        stale_leads = queryset.filter(
-            Q(last_interaction_at__isnull=True) |
-            Q(last_interaction_at__lt=thirty_days_ago)
-        ).values('id', 'name', 'email', 'country', 'score').order_by('-created_at')[:10]
-        
-        return JsonResponse({
-            'leads': list(stale_leads)
-        })
+        return JsonResponse(cached_widget(
+            'stale_leads', request.user, {},
+            lambda: stale_leads(scoped_prospects(request.user)),
+        ))
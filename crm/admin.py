@@ -2,7 +2,8 @@
 Django admin configuration for CRM.
 """
 from django.contrib import admin
-from .models import Prospect, Interaction, Client, ProspectScoreHistory
+from .models import Prospect, Interaction, Client, ProspectScoreHistory, StageTransition
+from .services import ProspectService
 
 
 @admin.register(Prospect)
@@ -40,6 +41,11 @@ class ProspectAdmin(admin.ModelAdmin):
     
     actions = ['recalculate_score', 'mark_contacted', 'mark_interested', 'mark_lost']
     
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'stage' in form.changed_data:
+            ProspectService.record_stage_change(request.user, obj, form.initial.get('stage'), StageTransition.ADMIN)
+    
     def recalculate_score(self, request, queryset):
         for prospect in queryset:
             prospect.recalculate_score()
@@ -47,18 +53,18 @@ class ProspectAdmin(admin.ModelAdmin):
     recalculate_score.short_description = 'Recalculate score'
     
     def mark_contacted(self, request, queryset):
-        queryset.update(stage='contacted')
-        self.message_user(request, f'Marked {queryset.count()} prospects as contacted')
+        changed = ProspectService.bulk_change_stage(request.user, queryset, Prospect.CONTACTED, StageTransition.ADMIN)
+        self.message_user(request, f'Marked {changed} prospects as contacted')
     mark_contacted.short_description = 'Mark as contacted'
     
     def mark_interested(self, request, queryset):
-        queryset.update(stage='interested')
-        self.message_user(request, f'Marked {queryset.count()} prospects as interested')
+        changed = ProspectService.bulk_change_stage(request.user, queryset, Prospect.INTERESTED, StageTransition.ADMIN)
+        self.message_user(request, f'Marked {changed} prospects as interested')
     mark_interested.short_description = 'Mark as interested'
     
     def mark_lost(self, request, queryset):
-        queryset.update(stage='lost')
-        self.message_user(request, f'Marked {queryset.count()} prospects as lost')
+        changed = ProspectService.bulk_change_stage(request.user, queryset, Prospect.LOST, StageTransition.ADMIN)
+        self.message_user(request, f'Marked {changed} prospects as lost')
     mark_lost.short_description = 'Mark as lost'
 
 
@@ -90,3 +96,19 @@ class ProspectScoreHistoryAdmin(admin.ModelAdmin):
     list_filter = ('priority_level', 'created_at')
     search_fields = ('prospect__name', 'reason')
     readonly_fields = ('created_at',)
+
+
+@admin.register(StageTransition)
+class StageTransitionAdmin(admin.ModelAdmin):
+    """Read-only stage transition log."""
+    
+    list_display = ('prospect', 'from_stage', 'to_stage', 'source', 'changed_by', 'changed_at')
+    list_filter = ('to_stage', 'source', 'changed_at')
+    search_fields = ('prospect__name',)
+    raw_id_fields = ('prospect',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
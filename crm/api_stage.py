@@ -4,7 +4,7 @@ from django.shortcuts import get_object_or_404
 import json
 
 from .models import Prospect
-from accounts.models import AuditLog
+from .services import ProspectService
 
 
 
@@ -36,17 +36,6 @@ class UpdateStageAPI(View):
         if request.user.is_commercial() and prospect.owner != request.user:
             return JsonResponse({'error': 'Forbidden'}, status=403)
 
-        old_stage = prospect.stage
-        prospect.stage = new_stage
-        prospect.save()
-
-        # Log action
-        AuditLog.objects.create(
-            user=request.user,
-            action='stage_change',
-            content_type='Prospect',
-            object_id=prospect.pk,
-            object_repr=f'{prospect.name} - {old_stage} -> {new_stage}'
-        )
+        ProspectService.change_stage(request.user, prospect, new_stage)
 
         return JsonResponse({'status': 'ok', 'stage': new_stage, 'label': dict(Prospect.STAGE_CHOICES).get(new_stage)})
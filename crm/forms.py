@@ -4,6 +4,8 @@ CRM forms.
 from django import forms
 from django.conf import settings
 from .models import Prospect, Interaction, Client
+from enrichment.models import ImportJob, ColumnMapping
+from enrichment.readers import get_reader
 
 
 class ProspectForm(forms.ModelForm):
@@ -130,20 +132,42 @@ class BulkActionForm(forms.Form):
 
 
 class ProspectImportForm(forms.Form):
-    """Form for importing prospects via CSV."""
+    """Form for importing prospects via CSV, XLSX or Parquet."""
     
     csv_file = forms.FileField(
-        label='CSV File',
-        help_text='Upload CSV with columns: name, email, phone, country, city, contact_name, contact_role'
+        label='Import File',
+        help_text='Upload CSV, XLSX or Parquet with columns: name, email, phone, country, city, contact_name, contact_role'
     )
     owner = forms.ModelChoiceField(
         queryset=None,
         label='Default Owner',
         help_text='Assign all imported prospects to this owner'
     )
+    strategy = forms.ChoiceField(
+        choices=ImportJob.STRATEGY_CHOICES,
+        initial=ImportJob.SKIP,
+        label='Existing Prospects',
+        help_text='What to do when a row matches an existing prospect by email'
+    )
+    column_mapping = forms.ModelChoiceField(
+        queryset=ColumnMapping.objects.all(),
+        required=False,
+        label='Column Mapping',
+        help_text='Saved mapping for the source of this file (leave empty if columns already match)'
+    )
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         from django.contrib.auth import get_user_model
         User = get_user_model()
         self.fields['owner'].queryset = User.objects.filter(role='commercial')
+    
+    def clean_csv_file(self):
+        csv_file = self.cleaned_data['csv_file']
+        try:
+            get_reader(csv_file.name)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+        if csv_file.size > settings.IMPORT_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(f'File exceeds the {settings.IMPORT_MAX_UPLOAD_SIZE // (1024 * 1024)} MB import limit')
+        return csv_file
@@ -18,7 +18,7 @@ from faker import Faker
 from django.contrib.auth import get_user_model
 from accounts.models import AuditLog
 from crm.models import Prospect, Interaction, Client
-from emails.models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog
+from emails.models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailBody, EmailLog
 
 User = get_user_model()
 faker = Faker()
@@ -147,12 +147,13 @@ class Command(BaseCommand):
             prospects.append(prospect)
 
         # Enroll some prospects in the demo sequence and create email logs
+        body = EmailBody.store([template.body_text])[template.body_text]
         for i, prospect in enumerate(prospects[: max(5, prospect_count//4)]):
             enrollment, created = Enrollment.objects.get_or_create(prospect=prospect, sequence=sequence)
             if created:
                 AuditLog.objects.create(user=admin, action='demo_seed', content_type='Enrollment', object_id=enrollment.pk, object_repr=str(enrollment))
             # Create an EmailLog
-            log = EmailLog.objects.create(prospect=prospect, to_email=prospect.email, subject=template.subject, body_snapshot=template.body_text, status='sent', sent_at=timezone.now(), sent_by=admin)
+            log = EmailLog.objects.create(prospect=prospect, to_email=prospect.email, subject=template.subject, body=body, status='sent', sent_at=timezone.now(), sent_by=admin)
             AuditLog.objects.create(user=admin, action='demo_seed', content_type='EmailLog', object_id=log.pk, object_repr=str(log))
 
         # Interactions
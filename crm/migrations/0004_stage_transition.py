@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_rename_crm_client_country_idx_crm_client_country_22324b_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_stage', models.CharField(choices=[('new', 'New'), ('contacted', 'Contacted'), ('engaged', 'Engaged/Responded'), ('interested', 'Interested'), ('demo_scheduled', 'Demo Scheduled'), ('demo_done', 'Demo Done'), ('converted', 'Converted'), ('lost', 'Lost')], max_length=20, verbose_name='from stage')),
+                ('to_stage', models.CharField(choices=[('new', 'New'), ('contacted', 'Contacted'), ('engaged', 'Engaged/Responded'), ('interested', 'Interested'), ('demo_scheduled', 'Demo Scheduled'), ('demo_done', 'Demo Done'), ('converted', 'Converted'), ('lost', 'Lost')], max_length=20, verbose_name='to stage')),
+                ('source', models.CharField(choices=[('manual', 'Manual'), ('interaction', 'Interaction'), ('bulk', 'Bulk action'), ('admin', 'Admin')], default='manual', max_length=20, verbose_name='source')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='changed at')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('prospect', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_transitions', to='crm.prospect')),
+            ],
+            options={
+                'ordering': ['changed_at'],
+                'indexes': [models.Index(fields=['prospect', 'changed_at'], name='crm_stagetr_prospec_3b84ba_idx'), models.Index(fields=['to_stage', 'changed_at'], name='crm_stagetr_to_stag_d03f97_idx')],
+            },
+        ),
+    ]
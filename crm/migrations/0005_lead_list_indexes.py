@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_stage_transition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(condition=models.Q(('priority_level', 'high')), fields=['-score'], name='prospect_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(condition=models.Q(('priority_level', 'high')), fields=['owner', '-score'], name='prospect_owner_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(condition=models.Q(('last_interaction_at__isnull', True)), fields=['-created_at'], name='prospect_uncontacted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(condition=models.Q(('last_interaction_at__isnull', True)), fields=['owner', '-created_at'], name='prospect_owner_uncontacted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(fields=['-created_at', 'last_interaction_at'], name='prospect_lapsed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(fields=['owner', '-created_at', 'last_interaction_at'], name='prospect_owner_lapsed_idx'),
+        ),
+    ]
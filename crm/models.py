@@ -199,6 +199,15 @@ class Prospect(models.Model):
             models.Index(fields=['priority_level']),
             models.Index(fields=['owner']),
             models.Index(fields=['-created_at']),
+            # Top leads: high priority ordered by score, optionally per owner
+            models.Index(fields=['-score'], condition=models.Q(priority_level='high'), name='prospect_top_idx'),
+            models.Index(fields=['owner', '-score'], condition=models.Q(priority_level='high'), name='prospect_owner_top_idx'),
+            # Stale leads: never contacted, newest first
+            models.Index(fields=['-created_at'], condition=models.Q(last_interaction_at__isnull=True), name='prospect_uncontacted_idx'),
+            models.Index(fields=['owner', '-created_at'], condition=models.Q(last_interaction_at__isnull=True), name='prospect_owner_uncontacted_idx'),
+            # Stale leads: contacted long ago, newest first (filter checked in the index)
+            models.Index(fields=['-created_at', 'last_interaction_at'], name='prospect_lapsed_idx'),
+            models.Index(fields=['owner', '-created_at', 'last_interaction_at'], name='prospect_owner_lapsed_idx'),
         ]
     
     def __str__(self):
@@ -328,3 +337,52 @@ class ProspectScoreHistory(models.Model):
     
     def __str__(self):
         return f"{self.prospect.name} - Score: {self.score}"
+
+
+class StageTransition(models.Model):
+    """Append-only log of prospect stage changes, used for funnel analytics."""
+    
+    # Where the change came from
+    MANUAL = 'manual'
+    INTERACTION = 'interaction'
+    BULK = 'bulk'
+    ADMIN = 'admin'
+    
+    SOURCE_CHOICES = [
+        (MANUAL, _('Manual')),
+        (INTERACTION, _('Interaction')),
+        (BULK, _('Bulk action')),
+        (ADMIN, _('Admin')),
+    ]
+    
+    prospect = models.ForeignKey(
+        Prospect,
+        on_delete=models.CASCADE,
+        related_name='stage_transitions'
+    )
+    from_stage = models.CharField(_('from stage'), max_length=20, choices=Prospect.STAGE_CHOICES)
+    to_stage = models.CharField(_('to stage'), max_length=20, choices=Prospect.STAGE_CHOICES)
+    source = models.CharField(_('source'), max_length=20, choices=SOURCE_CHOICES, default=MANUAL)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    changed_at = models.DateTimeField(_('changed at'), default=timezone.now)
+    
+    class Meta:
+        ordering = ['changed_at']
+        indexes = [
+            models.Index(fields=['prospect', 'changed_at']),
+            models.Index(fields=['to_stage', 'changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.prospect.name}: {self.from_stage} -> {self.to_stage}"
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Stage transitions are append-only')
+        super().save(*args, **kwargs)
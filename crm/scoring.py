@@ -1,12 +1,55 @@
 """
 Scoring system for prospects.
 """
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from .models import Prospect, Interaction
 
+# Interaction facts for a prospect with no interactions (e.g. one just imported)
+NO_INTERACTIONS = {'has_email': False, 'has_call': False, 'has_positive': False, 'recent': 0}
 
-def calculate_score(prospect):
+
+def get_interaction_stats(prospect):
+    """Interaction facts used by scoring for one prospect."""
+    interactions = prospect.interactions.all()
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    return {
+        'has_email': interactions.filter(interaction_type=Interaction.EMAIL).exists(),
+        'has_call': interactions.filter(interaction_type=Interaction.CALL).exists(),
+        'has_positive': interactions.filter(outcome=Interaction.POSITIVE).exists(),
+        'recent': interactions.filter(date__gte=thirty_days_ago).count(),
+    }
+
+
+def bulk_interaction_stats(prospects):
+    """Interaction facts for many prospects in one query: ``{prospect_id: stats}``.
+
+    Prospects without interactions are missing from the result; use ``NO_INTERACTIONS``.
+    """
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    rows = (
+        Interaction.objects.filter(prospect__in=[prospect.pk for prospect in prospects])
+        .values('prospect_id')
+        .annotate(
+            emails=Count('pk', filter=Q(interaction_type=Interaction.EMAIL)),
+            calls=Count('pk', filter=Q(interaction_type=Interaction.CALL)),
+            positive=Count('pk', filter=Q(outcome=Interaction.POSITIVE)),
+            recent=Count('pk', filter=Q(date__gte=thirty_days_ago)),
+        )
+    )
+    return {
+        row['prospect_id']: {
+            'has_email': row['emails'] > 0,
+            'has_call': row['calls'] > 0,
+            'has_positive': row['positive'] > 0,
+            'recent': row['recent'],
+        }
+        for row in rows
+    }
+
+
+def calculate_score(prospect, stats=None):
     """
     Calculate prospect score based on rules.
     
@@ -29,6 +72,9 @@ def calculate_score(prospect):
       * Has call: +5 points
     - Penalty: No interaction for 30+ days: -30 points
     
+    ``stats`` are precomputed interaction facts (see ``bulk_interaction_stats``);
+    they are queried for this prospect when omitted.
+
     Returns: (score, priority_level)
     """
     score = 0
@@ -66,23 +112,23 @@ def calculate_score(prospect):
     score += stage_weights.get(prospect.stage, 0)
     
     # 5. Interactions
-    interactions = prospect.interactions.all()
+    if stats is None:
+        stats = get_interaction_stats(prospect)
     
     # Has email
-    if interactions.filter(interaction_type=Interaction.EMAIL).exists():
+    if stats['has_email']:
         score += 10
     
     # Has call
-    if interactions.filter(interaction_type=Interaction.CALL).exists():
+    if stats['has_call']:
         score += 5
     
     # Has positive outcome
-    if interactions.filter(outcome=Interaction.POSITIVE).exists():
+    if stats['has_positive']:
         score += 15
     
     # Count recent interactions (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_interactions = interactions.filter(date__gte=thirty_days_ago).count()
+    recent_interactions = stats['recent']
     if recent_interactions >= 3:
         score += 10
     elif recent_interactions >= 1:
@@ -111,10 +157,11 @@ def calculate_score(prospect):
     return score, priority
 
 
-def get_score_breakdown(prospect):
+def get_score_breakdown(prospect, stats=None):
     """
     Get a detailed breakdown of the prospect's score.
     Returns a dict with component scores and reasons.
+    ``stats`` works as in ``calculate_score``.
     """
     breakdown = {}
     
@@ -178,24 +225,24 @@ def get_score_breakdown(prospect):
     }
     
     # Interactions
-    interactions = prospect.interactions.all()
+    if stats is None:
+        stats = get_interaction_stats(prospect)
     interaction_points = 0
     interaction_reasons = []
     
-    if interactions.filter(interaction_type=Interaction.EMAIL).exists():
+    if stats['has_email']:
         interaction_points += 10
         interaction_reasons.append('Email interaction')
     
-    if interactions.filter(interaction_type=Interaction.CALL).exists():
+    if stats['has_call']:
         interaction_points += 5
         interaction_reasons.append('Call interaction')
     
-    if interactions.filter(outcome=Interaction.POSITIVE).exists():
+    if stats['has_positive']:
         interaction_points += 15
         interaction_reasons.append('Positive outcome')
     
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_interactions = interactions.filter(date__gte=thirty_days_ago).count()
+    recent_interactions = stats['recent']
     if recent_interactions >= 3:
         interaction_points += 10
         interaction_reasons.append('3+ interactions in 30 days')
@@ -4,13 +4,17 @@ CRM service layer.
 Keep business logic out of views and models when it makes sense
 so views/controllers remain thin and easy to test.
 """
+from django.db import transaction
 from django.db.models import Q
 from .models import Prospect
 from .models import Interaction
+from .models import StageTransition
+from .scoring import NO_INTERACTIONS, bulk_interaction_stats, calculate_score, get_score_breakdown
 from accounts.models import AuditLog
 from emails.models import Enrollment, EmailLog
-import csv
-import io
+from enrichment.models import ImportJob
+from enrichment.readers import get_reader, apply_column_mapping
+from analytics.rollups import schedule_rollup_refresh, schedule_prospect_refresh, prospect_day
 from django.utils import timezone
 
 
@@ -78,6 +82,61 @@ class ProspectService:
             raise Prospect.DoesNotExist
         return prospect
 
+    @staticmethod
+    def record_stage_change(user, prospect, from_stage, source=StageTransition.MANUAL):
+        """Log a stage change that has already been saved on ``prospect``.
+
+        Returns the new ``StageTransition``, or None when the stage did not change.
+        """
+        if from_stage == prospect.stage:
+            return None
+        return StageTransition.objects.create(
+            prospect=prospect,
+            from_stage=from_stage,
+            to_stage=prospect.stage,
+            source=source,
+            changed_by=user,
+        )
+
+    @staticmethod
+    def change_stage(user, prospect, stage, source=StageTransition.MANUAL):
+        """Move ``prospect`` to ``stage``, logging the transition and an audit entry."""
+        old_stage = prospect.stage
+        if old_stage == stage:
+            return None
+        prospect.stage = stage
+        prospect.save()
+        transition = ProspectService.record_stage_change(user, prospect, old_stage, source)
+        AuditLog.objects.create(
+            user=user,
+            action='stage_change',
+            content_type='Prospect',
+            object_id=prospect.pk,
+            object_repr=f'{prospect.name} - {old_stage} -> {stage}',
+            changes={'stage': [old_stage, stage]},
+        )
+        return transition
+
+    @staticmethod
+    def bulk_change_stage(user, queryset, stage, source=StageTransition.BULK):
+        """Move every prospect in ``queryset`` to ``stage`` with one UPDATE.
+
+        Transitions are written with ``bulk_create`` for the prospects whose stage
+        actually changes. Returns the number of prospects moved.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            changing = queryset.exclude(stage=stage)
+            transitions = [
+                StageTransition(prospect_id=pk, from_stage=old_stage, to_stage=stage, source=source, changed_by=user, changed_at=now)
+                for pk, old_stage in changing.values_list('pk', 'stage')
+            ]
+            changing = Prospect.objects.filter(pk__in=[transition.prospect_id for transition in transitions])
+            schedule_prospect_refresh(changing)
+            changing.update(stage=stage, updated_at=now)
+            StageTransition.objects.bulk_create(transitions)
+        return len(transitions)
+
     @staticmethod
     def add_interaction(user, prospect, interaction_type, summary, outcome):
         """Add an interaction and run side-effects (update prospect stage/score, audit)."""
@@ -91,9 +150,11 @@ class ProspectService:
 
         # Update prospect's last interaction and stage
         prospect.last_interaction_at = inter.date
+        old_stage = prospect.stage
         if outcome == Interaction.POSITIVE and prospect.stage in [Prospect.NEW, Prospect.CONTACTED]:
             prospect.stage = Prospect.ENGAGED
         prospect.save()
+        ProspectService.record_stage_change(user, prospect, old_stage, StageTransition.INTERACTION)
 
         # Recalculate score
         try:
@@ -106,46 +167,175 @@ class ProspectService:
         return inter
 
     @staticmethod
-    def import_from_file(user, csv_file, owner=None):
-        """Import prospects from a CSV file-like object. Returns a result dict.
+    def import_from_file(user, csv_file, owner=None, strategy=ImportJob.SKIP, column_mapping=None, error_report=None):
+        """Import prospects from an uploaded file-like object. Returns a result dict.
+
+        The file format is picked from the file name (CSV, XLSX or Parquet, see
+        ``enrichment.readers``) and rows are streamed in batches of
+        ``IMPORT_CHUNK_SIZE``. ``column_mapping`` renames source columns to
+        Prospect fields before validation.
 
-        This method is intentionally simple for demo purposes. It validates basic fields
-        and creates prospects idempotently by email.
+        Rows are matched to existing prospects by email: one query loads each
+        chunk's existing prospects, new rows are inserted with ``bulk_create`` and
+        changed rows are written with a single ``bulk_update``. ``strategy`` decides
+        what happens to existing prospects (see ``ImportJob.STRATEGY_CHOICES``).
+        Only prospects whose scoring inputs changed are re-scored.
+
+        Rejected rows go to ``error_report`` (an ``enrichment.services.ImportErrorReport``)
+        when one is given; otherwise their messages are collected in ``result['errors']``.
         """
-        result = {'imported': 0, 'failed': 0, 'errors': []}
+        result = {'imported': 0, 'updated': 0, 'skipped': 0, 'failed': 0, 'errors': []}
         try:
-            csv_file.seek(0)
-            reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding='utf-8'))
-            required_fields = ['name', 'email', 'country']
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    for field in required_fields:
-                        if not row.get(field, '').strip():
-                            raise ValueError(f'Missing required field: {field}')
-
-                    email = row.get('email').strip()
-                    defaults = {
-                        'name': row.get('name').strip(),
-                        'country': row.get('country').strip()[:2].upper(),
-                        'city': row.get('city', '').strip(),
-                        'contact_name': row.get('contact_name', '').strip(),
-                        'contact_role': row.get('contact_role', '').strip(),
-                        'phone': row.get('phone', '').strip(),
-                        'website': row.get('website', '').strip() or '',
-                        'type_of_establishment': row.get('type_of_establishment', Prospect.OTHER).strip(),
-                        'owner': owner,
-                        'source': Prospect.IMPORT,
-                        'stage': Prospect.NEW,
-                    }
-
-                    prospect, created = Prospect.objects.get_or_create(email=email, defaults=defaults)
-                    if created:
-                        prospect.recalculate_score()
-                        AuditLog.objects.create(user=user, action='demo_seed', content_type='Prospect', object_id=prospect.pk, object_repr=str(prospect))
-                        result['imported'] += 1
-                except Exception as e:
-                    result['failed'] += 1
-                    result['errors'].append(f'Row {row_num}: {str(e)}')
+            reader = get_reader(getattr(csv_file, 'name', ''))
+            row_num = 1  # header row
+            for batch in reader.iter_batches(csv_file, IMPORT_CHUNK_SIZE):
+                chunk = []
+                for row in batch:
+                    row_num += 1
+                    try:
+                        chunk.append((row_num, row) + _parse_import_row(apply_column_mapping(row, column_mapping)))
+                    except Exception as e:
+                        _reject_row(result, error_report, row_num, row, str(e))
+                if chunk:
+                    _import_chunk(user, chunk, owner, strategy, result, error_report)
         except Exception as e:
             result['errors'].append(str(e))
         return result
+
+
+# Number of rows handled per bulk query round-trip.
+IMPORT_CHUNK_SIZE = 500
+
+# Columns copied from the CSV onto Prospect (email is the match key).
+IMPORT_FIELDS = [
+    'name', 'country', 'city', 'contact_name', 'contact_role',
+    'phone', 'website', 'type_of_establishment',
+]
+
+# Fields read by scoring.calculate_score; a change to any of them triggers a re-score.
+SCORING_INPUT_FIELDS = {'country', 'type_of_establishment', 'contact_role'}
+
+SCORE_FIELDS = ['score', 'priority_level', 'score_breakdown', 'score_last_calculated_at']
+
+
+def _parse_import_row(row):
+    """Validate a CSV row and return ``(email, values)``; blank columns are omitted."""
+    for field in ['name', 'email', 'country']:
+        if not (row.get(field) or '').strip():
+            raise ValueError(f'Missing required field: {field}')
+
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = (row.get(field) or '').strip()
+        if field == 'country':
+            value = value[:2].upper()
+        if value:
+            values[field] = value
+    return row['email'].strip(), values
+
+
+def _is_blank(field, value):
+    # ``other`` is the model default, so treat it as "not filled in yet"
+    return not value or (field == 'type_of_establishment' and value == Prospect.OTHER)
+
+
+def _merge_import_values(prospect, values, strategy):
+    """Apply incoming values to ``prospect`` in memory; return the set of changed fields."""
+    changed = set()
+    for field, value in values.items():
+        current = getattr(prospect, field)
+        if strategy == ImportJob.FILL_BLANKS and not _is_blank(field, current):
+            continue
+        if current != value:
+            setattr(prospect, field, value)
+            changed.add(field)
+    return changed
+
+
+def _rescore(created, updated):
+    """Recalculate scores in memory and persist them with one bulk_update.
+
+    New prospects have no interactions yet; the interaction facts of updated
+    ones are fetched in a single query, so the cost per row stays flat.
+    """
+    now = timezone.now()
+    stats = bulk_interaction_stats(updated) if updated else {}
+    for prospect in created + updated:
+        prospect_stats = stats.get(prospect.pk, NO_INTERACTIONS)
+        prospect.score, prospect.priority_level = calculate_score(prospect, prospect_stats)
+        try:
+            prospect.score_breakdown = get_score_breakdown(prospect, prospect_stats)
+        except Exception:
+            prospect.score_breakdown = {}
+        prospect.score_last_calculated_at = now
+    Prospect.objects.bulk_update(created + updated, SCORE_FIELDS)
+
+
+def _reject_row(result, error_report, row_num, row, reason):
+    result['failed'] += 1
+    if error_report is not None:
+        error_report.add(row_num, row, reason)
+    else:
+        result['errors'].append(f'Row {row_num}: {reason}')
+
+
+def _import_chunk(user, chunk, owner, strategy, result, error_report=None):
+    """Diff a chunk of parsed rows against the database and write it in bulk."""
+    existing = {p.email: p for p in Prospect.objects.filter(email__in={email for _, _, email, _ in chunk})}
+    to_create = {}
+    changed = {}
+    skipped = 0
+
+    for _, _, email, values in chunk:
+        prospect = existing.get(email) or to_create.get(email)
+        if prospect is None:
+            to_create[email] = Prospect(
+                email=email,
+                owner=owner,
+                source=Prospect.IMPORT,
+                stage=Prospect.NEW,
+                **{'type_of_establishment': Prospect.OTHER, **values},
+            )
+            continue
+        fields = set() if strategy == ImportJob.SKIP else _merge_import_values(prospect, values, strategy)
+        if fields and email in existing:
+            changed.setdefault(email, set()).update(fields)
+        else:
+            # Unchanged, skipped by strategy, or a repeat of a row created in this chunk
+            skipped += 1
+
+    try:
+        with transaction.atomic():
+            created = Prospect.objects.bulk_create(list(to_create.values()))
+            updated = [existing[email] for email in changed]
+            if updated:
+                now = timezone.now()
+                for prospect in updated:
+                    prospect.updated_at = now
+                update_fields = set().union(*changed.values())
+                Prospect.objects.bulk_update(updated, sorted(update_fields) + ['updated_at'])
+
+            rescore = [existing[email] for email, fields in changed.items() if fields & SCORING_INPUT_FIELDS]
+            if created or rescore:
+                _rescore(created, rescore)
+
+            # bulk writes skip model signals, so refresh the analytics rollups explicitly
+            schedule_rollup_refresh(prospect_day(p) for p in created + updated)
+
+            AuditLog.objects.bulk_create(
+                [AuditLog(user=user, action='demo_seed', content_type='Prospect', object_id=p.pk, object_repr=str(p)) for p in created]
+                + [
+                    AuditLog(user=user, action='update', content_type='Prospect', object_id=p.pk, object_repr=str(p),
+                             changes={'fields': sorted(changed[p.email]), 'source': 'import'})
+                    for p in updated
+                ]
+            )
+    except Exception as e:
+        # The chunk's transaction rolled back, so every row in it is rejected
+        for row_num, row, _, _ in chunk:
+            _reject_row(result, error_report, row_num, row, str(e))
+        return
+
+    result['imported'] += len(created)
+    result['updated'] += len(updated)
+    result['skipped'] += skipped
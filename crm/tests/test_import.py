@@ -1,8 +1,11 @@
 import io
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from accounts.models import User
 from crm.services import ProspectService
 from crm.models import Prospect
+from enrichment.models import ImportJob
 
 
 class ImportCSVTestCase(TestCase):
@@ -17,3 +20,42 @@ Test School,testschool@example.com,NG,Lagos,Principal"""
         self.assertEqual(result['imported'], 1)
         self.assertEqual(result['failed'], 0)
         self.assertTrue(Prospect.objects.filter(email='testschool@example.com').exists())
+
+    def test_queries_do_not_grow_with_new_rows(self):
+        def queries_for(rows, start):
+            lines = ['name,email,country'] + [f'School {i},school{i}@example.com,NG' for i in range(start, start + rows)]
+            with CaptureQueriesContext(connection) as ctx:
+                result = self._import('\n'.join(lines), ImportJob.SKIP)
+            self.assertEqual(result['imported'], rows)
+            return len(ctx)
+
+        # New prospects are scored without per-row interaction queries
+        self.assertEqual(queries_for(2, 0), queries_for(20, 100))
+
+    def _import(self, csv_content, strategy):
+        file_obj = io.BytesIO(csv_content.encode('utf-8'))
+        return ProspectService.import_from_file(self.user, file_obj, owner=self.user, strategy=strategy)
+
+    def test_strategies_for_existing_prospects(self):
+        Prospect.objects.create(name='Old Name', email='merge@example.com', country='NG', city='', contact_role='Teacher', owner=self.user)
+        csv_content = """name,email,country,city,contact_role
+New Name,merge@example.com,NG,Abuja,Director"""
+
+        result = self._import(csv_content, ImportJob.SKIP)
+        self.assertEqual((result['imported'], result['updated'], result['skipped']), (0, 0, 1))
+        self.assertEqual(Prospect.objects.get(email='merge@example.com').name, 'Old Name')
+
+        result = self._import(csv_content, ImportJob.FILL_BLANKS)
+        self.assertEqual(result['updated'], 1)
+        prospect = Prospect.objects.get(email='merge@example.com')
+        self.assertEqual((prospect.name, prospect.city, prospect.contact_role), ('Old Name', 'Abuja', 'Teacher'))
+
+        result = self._import(csv_content, ImportJob.UPDATE)
+        self.assertEqual(result['updated'], 1)
+        prospect = Prospect.objects.get(email='merge@example.com')
+        self.assertEqual((prospect.name, prospect.contact_role), ('New Name', 'Director'))
+        # contact_role is a scoring input, so the prospect was re-scored
+        self.assertIsNotNone(prospect.score_last_calculated_at)
+
+        result = self._import(csv_content, ImportJob.UPDATE)
+        self.assertEqual((result['updated'], result['skipped']), (0, 1))
@@ -1,8 +1,8 @@
 from django.test import TestCase
 from django.utils import timezone
 from accounts.models import User
-from crm.models import Prospect
-from crm.scoring import calculate_score, get_score_breakdown
+from crm.models import Interaction, Prospect
+from crm.scoring import NO_INTERACTIONS, bulk_interaction_stats, calculate_score, get_interaction_stats, get_score_breakdown
 
 
 class ScoringTestCase(TestCase):
@@ -39,3 +39,16 @@ class ScoringTestCase(TestCase):
         prospect.recalculate_score()
         self.assertIsNotNone(prospect.score_last_calculated_at)
         self.assertIsInstance(prospect.score_breakdown, dict)
+
+    def test_bulk_interaction_stats_match_single_prospect_stats(self):
+        busy = Prospect.objects.create(name='Busy School', country='NG', email='busy@school.edu', owner=self.user)
+        quiet = Prospect.objects.create(name='Quiet School', country='NG', email='quiet@school.edu', owner=self.user)
+        Interaction.objects.create(prospect=busy, interaction_type=Interaction.EMAIL, summary='Intro')
+        Interaction.objects.create(prospect=busy, interaction_type=Interaction.CALL, outcome=Interaction.POSITIVE, summary='Call')
+
+        with self.assertNumQueries(1):
+            stats = bulk_interaction_stats([busy, quiet])
+        self.assertEqual(stats[busy.pk], get_interaction_stats(busy))
+        self.assertNotIn(quiet.pk, stats)
+        self.assertEqual(get_interaction_stats(quiet), NO_INTERACTIONS)
+        self.assertEqual(calculate_score(busy, stats[busy.pk]), calculate_score(busy))
@@ -0,0 +1,70 @@
+import json
+from datetime import timedelta
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from crm.models import Prospect, Interaction, StageTransition
+from crm.services import ProspectService
+from analytics.services import scoped_prospects, stage_funnel, stage_velocity
+
+
+class StageTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='stage@test.com', username='stage@test.com', role=User.COMMERCIAL)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.prospect = Prospect.objects.create(name='Stage School', email='stage@school.com', country='NG', owner=self.user)
+
+    def test_update_stage_api_logs_transition(self):
+        url = reverse('crm:api_update_stage', args=[self.prospect.pk])
+        resp = self.client.post(url, json.dumps({'stage': Prospect.CONTACTED}), content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        transition = self.prospect.stage_transitions.get()
+        self.assertEqual((transition.from_stage, transition.to_stage, transition.changed_by), (Prospect.NEW, Prospect.CONTACTED, self.user))
+
+    def test_interaction_auto_promote_logs_transition(self):
+        ProspectService.add_interaction(self.user, self.prospect, Interaction.CALL, 'Call', Interaction.POSITIVE)
+        ProspectService.add_interaction(self.user, self.prospect, Interaction.CALL, 'Call again', Interaction.POSITIVE)
+        self.assertEqual(
+            list(self.prospect.stage_transitions.values_list('to_stage', 'source')),
+            [(Prospect.ENGAGED, StageTransition.INTERACTION)],
+        )
+
+    def test_bulk_change_stage_logs_only_changed_prospects(self):
+        other = Prospect.objects.create(name='Other', email='other@school.com', country='NG', owner=self.user, stage=Prospect.LOST)
+        resp = self.client.post(reverse('crm:prospect_bulk_action'), {
+            'action': 'change_stage', 'stage': Prospect.LOST, 'prospect_ids': [self.prospect.pk, other.pk],
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.prospect.refresh_from_db()
+        self.assertEqual(self.prospect.stage, Prospect.LOST)
+        self.assertEqual(list(StageTransition.objects.values_list('prospect_id', 'source')), [(self.prospect.pk, StageTransition.BULK)])
+
+        with self.assertRaises(ValueError):
+            StageTransition.objects.get().save()
+
+    def test_funnel_and_velocity(self):
+        created = timezone.now() - timedelta(days=10)
+        Prospect.objects.filter(pk=self.prospect.pk).update(created_at=created)
+        lost = Prospect.objects.create(name='Lost', email='lost@school.com', country='NG', owner=self.user, stage=Prospect.LOST)
+        StageTransition.objects.bulk_create([
+            StageTransition(prospect=self.prospect, from_stage=Prospect.NEW, to_stage=Prospect.CONTACTED, changed_at=created + timedelta(days=2)),
+            StageTransition(prospect=self.prospect, from_stage=Prospect.CONTACTED, to_stage=Prospect.ENGAGED, changed_at=created + timedelta(days=6)),
+            StageTransition(prospect=lost, from_stage=Prospect.CONTACTED, to_stage=Prospect.LOST),
+        ])
+        Prospect.objects.filter(pk=self.prospect.pk).update(stage=Prospect.ENGAGED)
+
+        prospects = scoped_prospects(self.user)
+        with self.assertNumQueries(1):
+            funnel = stage_funnel(prospects)
+        self.assertEqual(funnel['data'][:4], [2, 2, 1, 0])
+        self.assertEqual(funnel['conversion'][:3], [100.0, 100.0, 50.0])
+
+        velocity = {row['stage']: row for row in stage_velocity(prospects)['stages']}
+        self.assertEqual(velocity[Prospect.NEW]['avg_days'], 2.0)
+        self.assertEqual(velocity[Prospect.CONTACTED]['transitions'], 2)
+        self.assertIsNone(velocity[Prospect.DEMO_DONE]['avg_days'])
+
+        self.assertEqual(self.client.get(reverse('analytics:api_funnel')).json()['data'][:2], [2, 2])
@@ -1,8 +1,6 @@
 """
 CRM views for prospect management.
 """
-import csv
-import io
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import View, ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
@@ -19,6 +17,9 @@ from .forms import ProspectForm, ProspectSearchForm, InteractionForm, BulkAction
 from .scoring import calculate_score, get_score_breakdown
 from .services import ProspectService
 from enrichment.models import ImportJob
+from analytics.rollups import schedule_prospect_refresh
+from enrichment.readers import get_reader, apply_column_mapping
+from enrichment.services import store_import_upload, process_import_job
 
 
 class CommercialRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -125,6 +126,8 @@ class ProspectUpdateView(CommercialRequiredMixin, UpdateView):
     
     def form_valid(self, form):
         response = super().form_valid(form)
+        if 'stage' in form.changed_data:
+            ProspectService.record_stage_change(self.request.user, form.instance, form.initial.get('stage'))
         
         # Log the action
         AuditLog.objects.create(
@@ -214,13 +217,17 @@ class ProspectBulkActionView(CommercialRequiredMixin, View):
         if action == 'assign_owner':
             owner_id = request.POST.get('owner')
             owner = get_object_or_404(User, pk=owner_id, role='commercial')
+            schedule_prospect_refresh(queryset)
             queryset.update(owner=owner)
             messages.success(request, f'Assigned {queryset.count()} prospects')
         
         elif action == 'change_stage':
             stage = request.POST.get('stage')
-            queryset.update(stage=stage)
-            messages.success(request, f'Changed stage for {queryset.count()} prospects')
+            if stage not in dict(Prospect.STAGE_CHOICES):
+                messages.error(request, 'Invalid stage')
+                return redirect('crm:prospect_list')
+            changed = ProspectService.bulk_change_stage(request.user, queryset, stage)
+            messages.success(request, f'Changed stage for {changed} prospects')
         
         elif action == 'recalc_score':
             for prospect in queryset:
@@ -228,19 +235,10 @@ class ProspectBulkActionView(CommercialRequiredMixin, View):
             messages.success(request, f'Recalculated scores for {queryset.count()} prospects')
         
         elif action == 'enroll_sequence':
-            from emails.models import EmailSequence, Enrollment
-            sequence_id = request.POST.get('sequence')
-            sequence = get_object_or_404(EmailSequence, pk=sequence_id)
-            
-            created_count = 0
-            for prospect in queryset:
-                enrollment, created = Enrollment.objects.get_or_create(
-                    prospect=prospect,
-                    sequence=sequence
-                )
-                if created:
-                    created_count += 1
-            
+            from emails.models import EmailSequence
+            from emails.services import enroll_prospects
+            sequence = get_object_or_404(EmailSequence, pk=request.POST.get('sequence'))
+            created_count = enroll_prospects(request.user, sequence, queryset)
             messages.success(request, f'Enrolled {created_count} prospects in sequence')
         
         return redirect('crm:prospect_list')
@@ -302,29 +300,33 @@ class ProspectImportView(CommercialRequiredMixin, View):
         if form.is_valid():
             csv_file = request.FILES['csv_file']
             owner = form.cleaned_data['owner']
-            # Create import job and save uploaded file for preview/processing
-            import_job = ImportJob.objects.create(
-                name=csv_file.name,
-                file=csv_file,
-                owner=owner,
-                status=ImportJob.PENDING
-            )
+            # Stream the upload to storage; an identical earlier upload reuses its job
+            try:
+                import_job, created = store_import_upload(
+                    csv_file,
+                    owner=owner,
+                    strategy=form.cleaned_data['strategy'],
+                    column_mapping=form.cleaned_data['column_mapping'],
+                    status=ImportJob.PENDING
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+                return render(request, self.template_name, {'form': form})
+
+            if import_job.status != ImportJob.PENDING:
+                messages.info(request, f'This file was already imported (import job #{import_job.pk}); nothing was re-processed')
+                return redirect('crm:prospect_list')
 
             # Immediately process import synchronously for simple demo when user submits from import page
             # If user came from preview flow, they will POST to ImportProcessView to start processing instead.
-            result = ProspectService.import_from_file(request.user, csv_file, owner=owner)
+            result = process_import_job(import_job, request.user)
+            if result is None:
+                messages.error(request, f'Import failed: {import_job.error_message}')
+                return redirect('enrichment:import_job_detail', pk=import_job.pk)
 
-            # Update import job with results
-            import_job.total_rows = result.get('imported', 0) + result.get('failed', 0)
-            import_job.imported_rows = result.get('imported', 0)
-            import_job.failed_rows = result.get('failed', 0)
-            import_job.errors = {'errors': result.get('errors', [])[:100]}
-            import_job.status = ImportJob.DONE if result.get('failed', 0) == 0 else ImportJob.DONE
-            import_job.save()
-
-            messages.success(request, f"Imported {result.get('imported',0)} prospects")
+            messages.success(request, f"Imported {result.get('imported',0)} prospects, updated {result.get('updated',0)}")
             if result.get('failed', 0) > 0:
-                messages.warning(request, f"{result.get('failed',0)} rows failed to import")
+                messages.warning(request, f"{result.get('failed',0)} rows failed to import; download the rejected rows from import job #{import_job.pk}")
 
             return redirect('crm:prospect_list')
         
@@ -339,22 +341,26 @@ class ImportPreviewView(CommercialRequiredMixin, View):
         if form.is_valid():
             csv_file = request.FILES['csv_file']
             # Save uploaded file as an ImportJob so user can preview and then start processing
-            owner = form.cleaned_data['owner']
-            import_job = ImportJob.objects.create(
-                name=csv_file.name,
-                file=csv_file,
-                owner=owner,
-                status=ImportJob.PENDING
-            )
+            try:
+                import_job, created = store_import_upload(
+                    csv_file,
+                    owner=form.cleaned_data['owner'],
+                    strategy=form.cleaned_data['strategy'],
+                    column_mapping=form.cleaned_data['column_mapping'],
+                    status=ImportJob.PENDING
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect('crm:prospect_import')
+
+            if not created:
+                messages.info(request, f'This file was already uploaded as import job #{import_job.pk}')
 
             preview_rows = []
             try:
-                csv_file.seek(0)
-                reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding='utf-8'))
-                for row in reader:
-                    preview_rows.append(row)
-                    if len(preview_rows) >= 5:
-                        break
+                with import_job.file.open('rb') as file_obj:
+                    first_batch = next(get_reader(import_job.file.name).iter_batches(file_obj, 5), [])
+                preview_rows = [apply_column_mapping(row, import_job.get_column_mapping()) for row in first_batch]
             except Exception as e:
                 messages.error(request, f'Error reading file: {str(e)}')
             
@@ -377,7 +383,8 @@ class ImportProcessView(CommercialRequiredMixin, View):
         # Delegate status retrieval to enrichment service for consistency
         from enrichment.services import get_import_job_status
         # If 'start' flag is provided, process the saved ImportJob file now
-        if request.POST.get('start'):
+        # Jobs that already ran (e.g. a re-uploaded identical file) are not re-processed
+        if request.POST.get('start') and import_job.status == ImportJob.PENDING:
             # Only owner or admin may start
             try:
                 is_admin = request.user.is_admin()
@@ -387,20 +394,7 @@ class ImportProcessView(CommercialRequiredMixin, View):
                 return JsonResponse({'error': 'Not authorized'}, status=403)
 
             # Process the file stored on ImportJob
-            try:
-                # import_job.file is a FieldFile; use its file-like object
-                file_obj = import_job.file.open('rb')
-                result = ProspectService.import_from_file(request.user, file_obj, owner=import_job.owner)
-                import_job.total_rows = result.get('imported', 0) + result.get('failed', 0)
-                import_job.imported_rows = result.get('imported', 0)
-                import_job.failed_rows = result.get('failed', 0)
-                import_job.errors = {'errors': result.get('errors', [])[:100]}
-                import_job.status = ImportJob.DONE if result.get('failed', 0) == 0 else ImportJob.DONE
-                import_job.save()
-            except Exception as e:
-                import_job.status = ImportJob.FAILED
-                import_job.errors = {'errors': [str(e)]}
-                import_job.save()
+            process_import_job(import_job, request.user)
 
         status = get_import_job_status(request.user, import_job_id)
         if status is None:
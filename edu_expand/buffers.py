@@ -0,0 +1,76 @@
+"""
+In-process batching of writes that do not need to happen inside the request.
+
+``BatchBuffer`` collects items from any thread and hands them to a write
+function in batches: a daemon thread flushes every ``flush_interval`` seconds,
+or sooner once ``max_size`` items are waiting, and the buffer is flushed again
+at interpreter exit. Each process has its own buffer; items still buffered
+when a process is killed are lost, so only use it for data that can afford
+that (usage tracking, engagement events).
+
+An interval of 0 disables buffering and writes each item immediately.
+"""
+import atexit
+import logging
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger('edu_expand')
+
+
+class BatchBuffer:
+    """Thread-safe buffer passed to ``write_batch(items)`` in batches."""
+
+    def __init__(self, write_batch, name, flush_interval, max_size):
+        self.write_batch = write_batch
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._items = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, item):
+        if not self.flush_interval:
+            self.write([item])
+            return
+        with self._lock:
+            self._items.append(item)
+            full = len(self._items) >= self.max_size
+        self.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every buffered item now. Returns the number of items taken from the buffer."""
+        with self._lock:
+            items, self._items = self._items, []
+        if items:
+            self.write(items)
+        return len(items)
+
+    def write(self, items):
+        try:
+            self.write_batch(items)
+        except Exception:
+            # Buffered writes must never break a request or kill the flusher
+            logger.exception('Could not write %s buffered %s items', len(items), self.name)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.name}-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # This thread owns its own connection; don't hold it between flushes
+            connection.close()
@@ -115,6 +115,27 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Import uploads are streamed to MEDIA_ROOT in chunks; larger files are rejected
+IMPORT_MAX_UPLOAD_SIZE = config('IMPORT_MAX_UPLOAD_SIZE', default=50 * 1024 * 1024, cast=int)
+
+# Cache (local memory by default; set CACHE_BACKEND/CACHE_LOCATION for Redis or Memcached in production)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='edu-expand'),
+    }
+}
+
+# Seconds dashboard widgets stay cached; prospect writes invalidate them earlier
+ANALYTICS_CACHE_TTL = config('ANALYTICS_CACHE_TTL', default=60, cast=int)
+
+# Seconds closed time-series buckets stay cached (they are not invalidated by writes)
+ANALYTICS_TIMESERIES_TTL = config('ANALYTICS_TIMESERIES_TTL', default=3600, cast=int)
+
+# Dashboard views are buffered in-process and bulk-inserted every N seconds (0 = write immediately)
+ANALYTICS_USAGE_FLUSH_INTERVAL = config('ANALYTICS_USAGE_FLUSH_INTERVAL', default=5, cast=int)
+ANALYTICS_USAGE_BUFFER_SIZE = config('ANALYTICS_USAGE_BUFFER_SIZE', default=500, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -134,6 +155,31 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@edu-expand.com')
 
+# Pooled SMTP backend (EMAIL_BACKEND=emails.backends.PooledSMTPBackend)
+EMAIL_POOL_SIZE = config('EMAIL_POOL_SIZE', default=4, cast=int)
+EMAIL_POOL_MAX_MESSAGES = config('EMAIL_POOL_MAX_MESSAGES', default=100, cast=int)
+EMAIL_POOL_IDLE_TIMEOUT = config('EMAIL_POOL_IDLE_TIMEOUT', default=60, cast=int)
+
+# Open/click tracking: links in sent emails point back to SITE_URL
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+EMAIL_TRACKING_ENABLED = config('EMAIL_TRACKING_ENABLED', default=True, cast=bool)
+# Shared secret expected in the X-Webhook-Secret header of engagement webhooks (empty = webhook disabled)
+EMAIL_WEBHOOK_SECRET = config('EMAIL_WEBHOOK_SECRET', default='')
+# Engagement events are buffered in-process and applied every N seconds (0 = apply immediately)
+EMAIL_EVENTS_FLUSH_INTERVAL = config('EMAIL_EVENTS_FLUSH_INTERVAL', default=5, cast=int)
+EMAIL_EVENTS_BUFFER_SIZE = config('EMAIL_EVENTS_BUFFER_SIZE', default=1000, cast=int)
+
+# Email logs older than this many days are moved to the archive table by archive_email_logs
+EMAIL_LOG_ARCHIVE_DAYS = config('EMAIL_LOG_ARCHIVE_DAYS', default=400, cast=int)
+
+# Sequence send throttling (messages per minute, burst size); a rate of 0 disables that limit
+EMAIL_DOMAIN_RATE = config('EMAIL_DOMAIN_RATE', default=20, cast=float)
+EMAIL_DOMAIN_BURST = config('EMAIL_DOMAIN_BURST', default=5, cast=int)
+EMAIL_ACCOUNT_RATE = config('EMAIL_ACCOUNT_RATE', default=300, cast=float)
+EMAIL_ACCOUNT_BURST = config('EMAIL_ACCOUNT_BURST', default=50, cast=int)
+# Seconds over which throttled sends are given staggered retry slots
+EMAIL_DISPATCH_WINDOW = config('EMAIL_DISPATCH_WINDOW', default=60, cast=int)
+
 # Celery Configuration (optional)
 CELERY_ENABLED = config('CELERY_ENABLED', default=False, cast=bool)
 if CELERY_ENABLED:
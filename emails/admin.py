@@ -2,7 +2,7 @@
 Django admin configuration for emails.
 """
 from django.contrib import admin
-from .models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog
+from .models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog, ArchivedEmailLog
 
 
 @admin.register(EmailTemplate)
@@ -19,7 +19,7 @@ class EmailTemplateAdmin(admin.ModelAdmin):
 class EmailSequenceAdmin(admin.ModelAdmin):
     """Email sequence admin."""
     
-    list_display = ('name', 'is_active', 'created_by', 'created_at')
+    list_display = ('name', 'is_active', 'stop_on_reply', 'created_by', 'created_at')
     list_filter = ('is_active', 'created_at')
     search_fields = ('name', 'description')
     readonly_fields = ('created_at', 'updated_at')
@@ -29,7 +29,7 @@ class EmailSequenceAdmin(admin.ModelAdmin):
 class SequenceStepAdmin(admin.ModelAdmin):
     """Sequence step admin."""
     
-    list_display = ('sequence', 'order', 'delay_days', 'template')
+    list_display = ('sequence', 'order', 'delay_days', 'template', 'send_if')
     list_filter = ('sequence',)
     search_fields = ('sequence__name',)
 
@@ -51,4 +51,22 @@ class EmailLogAdmin(admin.ModelAdmin):
     list_display = ('to_email', 'subject', 'status', 'sent_at', 'sent_by')
     list_filter = ('status', 'sent_at')
     search_fields = ('to_email', 'prospect__name', 'subject')
-    readonly_fields = ('created_at', 'sent_at', 'opened_at', 'clicked_at', 'replied_at')
+    readonly_fields = ('created_at', 'sent_at', 'opened_at', 'clicked_at', 'replied_at', 'body_snapshot')
+    exclude = ('body',)
+
+
+@admin.register(ArchivedEmailLog)
+class ArchivedEmailLogAdmin(admin.ModelAdmin):
+    """Archived email logs (read-only)."""
+    
+    list_display = ('to_email', 'subject', 'status', 'sent_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'prospect__name', 'subject')
+    readonly_fields = ('body_snapshot',)
+    exclude = ('body',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,141 @@
+"""
+Pooled SMTP email backend.
+
+Django's SMTP backend connects, starts TLS and logs in for every ``send_mail``
+call (or every ``with connection:`` block). ``PooledSMTPBackend`` hands
+connections back to a per-process pool when it is closed, so the next send
+reuses an authenticated connection instead of doing another TLS handshake.
+
+- Up to ``EMAIL_POOL_SIZE`` idle connections are kept per server/account.
+- A connection is retired after ``EMAIL_POOL_MAX_MESSAGES`` messages, or when
+  it has been idle for more than ``EMAIL_POOL_IDLE_TIMEOUT`` seconds (servers
+  drop idle clients).
+- If the server drops a connection mid-send, the backend reconnects once and
+  retries that message.
+
+Enable with ``EMAIL_BACKEND=emails.backends.PooledSMTPBackend``.
+"""
+import atexit
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+# Errors meaning the connection itself is gone (not a rejected message)
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPConnectionPool:
+    """Thread-safe store of idle SMTP connections, keyed by server and account."""
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Return ``(connection, messages_sent)`` for a live idle connection, or None."""
+        cutoff = time.monotonic() - settings.EMAIL_POOL_IDLE_TIMEOUT
+        stale = []
+        found = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                connection, sent, released_at = idle.pop()
+                if released_at >= cutoff:
+                    found = (connection, sent)
+                    break
+                stale.append(connection)
+        for connection in stale:
+            _quit(connection)
+        return found
+
+    def release(self, key, connection, sent):
+        """Keep ``connection`` for reuse, or quit it if the pool is full or it has sent enough."""
+        if sent < settings.EMAIL_POOL_MAX_MESSAGES:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < settings.EMAIL_POOL_SIZE:
+                    idle.append((connection, sent, time.monotonic()))
+                    return
+        _quit(connection)
+
+    def clear(self):
+        """Quit every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection, _sent, _released_at in connections:
+                _quit(connection)
+
+    def idle_count(self, key=None):
+        with self._lock:
+            if key is not None:
+                return len(self._idle.get(key, []))
+            return sum(len(connections) for connections in self._idle.values())
+
+
+def _quit(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+pool = SMTPConnectionPool()
+atexit.register(pool.clear)
+
+
+class PooledSMTPBackend(EmailBackend):
+    """SMTP backend that reuses pooled connections and reconnects on failure."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sent = 0
+
+    @property
+    def pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    def open(self):
+        if self.connection:
+            return False
+        pooled = pool.acquire(self.pool_key)
+        if pooled is not None:
+            self.connection, self._sent = pooled
+            return True
+        self._sent = 0
+        return super().open()
+
+    def close(self):
+        """Return the connection to the pool instead of quitting it."""
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        pool.release(self.pool_key, connection, self._sent)
+
+    def _discard(self):
+        if self.connection is not None:
+            _quit(self.connection)
+            self.connection = None
+
+    def _reconnect(self):
+        self._discard()
+        self._sent = 0
+        super().open()
+
+    def _send(self, email_message):
+        if self._sent >= settings.EMAIL_POOL_MAX_MESSAGES:
+            self._reconnect()
+        try:
+            sent = super()._send(email_message)
+        except CONNECTION_ERRORS:
+            # The server dropped us (idle timeout, restart): retry once on a fresh connection
+            self._reconnect()
+            if self.connection is None:
+                return False
+            sent = super()._send(email_message)
+        if sent:
+            self._sent += 1
+        return sent
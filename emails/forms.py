@@ -32,11 +32,12 @@ class EmailSequenceForm(forms.ModelForm):
     
     class Meta:
         model = EmailSequence
-        fields = ['name', 'description', 'is_active']
+        fields = ['name', 'description', 'is_active', 'stop_on_reply']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Sequence name'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'stop_on_reply': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
 
@@ -45,11 +46,12 @@ class SequenceStepForm(forms.ModelForm):
     
     class Meta:
         model = SequenceStep
-        fields = ['order', 'delay_days', 'template']
+        fields = ['order', 'delay_days', 'template', 'send_if']
         widgets = {
             'order': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Step number'}),
             'delay_days': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Days after enrollment'}),
             'template': forms.Select(attrs={'class': 'form-control'}),
+            'send_if': forms.Select(attrs={'class': 'form-control'}),
         }
 
 
@@ -0,0 +1,33 @@
+"""
+Move old email logs to the archive table.
+
+Usage:
+  python manage.py archive_email_logs                # logs older than EMAIL_LOG_ARCHIVE_DAYS
+  python manage.py archive_email_logs --days 90 --batch-size 10000
+
+Run it daily (cron or a scheduled job). Archived logs stay readable from the
+email log detail page; list pages and ``prospect.email_logs`` only show live logs.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from emails.services import archive_email_logs, prune_email_bodies, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move email logs older than N days to ArchivedEmailLog and delete unused email bodies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.EMAIL_LOG_ARCHIVE_DAYS, help='Archive logs created more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Logs moved per transaction')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        now = timezone.now()
+        moved = archive_email_logs(now - timedelta(days=options['days']), batch_size=max(1, options['batch_size']))
+        pruned = prune_email_bodies(now - timedelta(days=1))
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} email logs, deleted {pruned} unused bodies'))
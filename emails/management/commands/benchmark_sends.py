@@ -0,0 +1,266 @@
+"""
+Benchmark the sequence send pipeline.
+
+Usage:
+  python manage.py benchmark_sends                                  # 20k enrollments, batch sizes 100/500/2000
+  python manage.py benchmark_sends --enrollments 50000 --steps 2 --batch-sizes 500 1000
+  python manage.py benchmark_sends --workers 4 --pool-sizes 1 4     # PostgreSQL only
+  python manage.py benchmark_sends --spread 120 --throttle          # enrollments coming due over two minutes
+
+Creates a benchmark sequence (``--steps`` steps, all due immediately) and
+enrolls synthetic prospects spread over ``--domains`` recipient domains, then
+drains them with ``send_due_emails`` through ``PooledSMTPBackend`` against an
+in-process SMTP sink, once per batch size / pool size combination. Reports
+sends/sec, queries per send, scheduler lag (claim time minus ``next_send_at``)
+as p50/p95/max, peak RSS and the SMTP connections opened. Results are written
+as JSON so batch and pool sizes can be tuned and runs compared across releases.
+
+The per-domain and per-account rate limits are off unless --throttle is
+given, so the numbers measure the pipeline rather than the configured limits.
+
+Run it against a scratch database: benchmark rows use the ``bench.example.com``
+domain and are deleted afterwards unless --keep is given.
+"""
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from crm.models import Prospect
+from enrichment.management.commands.benchmark_import import QueryCounter, peak_rss_mb
+from emails import rendering, steps as step_cache
+from emails.backends import pool
+from emails.models import EmailLog, EmailSequence, EmailTemplate, Enrollment, SequenceStep
+from emails.services import SEND_BATCH_SIZE, prune_email_bodies, send_due_emails
+from emails.smtp_sink import SMTPSink
+from emails.throttle import DispatchScheduler, get_scheduler, reset_scheduler
+
+BENCH_DOMAIN = 'bench.example.com'
+INSERT_BATCH_SIZE = 5000
+# Give up when nothing could be claimed for this long (e.g. only failed sends waiting for their retry)
+IDLE_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sequence sends against a local SMTP sink and store the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enrollments', type=int, default=20000, help='Enrollments (and prospects) to create')
+        parser.add_argument('--steps', type=int, default=1, help='Steps in the benchmark sequence; each enrollment gets one email per step')
+        parser.add_argument('--domains', type=int, default=500, help='Distinct recipient domains')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, SEND_BATCH_SIZE, 2000], help='send_due_emails batch sizes to compare')
+        parser.add_argument('--pool-sizes', type=int, nargs='+', default=[settings.EMAIL_POOL_SIZE], help='EMAIL_POOL_SIZE values to compare')
+        parser.add_argument('--workers', type=int, default=1, help='Concurrent send workers (threads); more than 1 needs PostgreSQL')
+        parser.add_argument('--spread', type=float, default=0, help='Seconds over which enrollments come due (0: all due at the start)')
+        parser.add_argument('--throttle', action='store_true', help='Apply the EMAIL_DOMAIN_*/EMAIL_ACCOUNT_* rate limits')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+        parser.add_argument('--output', help='JSON output path (default: benchmarks/sends-<timestamp>.json)')
+        parser.add_argument('--keep', action='store_true', help='Keep benchmark rows instead of deleting them')
+
+    def handle(self, *args, **options):
+        for option in ('enrollments', 'steps', 'domains', 'workers'):
+            if options[option] < 1:
+                raise CommandError(f'--{option} must be at least 1')
+        if options['workers'] > 1 and not connection.features.has_select_for_update_skip_locked:
+            raise CommandError(f'--workers needs a database with SELECT ... SKIP LOCKED ({connection.vendor} has none)')
+
+        random.seed(options['seed'])
+        sink = SMTPSink(record=False).start()
+        runs = []
+        try:
+            sender = self._sender()
+            sequence = self._sequence(sender, options['steps'])
+            self.stdout.write(self.style.NOTICE(f'Inserting {options["enrollments"]} prospects...'))
+            prospects = self._prospects(sender, options['enrollments'], options['domains'])
+
+            for batch_size in options['batch_sizes']:
+                for pool_size in options['pool_sizes']:
+                    self.stdout.write(self.style.NOTICE(f'Sending: batch size {batch_size}, pool size {pool_size}...'))
+                    run = self._run(sink, sequence, prospects, batch_size, pool_size, options)
+                    runs.append(run)
+                    self.stdout.write(self.style.SUCCESS(
+                        f"batch {batch_size}, pool {pool_size}: {run['sends_per_sec']} sends/s, "
+                        f"{run['queries_per_send']} queries/send, lag p95 {run['lag']['p95_s']} s, "
+                        f"{run['smtp_connections']} SMTP connections, peak RSS {run['peak_rss_mb']} MB"
+                    ))
+        finally:
+            pool.clear()
+            sink.stop()
+            if not options['keep']:
+                self._cleanup()
+
+        output = Path(options['output'] or settings.BASE_DIR / 'benchmarks' / f'sends-{timezone.now():%Y%m%d-%H%M%S}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'benchmark': 'sends',
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'enrollments': options['enrollments'],
+            'steps': options['steps'],
+            'domains': options['domains'],
+            'workers': options['workers'],
+            'spread_seconds': options['spread'],
+            'throttle': options['throttle'],
+            'tracking': settings.EMAIL_TRACKING_ENABLED,
+            'seed': options['seed'],
+            'runs': runs,
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def _sender(self):
+        email = f'sender@{BENCH_DOMAIN}'
+        sender, _ = User.objects.get_or_create(email=email, defaults={'username': email, 'role': User.COMMERCIAL})
+        return sender
+
+    def _sequence(self, sender, step_count):
+        sequence = EmailSequence.objects.create(name=f'Bench sequence ({BENCH_DOMAIN})', created_by=sender)
+        for order in range(1, step_count + 1):
+            template = EmailTemplate.objects.create(
+                name=f'Bench template {order} ({BENCH_DOMAIN})',
+                subject=f'Step {order}: a programme for {{{{school_name}}}}',
+                body_text='Hello {{prospect_name}},\n\nWe work with schools in {{city}}, {{country}}.\nhttps://example.com/programmes',
+                body_html=(
+                    '<html><body><p>Hello {{prospect_name}},</p><p>We work with schools in {{city}}, {{country}}.</p>'
+                    '<p><a href="https://example.com/programmes">Our programmes</a></p></body></html>'
+                ),
+                variables=['prospect_name', 'school_name', 'city', 'country'],
+                created_by=sender,
+            )
+            SequenceStep.objects.create(sequence=sequence, template=template, order=order, delay_days=0)
+        return sequence
+
+    def _prospects(self, sender, count, domains):
+        countries = list(settings.COUNTRIES.keys())
+        for offset in range(0, count, INSERT_BATCH_SIZE):
+            Prospect.objects.bulk_create([
+                Prospect(
+                    name=f'Bench School {i}',
+                    email=f'school{i}@school{random.randrange(domains)}.{BENCH_DOMAIN}',
+                    contact_name=f'Contact {i}',
+                    country=random.choice(countries),
+                    city=f'City {i % 100}',
+                    owner=sender,
+                )
+                for i in range(offset, min(offset + INSERT_BATCH_SIZE, count))
+            ])
+        return list(Prospect.objects.filter(email__endswith=f'.{BENCH_DOMAIN}').values_list('pk', flat=True))
+
+    def _enroll(self, sequence, prospects, spread):
+        """Replace the benchmark enrollments with fresh ones coming due over ``spread`` seconds from now."""
+        EmailLog.objects.filter(enrollment__sequence=sequence).delete()
+        Enrollment.objects.filter(sequence=sequence).delete()
+        prune_email_bodies(timezone.now())
+        now = timezone.now()
+        step = timedelta(seconds=spread / len(prospects))
+        for offset in range(0, len(prospects), INSERT_BATCH_SIZE):
+            Enrollment.objects.bulk_create([
+                Enrollment(prospect_id=prospect_id, sequence=sequence, started_at=now, next_send_at=now + step * (offset + i))
+                for i, prospect_id in enumerate(prospects[offset:offset + INSERT_BATCH_SIZE])
+            ])
+        return now + timedelta(seconds=spread)
+
+    def _run(self, sink, sequence, prospects, batch_size, pool_size, options):
+        last_due = self._enroll(sequence, prospects, options['spread'])
+        pool.clear()
+        rendering.clear_cache()
+        step_cache.clear_cache()
+        reset_scheduler()
+        with sink.lock:
+            sink.connections = sink.delivered = 0
+
+        totals = {'batches': 0, 'claimed': 0, 'sent': 0, 'failed': 0, 'throttled': 0}
+        counter = QueryCounter()
+        lags = []
+        lock = threading.Lock()
+        scheduler = get_scheduler() if options['throttle'] else DispatchScheduler(0, 1, 0, 1)
+        active = Enrollment.objects.filter(sequence=sequence, status='active')
+
+        def worker():
+            backend = get_connection(
+                'emails.backends.PooledSMTPBackend', host='127.0.0.1', port=sink.port,
+                username='', password='', use_tls=False, use_ssl=False,
+            )
+            idle_since = time.monotonic()
+            try:
+                while True:
+                    now = timezone.now()
+                    # Approximates the claim query's ordering; not counted as a send query
+                    due = active.filter(next_send_at__lte=now).order_by('next_send_at').values_list('next_send_at', flat=True)[:batch_size]
+                    batch_lags = [(now - next_send_at).total_seconds() for next_send_at in due]
+                    with connection.execute_wrapper(counter):
+                        result = send_due_emails(batch_size, now=now, connection=backend, scheduler=scheduler)
+                    with lock:
+                        totals['batches'] += 1 if result['claimed'] else 0
+                        for key in ('claimed', 'sent', 'failed', 'throttled'):
+                            totals[key] += result[key]
+                        if result['claimed']:
+                            lags.extend(batch_lags[:result['claimed']])
+                    if result['claimed']:
+                        idle_since = time.monotonic()
+                        continue
+                    pending = active.aggregate(next_send_at=Min('next_send_at'))['next_send_at']
+                    if pending is None or (timezone.now() >= last_due and time.monotonic() - idle_since > IDLE_TIMEOUT):
+                        return
+                    time.sleep(min(max((pending - timezone.now()).total_seconds(), 0.01), 1))
+            finally:
+                connection.close()
+
+        with override_settings(EMAIL_POOL_SIZE=pool_size):
+            threads = [threading.Thread(target=worker, name=f'bench-sender-{i}') for i in range(options['workers'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            pool.clear()
+
+        sent = totals['sent']
+        return {
+            'batch_size': batch_size,
+            'pool_size': pool_size,
+            'seconds': round(elapsed, 3),
+            'sends_per_sec': round(sent / elapsed, 1) if elapsed else None,
+            'queries': counter.count,
+            'queries_per_send': round(counter.count / sent, 3) if sent else None,
+            'lag': self._percentiles(lags),
+            'smtp_connections': sink.connections,
+            'delivered': sink.delivered,
+            'peak_rss_mb': peak_rss_mb(),
+            **totals,
+        }
+
+    def _percentiles(self, values):
+        if not values:
+            return {'p50_s': None, 'p95_s': None, 'max_s': None}
+        values = sorted(values)
+        return {
+            'p50_s': round(statistics.median(values), 3),
+            'p95_s': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+            'max_s': round(values[-1], 3),
+        }
+
+    def _cleanup(self):
+        prospects = Prospect.objects.filter(email__endswith=f'.{BENCH_DOMAIN}')
+        EmailLog.objects.filter(prospect__in=prospects).delete()
+        Enrollment.objects.filter(prospect__in=prospects).delete()
+        # Benchmark prospects have no other related rows; a raw delete skips per-row signals
+        deleted = prospects._raw_delete(prospects.db)
+        EmailSequence.objects.filter(name__endswith=f'({BENCH_DOMAIN})').delete()
+        EmailTemplate.objects.filter(name__endswith=f'({BENCH_DOMAIN})').delete()
+        User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+        prune_email_bodies(timezone.now())
+        if deleted:
+            self.stdout.write(self.style.WARNING(f'Removed {deleted} benchmark prospects'))
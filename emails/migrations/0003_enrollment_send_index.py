@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:33
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_active_enrollments(apps, schema_editor):
+    # The send engine only picks up enrollments with a next_send_at
+    Enrollment = apps.get_model('emails', 'Enrollment')
+    Enrollment.objects.filter(status='active', next_send_at__isnull=True).update(next_send_at=F('enrolled_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_lead_list_indexes'),
+        ('emails', '0002_rename_emails_emaillog_prospect_idx_emails_emai_prospec_89e89f_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['status', 'next_send_at'], name='emails_enro_status_577502_idx'),
+        ),
+        migrations.RunPython(schedule_active_enrollments, migrations.RunPython.noop),
+    ]
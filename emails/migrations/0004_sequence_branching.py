@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0003_enrollment_send_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailsequence',
+            name='stop_on_reply',
+            field=models.BooleanField(default=True, help_text='Complete the enrollment once the prospect replies to any email of the sequence', verbose_name='stop on reply'),
+        ),
+        migrations.AddField(
+            model_name='sequencestep',
+            name='send_if',
+            field=models.CharField(choices=[('always', 'Always'), ('opened', 'An earlier email was opened'), ('not_opened', 'No earlier email was opened'), ('clicked', 'A link in an earlier email was clicked'), ('not_clicked', 'No link in an earlier email was clicked')], default='always', help_text='Steps whose condition is not met when they are due are skipped', max_length=20, verbose_name='send if'),
+        ),
+    ]
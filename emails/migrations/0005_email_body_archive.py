@@ -0,0 +1,82 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:45
+
+import hashlib
+import zlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_body_snapshots(apps, schema_editor):
+    # Store each distinct body once, compressed, and point the logs at it
+    EmailLog = apps.get_model('emails', 'EmailLog')
+    EmailBody = apps.get_model('emails', 'EmailBody')
+    bodies = {}
+    last_id = 0
+    while True:
+        logs = list(EmailLog.objects.filter(pk__gt=last_id).exclude(body_snapshot='').order_by('pk').only('id', 'body_snapshot')[:2000])
+        if not logs:
+            break
+        for log in logs:
+            digest = hashlib.sha256(log.body_snapshot.encode()).hexdigest()
+            if digest not in bodies:
+                bodies[digest] = EmailBody.objects.create(digest=digest, content=zlib.compress(log.body_snapshot.encode())).pk
+            log.body_id = bodies[digest]
+        EmailLog.objects.bulk_update(logs, ['body'])
+        last_id = logs[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_lead_list_indexes'),
+        ('emails', '0004_sequence_branching'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailBody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='SHA-256 digest')),
+                ('content', models.BinaryField(verbose_name='compressed content')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='body',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='logs', to='emails.emailbody'),
+        ),
+        migrations.RunPython(move_body_snapshots, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='emaillog',
+            name='body_snapshot',
+        ),
+        migrations.CreateModel(
+            name='ArchivedEmailLog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('to_email', models.EmailField(max_length=254, verbose_name='to email')),
+                ('subject', models.CharField(max_length=255, verbose_name='subject')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('bounced', 'Bounced'), ('opened', 'Opened'), ('clicked', 'Clicked'), ('replied', 'Replied')], max_length=20, verbose_name='status')),
+                ('error_message', models.TextField(blank=True, verbose_name='error message')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='sent at')),
+                ('opened_at', models.DateTimeField(blank=True, null=True, verbose_name='opened at')),
+                ('clicked_at', models.DateTimeField(blank=True, null=True, verbose_name='clicked at')),
+                ('replied_at', models.DateTimeField(blank=True, null=True, verbose_name='replied at')),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('enrollment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_email_logs', to='emails.enrollment')),
+                ('prospect', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_email_logs', to='crm.prospect')),
+                ('sent_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_emails_sent', to=settings.AUTH_USER_MODEL)),
+                ('body', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_logs', to='emails.emailbody')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['prospect'], name='emails_arch_prospec_bd007f_idx'), models.Index(fields=['-created_at'], name='emails_arch_created_25d807_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0005_email_body_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='send_failures',
+            field=models.PositiveIntegerField(default=0, verbose_name='send failures'),
+        ),
+    ]
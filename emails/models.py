@@ -1,6 +1,10 @@
 """
 Email automation models.
 """
+import hashlib
+import zlib
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -11,6 +15,9 @@ from datetime import timedelta
 class EmailTemplate(models.Model):
     """Email template for campaigns."""
     
+    # Placeholders the send engine can fill (see emails.services.template_context)
+    AVAILABLE_VARIABLES = ['prospect_name', 'school_name', 'contact_name', 'contact_role', 'country', 'city', 'email']
+    
     name = models.CharField(_('template name'), max_length=255)
     subject = models.CharField(_('email subject'), max_length=255)
     body_html = models.TextField(_('HTML body'))
@@ -35,6 +42,27 @@ class EmailTemplate(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        """Check placeholders against ``variables`` and the variables the send engine provides."""
+        from .rendering import placeholders
+        
+        if not isinstance(self.variables, list):
+            raise ValidationError({'variables': _('Variables must be a JSON list of names.')})
+        unknown = sorted(set(self.variables) - set(self.AVAILABLE_VARIABLES))
+        if unknown:
+            raise ValidationError({'variables': _('Unknown variables: %(names)s. Available: %(available)s.') % {
+                'names': ', '.join(unknown), 'available': ', '.join(self.AVAILABLE_VARIABLES),
+            }})
+        
+        allowed = set(self.variables) or set(self.AVAILABLE_VARIABLES)
+        errors = {}
+        for field in ('subject', 'body_html', 'body_text'):
+            undeclared = sorted(placeholders(getattr(self, field)) - allowed)
+            if undeclared:
+                errors[field] = _('Undeclared variables: %(names)s.') % {'names': ', '.join(undeclared)}
+        if errors:
+            raise ValidationError(errors)
 
 
 class EmailSequence(models.Model):
@@ -43,6 +71,11 @@ class EmailSequence(models.Model):
     name = models.CharField(_('sequence name'), max_length=255)
     description = models.TextField(_('description'), blank=True)
     is_active = models.BooleanField(_('active'), default=True)
+    stop_on_reply = models.BooleanField(
+        _('stop on reply'),
+        default=True,
+        help_text=_('Complete the enrollment once the prospect replies to any email of the sequence')
+    )
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -62,6 +95,21 @@ class EmailSequence(models.Model):
 class SequenceStep(models.Model):
     """Step in an email sequence."""
     
+    # Send conditions, checked against earlier emails of the same enrollment
+    ALWAYS = 'always'
+    OPENED = 'opened'
+    NOT_OPENED = 'not_opened'
+    CLICKED = 'clicked'
+    NOT_CLICKED = 'not_clicked'
+    
+    SEND_IF_CHOICES = [
+        (ALWAYS, _('Always')),
+        (OPENED, _('An earlier email was opened')),
+        (NOT_OPENED, _('No earlier email was opened')),
+        (CLICKED, _('A link in an earlier email was clicked')),
+        (NOT_CLICKED, _('No link in an earlier email was clicked')),
+    ]
+    
     sequence = models.ForeignKey(
         EmailSequence,
         on_delete=models.CASCADE,
@@ -77,6 +125,13 @@ class SequenceStep(models.Model):
         on_delete=models.PROTECT,
         related_name='sequence_steps'
     )
+    send_if = models.CharField(
+        _('send if'),
+        max_length=20,
+        choices=SEND_IF_CHOICES,
+        default=ALWAYS,
+        help_text=_('Steps whose condition is not met when they are due are skipped')
+    )
     
     class Meta:
         ordering = ['sequence', 'order']
@@ -84,6 +139,16 @@ class SequenceStep(models.Model):
     
     def __str__(self):
         return f"{self.sequence.name} - Step {self.order}"
+    
+    def should_send(self, opened, clicked):
+        """Whether this step applies given the enrollment's engagement so far."""
+        return {
+            self.ALWAYS: True,
+            self.OPENED: opened,
+            self.NOT_OPENED: not opened,
+            self.CLICKED: clicked,
+            self.NOT_CLICKED: not clicked,
+        }[self.send_if]
 
 
 class Enrollment(models.Model):
@@ -118,6 +183,8 @@ class Enrollment(models.Model):
     paused_at = models.DateTimeField(_('paused at'), null=True, blank=True)
     next_send_at = models.DateTimeField(_('next send'), null=True, blank=True)
     last_step_completed = models.PositiveIntegerField(_('last step completed'), default=0)
+    # Failed sends of the current step in a row; the send engine pauses the enrollment at MAX_SEND_FAILURES
+    send_failures = models.PositiveIntegerField(_('send failures'), default=0)
     
     class Meta:
         ordering = ['-enrolled_at']
@@ -126,16 +193,18 @@ class Enrollment(models.Model):
             models.Index(fields=['prospect']),
             models.Index(fields=['sequence']),
             models.Index(fields=['status']),
+            # Send engine: due active enrollments
+            models.Index(fields=['status', 'next_send_at']),
         ]
     
     def __str__(self):
         return f"{self.prospect.name} - {self.sequence.name}"
     
     def get_next_step(self):
-        """Get the next step to send."""
-        return self.sequence.steps.filter(
-            order__gt=self.last_step_completed
-        ).first()
+        """Get the next step to send (from the cached sequence steps, see ``emails.steps``)."""
+        from .steps import sequence_steps
+        
+        return next((step for step in sequence_steps(self.sequence) if step.order > self.last_step_completed), None)
     
     def is_ready_to_send(self):
         """Check if next email should be sent."""
@@ -146,6 +215,46 @@ class Enrollment(models.Model):
         return timezone.now() >= self.next_send_at
 
 
+class EmailBody(models.Model):
+    """Rendered email body, stored once per distinct content and zlib-compressed."""
+    
+    digest = models.CharField(_('SHA-256 digest'), max_length=64, unique=True)
+    content = models.BinaryField(_('compressed content'))
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.digest[:12]
+    
+    @property
+    def text(self):
+        return zlib.decompress(bytes(self.content)).decode()
+    
+    @staticmethod
+    def digest_for(text):
+        return hashlib.sha256(text.encode()).hexdigest()
+    
+    @classmethod
+    def store(cls, texts):
+        """Return ``{text: EmailBody}`` for ``texts``, creating the missing bodies in bulk.
+
+        Identical texts share one row. Costs at most three queries whatever the
+        number of texts; the returned bodies have ``content`` deferred.
+        """
+        digests = {text: cls.digest_for(text) for text in set(texts)}
+        if not digests:
+            return {}
+        bodies = {body.digest: body for body in cls.objects.filter(digest__in=digests.values()).only('id', 'digest')}
+        missing = [cls(digest=digest, content=zlib.compress(text.encode())) for text, digest in digests.items() if digest not in bodies]
+        if missing:
+            # Another worker may insert the same body concurrently
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            bodies.update(
+                (body.digest, body)
+                for body in cls.objects.filter(digest__in=[body.digest for body in missing]).only('id', 'digest')
+            )
+        return {text: bodies[digest] for text, digest in digests.items()}
+
+
 class EmailLog(models.Model):
     """Log of sent emails."""
     
@@ -173,7 +282,14 @@ class EmailLog(models.Model):
     )
     to_email = models.EmailField(_('to email'))
     subject = models.CharField(_('subject'), max_length=255)
-    body_snapshot = models.TextField(_('body snapshot'), blank=True)
+    # Plain-text body; shared between logs with identical content
+    body = models.ForeignKey(
+        EmailBody,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='logs'
+    )
     status = models.CharField(
         _('status'),
         max_length=20,
@@ -205,6 +321,10 @@ class EmailLog(models.Model):
     def __str__(self):
         return f"{self.to_email} - {self.status}"
     
+    @property
+    def body_snapshot(self):
+        return self.body.text if self.body_id else ''
+    
     def mark_as_sent(self):
         """Mark email as sent."""
         self.status = 'sent'
@@ -222,3 +342,59 @@ class EmailLog(models.Model):
         self.status = 'replied'
         self.replied_at = timezone.now()
         self.save()
+
+
+class ArchivedEmailLog(models.Model):
+    """Email log moved out of ``EmailLog`` by ``archive_email_logs``; keeps the original id."""
+    
+    id = models.BigIntegerField(primary_key=True)
+    enrollment = models.ForeignKey(
+        Enrollment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='archived_email_logs'
+    )
+    prospect = models.ForeignKey(
+        'crm.Prospect',
+        on_delete=models.CASCADE,
+        related_name='archived_email_logs'
+    )
+    to_email = models.EmailField(_('to email'))
+    subject = models.CharField(_('subject'), max_length=255)
+    body = models.ForeignKey(
+        EmailBody,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='archived_logs'
+    )
+    status = models.CharField(_('status'), max_length=20, choices=EmailLog.STATUS_CHOICES)
+    error_message = models.TextField(_('error message'), blank=True)
+    sent_at = models.DateTimeField(_('sent at'), null=True, blank=True)
+    opened_at = models.DateTimeField(_('opened at'), null=True, blank=True)
+    clicked_at = models.DateTimeField(_('clicked at'), null=True, blank=True)
+    replied_at = models.DateTimeField(_('replied at'), null=True, blank=True)
+    sent_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_emails_sent'
+    )
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['prospect']),
+            models.Index(fields=['-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.to_email} - {self.status} (archived)"
+    
+    @property
+    def body_snapshot(self):
+        return self.body.text if self.body_id else ''
@@ -0,0 +1,78 @@
+"""
+Compiled rendering of ``EmailTemplate`` placeholders.
+
+Templates only use ``{{variable}}`` placeholders, so each template text is
+split once into literal chunks and variable names; rendering a message is
+then a list join with no parsing. Compiled templates are cached per process,
+keyed by template id and ``updated_at``, so edits are picked up on the next
+render.
+"""
+import re
+import threading
+
+from django.utils.html import escape
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+CACHE_SIZE = 256
+
+
+def placeholders(text):
+    """Return the set of variable names used in ``text``."""
+    return set(PLACEHOLDER_RE.findall(text or ''))
+
+
+class CompiledText:
+    """One template text split into literals (even indexes) and variable names (odd indexes)."""
+
+    def __init__(self, text, html=False):
+        self.parts = PLACEHOLDER_RE.split(text or '')
+        self.html = html
+
+    def render(self, values):
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            value = values.get(parts[i])
+            value = '' if value is None else str(value)
+            parts[i] = escape(value) if self.html else value
+        return ''.join(parts)
+
+
+class CompiledTemplate:
+    def __init__(self, template):
+        self.subject = CompiledText(template.subject)
+        self.text = CompiledText(template.body_text)
+        self.html = CompiledText(template.body_html, html=True)
+
+    def render(self, values):
+        """Return ``(subject, text, html)``; variables are HTML-escaped in the HTML part only."""
+        # Header injection guard: a subject is always a single line
+        subject = ' '.join(self.subject.render(values).split())
+        return subject, self.text.render(values), self.html.render(values)
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def compile_template(template):
+    """Return the cached ``CompiledTemplate`` for this version of ``template``."""
+    key = template.pk
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == template.updated_at:
+        return entry[1]
+    compiled = CompiledTemplate(template)
+    with _lock:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = (template.updated_at, compiled)
+    return compiled
+
+
+def render_template(template, values):
+    """Render ``template`` with ``values``; see ``CompiledTemplate.render``."""
+    return compile_template(template).render(values)
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
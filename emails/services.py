@@ -0,0 +1,346 @@
+"""
+Email sequence enrollment and send engine.
+
+``enroll_prospects`` enrolls any number of prospects in a sequence with a
+fixed number of queries.
+
+``send_due_emails`` runs one batch of sequence sends and is called on every
+tick of ``run_background_jobs``:
+
+1. Claim up to ``batch_size`` active enrollments whose ``next_send_at`` has
+   passed with ``select_for_update(skip_locked=True)``. Several workers can
+   run side by side without sending the same step twice. Claimed rows get
+   ``next_send_at`` pushed out by ``CLAIM_LEASE``, and their ``EmailLog``
+   rows are created as pending with one ``bulk_create``. The same query
+   flags enrollments with replies, bounces, opens and clicks: replies
+   complete the enrollment (``EmailSequence.stop_on_reply``), bounces pause
+   it, and steps whose ``send_if`` condition fails are skipped.
+   Only sends the per-domain and per-account rate limits allow right now go
+   out (``emails.throttle``); the others are rescheduled for when the limits
+   allow them, and claimed again then.
+2. Render every step's template (compiled once per template version, see
+   ``emails.rendering``) and send the messages over a single backend
+   connection, outside the transaction.
+3. Record the outcome with ``bulk_update``: logs become sent or failed, and
+   enrollments move on to the next step or complete. Failed sends are retried
+   after ``RETRY_DELAY``; an enrollment is paused after ``MAX_SEND_FAILURES``
+   failures in a row, or at once when the server refuses the address (5xx).
+
+If a worker dies between steps 1 and 3 its lease expires and the enrollment
+is claimed again, so delivery is at least once. The abandoned log stays
+pending.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from accounts.models import AuditLog
+
+from .models import ArchivedEmailLog, Enrollment, EmailBody, EmailLog
+from .rendering import render_template
+from .steps import steps_for_sequences
+from .throttle import get_scheduler, recipient_domain
+from .tracking import add_tracking, tracking_token
+
+SEND_BATCH_SIZE = 500
+CLAIM_LEASE = timedelta(minutes=10)
+RETRY_DELAY = timedelta(hours=1)
+# Failed sends in a row after which an enrollment is paused
+MAX_SEND_FAILURES = 5
+# Grace period between enrolling and the first send, to allow a pause or cancel
+FIRST_SEND_DELAY = timedelta(hours=1)
+ENROLL_BATCH_SIZE = 1000
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def template_context(prospect):
+    """Values for the ``EmailTemplate.AVAILABLE_VARIABLES`` placeholders."""
+    return {
+        'prospect_name': prospect.contact_name or prospect.name,
+        'school_name': prospect.name,
+        'contact_name': prospect.contact_name,
+        'contact_role': prospect.contact_role,
+        'country': settings.COUNTRIES.get(prospect.country, prospect.country),
+        'city': prospect.city,
+        'email': prospect.email,
+    }
+
+
+def step_send_at(enrollment, step, now):
+    """When ``step`` is due: ``delay_days`` after the enrollment started, never in the past."""
+    start = enrollment.started_at or enrollment.enrolled_at
+    return max(start + timedelta(days=step.delay_days), now)
+
+
+def _next_step(steps, last_step_completed):
+    return next((step for step in steps if step.order > last_step_completed), None)
+
+
+def _due_step(enrollment, steps, now):
+    """Return ``(step, send_at)`` for the enrollment's next step, or ``(None, None)``.
+
+    Due steps whose ``send_if`` condition fails are skipped (and count as
+    completed); a step that is not due yet is returned without checking its
+    condition, since engagement can still change before then.
+    """
+    for step in steps:
+        if step.order <= enrollment.last_step_completed:
+            continue
+        send_at = step_send_at(enrollment, step, now)
+        if send_at > now or step.should_send(enrollment.opened, enrollment.clicked):
+            return step, send_at
+        enrollment.last_step_completed = step.order
+    return None, None
+
+
+def _engagement_annotations():
+    """Per-enrollment engagement flags, evaluated in the claim query itself."""
+    logs = EmailLog.objects.filter(enrollment=OuterRef('pk'))
+    return {
+        'replied': Exists(logs.filter(replied_at__isnull=False)),
+        # Only bounces from the prospect's current address count
+        'bounced': Exists(logs.filter(status='bounced', to_email=OuterRef('prospect__email'))),
+        'opened': Exists(logs.filter(opened_at__isnull=False)),
+        'clicked': Exists(logs.filter(clicked_at__isnull=False)),
+    }
+
+
+def enroll_prospects(user, sequence, prospects, now=None):
+    """Enroll every prospect in the ``prospects`` queryset in ``sequence``. Returns the number enrolled.
+
+    Prospects already in the sequence are skipped. The new enrollments and their
+    audit entries are written with ``bulk_create``; enrollments created
+    concurrently by another request are ignored rather than raising.
+    """
+    now = now or timezone.now()
+    to_enroll = list(prospects.exclude(email_enrollments__sequence=sequence).values_list('id', flat=True))
+    if not to_enroll:
+        return 0
+
+    with transaction.atomic():
+        Enrollment.objects.bulk_create(
+            [
+                Enrollment(prospect_id=prospect_id, sequence=sequence, started_at=now, next_send_at=now + FIRST_SEND_DELAY)
+                for prospect_id in to_enroll
+            ],
+            batch_size=ENROLL_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # ignore_conflicts leaves pks unset; rows started at ``now`` are the ones inserted here
+        created = (
+            Enrollment.objects.filter(sequence=sequence, started_at=now, prospect__in=prospects)
+            .values_list('id', 'prospect__name')
+        )
+        audit = [
+            AuditLog(
+                user=user,
+                action='enrollment',
+                content_type='Enrollment',
+                object_id=enrollment_id,
+                object_repr=f"{prospect_name} - {sequence.name}"[:200],
+            )
+            for enrollment_id, prospect_name in created
+        ]
+        AuditLog.objects.bulk_create(audit, batch_size=ENROLL_BATCH_SIZE)
+    return len(audit)
+
+
+def send_due_emails(batch_size=SEND_BATCH_SIZE, now=None, connection=None, scheduler=None):
+    """Send one batch of due sequence emails. Returns a result dict.
+
+    Keys: ``claimed``, ``sent``, ``failed``, ``rescheduled`` (enrollments whose
+    next step is not due yet), ``throttled`` (due sends held back by the
+    rate limits), ``stopped`` (enrollments completed on a reply, or paused on a
+    bounce or after repeated send failures), ``completed``.
+    """
+    now = now or timezone.now()
+    scheduler = scheduler or get_scheduler()
+    result = {'claimed': 0, 'sent': 0, 'failed': 0, 'rescheduled': 0, 'throttled': 0, 'stopped': 0, 'completed': 0}
+
+    # 1. Claim due enrollments and create their pending logs
+    with transaction.atomic():
+        enrollments = list(
+            Enrollment.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status='active', sequence__is_active=True, next_send_at__lte=now)
+            .annotate(**_engagement_annotations())
+            .select_related('prospect', 'sequence')
+            .order_by('next_send_at')[:batch_size]
+        )
+        if not enrollments:
+            return result
+        result['claimed'] = len(enrollments)
+        steps = steps_for_sequences({enrollment.sequence_id: enrollment.sequence for enrollment in enrollments}.values())
+
+        due, outbox, finished = [], [], []
+        for enrollment in enrollments:
+            if enrollment.bounced:
+                # Stop mailing a dead address; resuming after fixing the prospect's email sends again
+                enrollment.status = 'paused'
+                enrollment.paused_at = now
+                result['stopped'] += 1
+                continue
+            if enrollment.replied and enrollment.sequence.stop_on_reply:
+                enrollment.status = 'completed'
+                enrollment.completed_at = now
+                enrollment.next_send_at = None
+                result['stopped'] += 1
+                continue
+            step, send_at = _due_step(enrollment, steps.get(enrollment.sequence_id, []), now)
+            if step is None:
+                finished.append(enrollment)
+                continue
+            if send_at > now:
+                enrollment.next_send_at = send_at
+                result['rescheduled'] += 1
+                continue
+            due.append((recipient_domain(enrollment.prospect.email), settings.DEFAULT_FROM_EMAIL, (enrollment, step)))
+
+        ready, deferred = scheduler.plan(due, now.timestamp(), settings.EMAIL_DISPATCH_WINDOW)
+        for at, (enrollment, step) in deferred:
+            enrollment.next_send_at = now + timedelta(seconds=at - now.timestamp())
+        result['throttled'] = len(deferred)
+        rendered = [
+            (enrollment, step, render_template(step.template, template_context(enrollment.prospect)))
+            for enrollment, step in ready
+        ]
+        bodies = EmailBody.store(text for _enrollment, _step, (_subject, text, _html) in rendered)
+        for enrollment, step, (subject, text, html) in rendered:
+            log = EmailLog(
+                enrollment=enrollment,
+                prospect=enrollment.prospect,
+                to_email=enrollment.prospect.email,
+                subject=subject,
+                body=bodies[text],
+            )
+            outbox.append((enrollment, step, log, (text, html)))
+            enrollment.next_send_at = now + CLAIM_LEASE
+
+        for enrollment in finished:
+            enrollment.status = 'completed'
+            enrollment.completed_at = now
+            enrollment.next_send_at = None
+        result['completed'] += len(finished)
+        EmailLog.objects.bulk_create([log for _enrollment, _step, log, _message in outbox])
+        Enrollment.objects.bulk_update(enrollments, ['status', 'completed_at', 'paused_at', 'next_send_at', 'last_step_completed'])
+
+    if not outbox:
+        return result
+
+    # 2. Send over one connection, outside the transaction
+    connection = connection or get_connection()
+    # Enrollments whose address the server refused for good
+    rejected = set()
+    try:
+        connection.open()
+    except Exception as e:
+        unreachable = True
+        # Mail server unreachable: fail the batch so it is retried, rather than leaving its logs pending
+        for _enrollment, _step, log, _message in outbox:
+            log.status = 'failed'
+            log.error_message = str(e)
+    else:
+        unreachable = False
+        try:
+            for enrollment, _step, log, (text, html) in outbox:
+                headers = {}
+                if settings.EMAIL_TRACKING_ENABLED and log.pk:
+                    html = add_tracking(html, log.pk)
+                    headers['X-Tracking-Token'] = tracking_token(log.pk)
+                message = EmailMultiAlternatives(
+                    log.subject, text, settings.DEFAULT_FROM_EMAIL, [log.to_email], connection=connection, headers=headers,
+                )
+                message.attach_alternative(html, 'text/html')
+                try:
+                    message.send()
+                except Exception as e:
+                    log.status = 'failed'
+                    log.error_message = str(e)
+                    if _is_permanent_failure(e):
+                        rejected.add(enrollment.pk)
+                else:
+                    log.status = 'sent'
+                    log.sent_at = timezone.now()
+        finally:
+            connection.close()
+
+    # 3. Record outcomes and advance enrollments
+    for enrollment, step, log, _message in outbox:
+        if log.status == 'failed':
+            enrollment.next_send_at = now + RETRY_DELAY
+            result['failed'] += 1
+            if unreachable:
+                # Not the recipient's fault; retry without counting it
+                continue
+            enrollment.send_failures += 1
+            if enrollment.pk in rejected or enrollment.send_failures >= MAX_SEND_FAILURES:
+                enrollment.status = 'paused'
+                enrollment.paused_at = now
+                result['stopped'] += 1
+            continue
+        result['sent'] += 1
+        enrollment.send_failures = 0
+        enrollment.last_step_completed = step.order
+        following = _next_step(steps.get(enrollment.sequence_id, []), step.order)
+        if following is None:
+            enrollment.status = 'completed'
+            enrollment.completed_at = log.sent_at
+            enrollment.next_send_at = None
+            result['completed'] += 1
+        else:
+            enrollment.next_send_at = step_send_at(enrollment, following, now)
+
+    with transaction.atomic():
+        EmailLog.objects.bulk_update([log for _enrollment, _step, log, _message in outbox], ['status', 'sent_at', 'error_message'])
+        Enrollment.objects.bulk_update(
+            [enrollment for enrollment, _step, _log, _message in outbox],
+            ['status', 'completed_at', 'paused_at', 'next_send_at', 'last_step_completed', 'send_failures'],
+        )
+    return result
+
+
+def _is_permanent_failure(error):
+    """Whether the server rejected every recipient with a 5xx, so retrying cannot help."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(code >= 500 for code, _message in error.recipients.values())
+    return False
+
+
+def archive_email_logs(older_than, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move logs created before ``older_than`` to ``ArchivedEmailLog``. Returns the number moved.
+
+    Works in batches of ``batch_size``, each copied and deleted in its own
+    transaction. Archived logs keep their id, so links to them keep working.
+    """
+    fields = [field.attname for field in EmailLog._meta.concrete_fields]
+    moved = 0
+    while True:
+        with transaction.atomic():
+            logs = list(EmailLog.objects.filter(created_at__lt=older_than).order_by('pk').values(*fields)[:batch_size])
+            if not logs:
+                break
+            # ignore_conflicts: rows copied by an interrupted earlier run are simply deleted now
+            ArchivedEmailLog.objects.bulk_create([ArchivedEmailLog(**log) for log in logs], ignore_conflicts=True)
+            EmailLog.objects.filter(pk__in=[log['id'] for log in logs])._raw_delete(EmailLog.objects.db)
+        moved += len(logs)
+        if len(logs) < batch_size:
+            break
+    return moved
+
+
+def prune_email_bodies(older_than):
+    """Delete bodies created before ``older_than`` that no live or archived log uses. Returns the number deleted.
+
+    Bodies are left behind when logs are deleted (e.g. with their prospect).
+    The age cutoff keeps bodies that a running send batch may be about to use.
+    """
+    unused = EmailBody.objects.filter(
+        ~Exists(EmailLog.objects.filter(body=OuterRef('pk'))),
+        ~Exists(ArchivedEmailLog.objects.filter(body=OuterRef('pk'))),
+        created_at__lt=older_than,
+    )
+    return unused._raw_delete(unused.db)
@@ -0,0 +1,21 @@
+"""
+Invalidate cached sequence steps (``emails.steps``) when steps or templates change.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import EmailSequence, EmailTemplate, SequenceStep
+from .steps import touch_sequences
+
+
+@receiver(post_save, sender=SequenceStep)
+@receiver(post_delete, sender=SequenceStep)
+def step_changed(sender, instance, **kwargs):
+    touch_sequences(EmailSequence.objects.filter(pk=instance.sequence_id))
+
+
+@receiver(post_save, sender=EmailTemplate)
+def template_changed(sender, instance, created, **kwargs):
+    # Cached steps carry their template; a new template is not used by any step yet
+    if not created:
+        touch_sequences(EmailSequence.objects.filter(steps__template=instance).distinct())
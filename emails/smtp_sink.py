@@ -0,0 +1,78 @@
+"""
+Minimal local SMTP server, used by the backend tests and ``benchmark_sends``.
+
+Speaks just enough ESMTP for ``smtplib`` (no TLS or AUTH), counts connections
+and delivered messages, records message data (unless ``record=False``, so a
+long benchmark does not hold every message in memory), and can drop a
+connection after a given number of messages to simulate a server hang-up.
+"""
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost SMTP sink')
+        delivered = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                if server.drop_after is not None and delivered >= server.drop_after:
+                    return  # hang up without replying
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.delivered += 1
+                    if server.record:
+                        server.messages.append(b''.join(data))
+                delivered += 1
+                self.reply('250 OK queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None, record=True):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.delivered = 0
+        self.drop_after = drop_after
+        self.record = record
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
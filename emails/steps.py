@@ -0,0 +1,64 @@
+"""
+Per-process cache of each sequence's ordered steps.
+
+The send engine resolves the next step of every claimed enrollment from this
+cache instead of querying ``SequenceStep``. Entries are keyed by sequence id
+and ``EmailSequence.updated_at``, which the claim query already loads, so a
+warm cache costs no queries at all.
+
+Writes to a step or to a template used by a sequence bump the sequence's
+``updated_at`` (see ``emails.signals``), which invalidates the entry in every
+process. Code that changes steps with ``QuerySet.update`` or ``bulk_*`` must
+call ``touch_sequences`` itself.
+"""
+import threading
+
+from django.utils import timezone
+
+from .models import EmailSequence, SequenceStep
+
+CACHE_SIZE = 256
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def steps_for_sequences(sequences):
+    """Return ``{sequence_id: [steps ordered by order]}`` for ``sequences`` (EmailSequence objects).
+
+    Steps come with their template loaded. Sequences missing from the cache,
+    or changed since they were cached, are loaded with one query.
+    """
+    result, stale = {}, {}
+    for sequence in sequences:
+        entry = _cache.get(sequence.pk)
+        if entry is not None and entry[0] == sequence.updated_at:
+            result[sequence.pk] = entry[1]
+        else:
+            stale[sequence.pk] = sequence
+    if stale:
+        loaded = {sequence_id: [] for sequence_id in stale}
+        for step in SequenceStep.objects.filter(sequence_id__in=stale).select_related('template').order_by('sequence_id', 'order'):
+            loaded[step.sequence_id].append(step)
+        with _lock:
+            if len(_cache) + len(loaded) > CACHE_SIZE:
+                _cache.clear()
+            for sequence_id, steps in loaded.items():
+                _cache[sequence_id] = (stale[sequence_id].updated_at, steps)
+        result.update(loaded)
+    return result
+
+
+def sequence_steps(sequence):
+    """Ordered steps of one sequence; see ``steps_for_sequences``."""
+    return steps_for_sequences([sequence])[sequence.pk]
+
+
+def touch_sequences(queryset):
+    """Bump ``updated_at`` of the sequences in ``queryset`` so cached steps are reloaded."""
+    queryset.update(updated_at=timezone.now())
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
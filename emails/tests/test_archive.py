@@ -0,0 +1,60 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.http import Http404
+from django.utils import timezone
+from accounts.models import User
+from crm.models import Prospect
+from emails.models import EmailBody, EmailLog, ArchivedEmailLog
+from emails.services import archive_email_logs, prune_email_bodies
+from emails.views import EmailLogDetailView
+
+
+class EmailBodyTests(TestCase):
+    def test_identical_bodies_are_stored_once(self):
+        text = 'Hello from EDU-EXPAND. ' * 50
+        with self.assertNumQueries(3):
+            bodies = EmailBody.store([text, text, 'Other'])
+        self.assertEqual(EmailBody.objects.count(), 2)
+        self.assertLess(len(EmailBody.objects.get(pk=bodies[text].pk).content), len(text) // 10)
+        self.assertEqual(EmailBody.objects.get(pk=bodies[text].pk).text, text)
+        with self.assertNumQueries(1):
+            self.assertEqual(EmailBody.store([text])[text].pk, bodies[text].pk)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='arch@test.com', username='arch@test.com', role=User.COMMERCIAL)
+        self.prospect = Prospect.objects.create(name='School', email='s@school.com', country='NG', owner=self.user)
+        body = EmailBody.store(['Old news'])['Old news']
+        self.logs = [
+            EmailLog.objects.create(prospect=self.prospect, to_email='s@school.com', subject=f'Mail {i}', body=body, status='sent', sent_by=self.user)
+            for i in range(5)
+        ]
+        old = timezone.now() - timedelta(days=500)
+        EmailLog.objects.filter(pk__in=[log.pk for log in self.logs[:3]]).update(created_at=old)
+
+    def test_old_logs_move_to_archive_with_their_ids(self):
+        self.assertEqual(archive_email_logs(timezone.now() - timedelta(days=400), batch_size=2), 3)
+        self.assertEqual(EmailLog.objects.count(), 2)
+        archived = ArchivedEmailLog.objects.get(pk=self.logs[0].pk)
+        self.assertEqual((archived.subject, archived.body_snapshot, archived.sent_by), ('Mail 0', 'Old news', self.user))
+
+        # The detail page reads live and archived logs alike
+        for log, model in ((self.logs[0], ArchivedEmailLog), (self.logs[4], EmailLog)):
+            view = EmailLogDetailView(kwargs={'pk': log.pk})
+            self.assertIsInstance(view.get_object(), model)
+            self.assertEqual(view.get_object().body_snapshot, 'Old news')
+        with self.assertRaises(Http404):
+            EmailLogDetailView(kwargs={'pk': 999999}).get_object()
+
+    def test_command_prunes_unused_bodies(self):
+        orphan = EmailBody.store(['Nobody uses me'])['Nobody uses me']
+        EmailBody.objects.filter(pk=orphan.pk).update(created_at=timezone.now() - timedelta(days=2))
+        call_command('archive_email_logs', days=400, stdout=StringIO())
+        self.assertEqual(ArchivedEmailLog.objects.count(), 3)
+        self.assertFalse(EmailBody.objects.filter(pk=orphan.pk).exists())
+        self.assertEqual(EmailBody.objects.count(), 1)
+        self.assertEqual(prune_email_bodies(timezone.now()), 0)
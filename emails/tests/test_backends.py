@@ -0,0 +1,46 @@
+from django.core.mail import EmailMessage, get_connection
+from django.test import TestCase, override_settings
+from emails.backends import pool
+from emails.smtp_sink import SMTPSink
+
+
+@override_settings(EMAIL_POOL_SIZE=2, EMAIL_POOL_MAX_MESSAGES=3, EMAIL_POOL_IDLE_TIMEOUT=60)
+class PooledSMTPBackendTests(TestCase):
+    def setUp(self):
+        pool.clear()
+        self.server = SMTPSink().start()
+
+    def tearDown(self):
+        pool.clear()
+        self.server.stop()
+
+    def connection(self):
+        return get_connection('emails.backends.PooledSMTPBackend', host='127.0.0.1', port=self.server.port, username='', password='', use_tls=False)
+
+    def message(self, i=0):
+        return EmailMessage(f'Hello {i}', 'Body', 'noreply@edu-expand.com', [f'to{i}@school.com'])
+
+    def test_connection_reused_across_sends(self):
+        for i in range(2):
+            self.assertEqual(self.connection().send_messages([self.message(i)]), 1)
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(pool.idle_count(), 1)
+
+        # The third message reaches EMAIL_POOL_MAX_MESSAGES, so the connection is retired
+        self.connection().send_messages([self.message(2)])
+        self.assertEqual(pool.idle_count(), 0)
+
+    def test_message_cap_rotates_connection(self):
+        with self.connection() as connection:
+            for i in range(7):
+                connection.send_messages([self.message(i)])
+        self.assertEqual(len(self.server.messages), 7)
+        self.assertEqual(self.server.connections, 3)
+
+    def test_reconnects_when_server_drops_connection(self):
+        self.server.drop_after = 1
+        connection = self.connection()
+        self.assertEqual(connection.send_messages([self.message(0), self.message(1)]), 2)
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 2)
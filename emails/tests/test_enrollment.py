@@ -0,0 +1,46 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User, AuditLog
+from crm.models import Prospect
+from emails.models import EmailSequence, Enrollment
+from emails.services import enroll_prospects, FIRST_SEND_DELAY
+
+
+class BulkEnrollmentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='enroll@test.com', username='enroll@test.com', role=User.COMMERCIAL)
+        self.sequence = EmailSequence.objects.create(name='Nurture', created_by=self.user)
+        Prospect.objects.bulk_create([
+            Prospect(name=f'School {i}', email=f'e{i}@school.com', country='NG', owner=self.user) for i in range(30)
+        ])
+        self.prospects = Prospect.objects.filter(owner=self.user)
+
+    def test_skips_existing_and_schedules_first_send(self):
+        Enrollment.objects.create(prospect=self.prospects.first(), sequence=self.sequence)
+        now = timezone.now()
+        # Prospects to enroll, insert, read back ids, audit insert (+ savepoints)
+        with self.assertNumQueries(6):
+            self.assertEqual(enroll_prospects(self.user, self.sequence, self.prospects, now=now), 29)
+
+        self.assertEqual(Enrollment.objects.filter(sequence=self.sequence).count(), 30)
+        self.assertEqual(Enrollment.objects.filter(started_at=now, next_send_at=now + FIRST_SEND_DELAY).count(), 29)
+        audit = AuditLog.objects.filter(action='enrollment', user=self.user)
+        self.assertEqual(audit.count(), 29)
+        self.assertEqual(
+            set(audit.values_list('object_id', flat=True)),
+            set(Enrollment.objects.filter(started_at=now).values_list('id', flat=True)),
+        )
+        self.assertEqual(enroll_prospects(self.user, self.sequence, self.prospects), 0)
+
+    def test_bulk_action_enrolls_own_prospects(self):
+        other = User.objects.create(email='other@test.com', username='other@test.com', role=User.COMMERCIAL)
+        foreign = Prospect.objects.create(name='Foreign', email='f@school.com', country='NG', owner=other)
+        self.client.force_login(self.user)
+        ids = list(self.prospects.values_list('id', flat=True)[:5]) + [foreign.pk]
+        response = self.client.post(reverse('crm:prospect_bulk_action'), {
+            'action': 'enroll_sequence', 'sequence': self.sequence.pk, 'prospect_ids': ids,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Enrollment.objects.filter(sequence=self.sequence).count(), 5)
+        self.assertFalse(Enrollment.objects.filter(prospect=foreign).exists())
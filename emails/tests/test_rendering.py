@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from emails.models import EmailTemplate
+from emails.rendering import compile_template, render_template, placeholders, clear_cache
+
+
+class RenderingTests(TestCase):
+    def setUp(self):
+        clear_cache()
+        self.template = EmailTemplate.objects.create(
+            name='Intro',
+            subject='Hello {{ school_name }}\nBcc: x@evil.com',
+            body_html='<p>Dear {{contact_name}}, {{unknown}}</p>',
+            body_text='Dear {{contact_name}} of {{school_name}}',
+        )
+
+    def test_renders_and_escapes_html_only(self):
+        subject, text, html = render_template(self.template, {'school_name': 'A & B', 'contact_name': '<Ada>'})
+        self.assertEqual(subject, 'Hello A & B Bcc: x@evil.com')
+        self.assertEqual(text, 'Dear <Ada> of A & B')
+        self.assertEqual(html, '<p>Dear &lt;Ada&gt;, </p>')
+
+    def test_cache_is_keyed_by_updated_at(self):
+        compiled = compile_template(self.template)
+        self.assertIs(compile_template(EmailTemplate.objects.get(pk=self.template.pk)), compiled)
+
+        self.template.body_text = 'Changed {{ city }}'
+        self.template.updated_at += timedelta(seconds=1)
+        self.assertIsNot(compile_template(self.template), compiled)
+        self.assertEqual(render_template(self.template, {'city': 'Lagos'})[1], 'Changed Lagos')
+
+    def test_placeholders(self):
+        self.assertEqual(placeholders('{{a}} {{ b }} {% if c %} {{a}}'), {'a', 'b'})
+
+
+class TemplateValidationTests(TestCase):
+    def test_unknown_placeholder_is_rejected(self):
+        template = EmailTemplate(name='Bad', subject='Hi', body_html='{{ unknown }}', body_text='{{prospect_name}}')
+        with self.assertRaises(ValidationError) as error:
+            template.clean()
+        self.assertEqual(set(error.exception.message_dict), {'body_html'})
+
+    def test_placeholders_must_be_declared(self):
+        template = EmailTemplate(name='Declared', subject='Hi {{city}}', body_html='<p>{{school_name}}</p>', body_text='x', variables=['school_name'])
+        with self.assertRaises(ValidationError) as error:
+            template.clean()
+        self.assertEqual(set(error.exception.message_dict), {'subject'})
+
+        template.variables = ['school_name', 'city']
+        template.clean()
+
+        template.variables = ['school_name', 'city', 'budget']
+        with self.assertRaises(ValidationError) as error:
+            template.clean()
+        self.assertEqual(set(error.exception.message_dict), {'variables'})
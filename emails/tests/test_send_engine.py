@@ -0,0 +1,169 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from accounts.models import User
+from crm.models import Prospect
+from emails.models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog
+from emails.services import MAX_SEND_FAILURES, RETRY_DELAY, send_due_emails
+from emails.throttle import reset_scheduler
+
+
+class SendEngineTests(TestCase):
+    def setUp(self):
+        reset_scheduler()
+        self.user = User.objects.create(email='seq@test.com', username='seq@test.com', role=User.COMMERCIAL)
+        self.sequence = EmailSequence.objects.create(name='Welcome', created_by=self.user)
+        welcome = EmailTemplate.objects.create(name='Welcome', subject='Hi {{prospect_name}}', body_html='<p>Hello {{prospect_name}}</p>', body_text='Hello {{prospect_name}} from {{country}}')
+        follow_up = EmailTemplate.objects.create(name='Follow up', subject='Still there?', body_html='<p>Ping</p>', body_text='Ping')
+        SequenceStep.objects.create(sequence=self.sequence, order=1, delay_days=0, template=welcome)
+        SequenceStep.objects.create(sequence=self.sequence, order=2, delay_days=3, template=follow_up)
+        self.now = timezone.now()
+        self.enrollments = []
+        for i in range(3):
+            prospect = Prospect.objects.create(name=f'School {i}', email=f's{i}@school.com', contact_name=f'Ada & {i}', country='NG', owner=self.user)
+            self.enrollments.append(Enrollment.objects.create(prospect=prospect, sequence=self.sequence, started_at=self.now, next_send_at=self.now))
+
+    def test_sends_due_steps_and_schedules_next(self):
+        result = send_due_emails(now=self.now)
+        self.assertEqual((result['claimed'], result['sent']), (3, 3))
+        self.assertEqual(len(mail.outbox), 3)
+        message = mail.outbox[0]
+        # Variables are escaped in the HTML part only
+        self.assertTrue(message.subject.startswith('Hi Ada & '))
+        self.assertIn('from Nigeria', message.body)
+        self.assertIn('Ada &amp; ', message.alternatives[0][0])
+
+        self.assertEqual(EmailLog.objects.filter(status='sent', sent_at__isnull=False).count(), 3)
+        enrollment = Enrollment.objects.get(pk=self.enrollments[0].pk)
+        self.assertEqual(enrollment.last_step_completed, 1)
+        self.assertEqual(enrollment.next_send_at, self.now + timedelta(days=3))
+
+        # Nothing due until the follow-up date, then the sequence completes
+        self.assertEqual(send_due_emails(now=self.now + timedelta(days=1))['claimed'], 0)
+        result = send_due_emails(now=self.now + timedelta(days=3))
+        self.assertEqual((result['sent'], result['completed']), (3, 3))
+        self.assertFalse(Enrollment.objects.exclude(status='completed').exists())
+
+    def test_batches_are_bounded_and_skip_inactive(self):
+        Enrollment.objects.filter(pk=self.enrollments[0].pk).update(status='paused')
+        # Claim, steps, body lookup/insert/read-back, log insert, enrollment update,
+        # then two outcome updates (+ savepoints)
+        with self.assertNumQueries(13):
+            result = send_due_emails(batch_size=1, now=self.now)
+        self.assertEqual(result['sent'], 1)
+        self.assertEqual(send_due_emails(batch_size=10, now=self.now)['sent'], 1)
+        self.assertEqual(send_due_emails(batch_size=10, now=self.now)['claimed'], 0)
+
+    def test_worker_caps_send_batches_per_tick(self):
+        call_command('run_background_jobs', once=True, email_batch_size=1, email_max_batches=2, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(Enrollment.objects.filter(last_step_completed=1).count(), 2)
+
+    def test_failed_send_is_retried_later(self):
+        class BrokenBackend(mail.backends.locmem.EmailBackend):
+            def send_messages(self, messages):
+                raise OSError('connection refused')
+
+        result = send_due_emails(now=self.now, connection=BrokenBackend())
+        self.assertEqual(result['failed'], 3)
+        self.assertEqual(EmailLog.objects.filter(status='failed', error_message='connection refused').count(), 3)
+        enrollment = Enrollment.objects.get(pk=self.enrollments[0].pk)
+        self.assertEqual(enrollment.last_step_completed, 0)
+        self.assertGreater(enrollment.next_send_at, self.now)
+
+    def test_repeated_failures_pause_the_enrollment(self):
+        class BrokenBackend(mail.backends.locmem.EmailBackend):
+            def send_messages(self, messages):
+                raise OSError('connection reset')
+
+        Enrollment.objects.exclude(pk=self.enrollments[0].pk).delete()
+        at = self.now
+        for _attempt in range(MAX_SEND_FAILURES):
+            result = send_due_emails(now=at, connection=BrokenBackend())
+            self.assertEqual(result['failed'], 1)
+            at += RETRY_DELAY
+        enrollment = Enrollment.objects.get(pk=self.enrollments[0].pk)
+        self.assertEqual((enrollment.status, enrollment.send_failures), ('paused', MAX_SEND_FAILURES))
+        self.assertEqual(send_due_emails(now=at + RETRY_DELAY)['claimed'], 0)
+        self.assertEqual(EmailLog.objects.filter(status='failed').count(), MAX_SEND_FAILURES)
+
+    def test_refused_address_pauses_at_once(self):
+        class RefusingBackend(mail.backends.locmem.EmailBackend):
+            def send_messages(self, messages):
+                raise smtplib.SMTPRecipientsRefused({messages[0].to[0]: (550, b'No such user')})
+
+        result = send_due_emails(now=self.now, connection=RefusingBackend())
+        self.assertEqual((result['failed'], result['stopped']), (3, 3))
+        self.assertFalse(Enrollment.objects.filter(status='active').exists())
+
+    def test_unreachable_server_fails_the_batch(self):
+        class UnreachableBackend(mail.backends.locmem.EmailBackend):
+            def open(self):
+                raise OSError('connection refused')
+
+        result = send_due_emails(now=self.now, connection=UnreachableBackend())
+        self.assertEqual(result['failed'], 3)
+        self.assertFalse(EmailLog.objects.filter(status='pending').exists())
+        self.assertEqual(EmailLog.objects.filter(status='failed', error_message='connection refused').count(), 3)
+        enrollment = Enrollment.objects.get(pk=self.enrollments[0].pk)
+        self.assertEqual((enrollment.next_send_at, enrollment.send_failures), (self.now + RETRY_DELAY, 0))
+
+    def test_worker_survives_a_failing_send_tick(self):
+        target = 'enrichment.management.commands.run_background_jobs.send_due_emails'
+        with mock.patch(target, side_effect=OSError('boom')), self.assertLogs('edu_expand', 'ERROR'):
+            call_command('run_background_jobs', once=True, stdout=StringIO())
+
+
+class EngagementRulesTests(TestCase):
+    def setUp(self):
+        reset_scheduler()
+        self.user = User.objects.create(email='rules@test.com', username='rules@test.com', role=User.COMMERCIAL)
+        self.sequence = EmailSequence.objects.create(name='Rules', created_by=self.user)
+        intro = EmailTemplate.objects.create(name='Intro', subject='Intro', body_html='<p>Intro</p>', body_text='Intro')
+        resend = EmailTemplate.objects.create(name='Resend', subject='Resend', body_html='<p>Resend</p>', body_text='Resend')
+        demo = EmailTemplate.objects.create(name='Demo', subject='Demo', body_html='<p>Demo</p>', body_text='Demo')
+        SequenceStep.objects.create(sequence=self.sequence, order=1, delay_days=0, template=intro)
+        SequenceStep.objects.create(sequence=self.sequence, order=2, delay_days=2, template=resend, send_if=SequenceStep.NOT_OPENED)
+        SequenceStep.objects.create(sequence=self.sequence, order=3, delay_days=4, template=demo, send_if=SequenceStep.CLICKED)
+        self.now = timezone.now()
+        self.enrollments = {}
+        for name in ('quiet', 'opener', 'clicker', 'replier', 'bounce'):
+            prospect = Prospect.objects.create(name=name, email=f'{name}@school.com', country='NG', owner=self.user)
+            self.enrollments[name] = Enrollment.objects.create(prospect=prospect, sequence=self.sequence, started_at=self.now, next_send_at=self.now)
+        send_due_emails(now=self.now)
+        mail.outbox.clear()
+
+    def engage(self, name, **fields):
+        EmailLog.objects.filter(enrollment=self.enrollments[name]).update(**fields)
+
+    def test_replies_bounces_and_branches(self):
+        self.engage('opener', opened_at=self.now)
+        self.engage('clicker', opened_at=self.now, clicked_at=self.now)
+        self.engage('replier', replied_at=self.now, status='replied')
+        self.engage('bounce', status='bounced')
+
+        result = send_due_emails(now=self.now + timedelta(days=2))
+        self.assertEqual((result['stopped'], result['sent']), (2, 1))
+        self.assertEqual([message.to[0] for message in mail.outbox], ['quiet@school.com'])
+        self.assertEqual(Enrollment.objects.get(pk=self.enrollments['replier'].pk).status, 'completed')
+        self.assertEqual(Enrollment.objects.get(pk=self.enrollments['bounce'].pk).status, 'paused')
+        # Openers skipped the resend step
+        self.assertEqual(Enrollment.objects.get(pk=self.enrollments['opener'].pk).last_step_completed, 2)
+
+        mail.outbox.clear()
+        result = send_due_emails(now=self.now + timedelta(days=4))
+        self.assertEqual([message.to[0] for message in mail.outbox], ['clicker@school.com'])
+        self.assertEqual(result['completed'], 3)
+        self.assertEqual(Enrollment.objects.filter(status='completed').count(), 4)
+
+    def test_reply_does_not_stop_when_disabled(self):
+        EmailSequence.objects.filter(pk=self.sequence.pk).update(stop_on_reply=False)
+        self.engage('replier', replied_at=self.now, status='replied')
+        send_due_emails(now=self.now + timedelta(days=2))
+        self.assertIn('replier@school.com', [message.to[0] for message in mail.outbox])
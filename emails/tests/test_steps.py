@@ -0,0 +1,49 @@
+from django.test import TestCase
+from accounts.models import User
+from crm.models import Prospect
+from emails.models import EmailTemplate, EmailSequence, SequenceStep, Enrollment
+from emails.steps import steps_for_sequences, clear_cache
+
+
+class SequenceStepCacheTests(TestCase):
+    def setUp(self):
+        clear_cache()
+        user = User.objects.create(email='steps@test.com', username='steps@test.com', role=User.COMMERCIAL)
+        self.template = EmailTemplate.objects.create(name='One', subject='One', body_html='One', body_text='One')
+        self.sequences = []
+        for i in range(3):
+            sequence = EmailSequence.objects.create(name=f'Sequence {i}', created_by=user)
+            SequenceStep.objects.create(sequence=sequence, order=1, delay_days=0, template=self.template)
+            SequenceStep.objects.create(sequence=sequence, order=2, delay_days=3, template=self.template)
+            self.sequences.append(sequence)
+        prospect = Prospect.objects.create(name='School', email='s@school.com', country='NG', owner=user)
+        self.enrollment = Enrollment.objects.create(prospect=prospect, sequence=self.sequences[0], last_step_completed=1)
+
+    def fresh_sequences(self):
+        return list(EmailSequence.objects.filter(pk__in=[sequence.pk for sequence in self.sequences]))
+
+    def test_warm_cache_needs_no_queries(self):
+        sequences = self.fresh_sequences()
+        with self.assertNumQueries(1):
+            steps = steps_for_sequences(sequences)
+        self.assertEqual([step.order for step in steps[self.sequences[0].pk]], [1, 2])
+        sequences = self.fresh_sequences()
+        with self.assertNumQueries(0):
+            steps_for_sequences(sequences)
+        enrollment = Enrollment.objects.select_related('sequence').get(pk=self.enrollment.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(enrollment.get_next_step().order, 2)
+
+    def test_step_and_template_writes_invalidate(self):
+        steps_for_sequences(self.fresh_sequences())
+        SequenceStep.objects.create(sequence=self.sequences[1], order=3, delay_days=5, template=self.template)
+        sequences = self.fresh_sequences()
+        # Only the changed sequence is reloaded
+        with self.assertNumQueries(1):
+            steps = steps_for_sequences(sequences)
+        self.assertEqual(len(steps[self.sequences[1].pk]), 3)
+
+        self.template.subject = 'Changed'
+        self.template.save()
+        steps = steps_for_sequences(self.fresh_sequences())
+        self.assertEqual(steps[self.sequences[2].pk][0].template.subject, 'Changed')
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from crm.models import Prospect
+from emails.models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog
+from emails.services import send_due_emails
+from emails.throttle import DispatchScheduler, TokenBucket
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        for _i in range(2):
+            self.assertEqual(bucket.available_at(100), 100)
+            bucket.take(100)
+        self.assertEqual(bucket.available_at(100), 100.5)
+        self.assertEqual(bucket.available_at(101), 101)
+
+
+class DispatchSchedulerTests(SimpleTestCase):
+    def test_busy_domain_is_spread_and_others_go_first(self):
+        # 60/min = one per second per domain, bursts of 2; account limit 600/min
+        scheduler = DispatchScheduler(60, 2, 600, 100)
+        sends = [('busy.ng', 'us', f'busy{i}') for i in range(5)] + [('quiet.eg', 'us', 'quiet')]
+        ready, deferred = scheduler.plan(sends, now=0, window=2)
+        self.assertEqual(ready, ['busy0', 'busy1', 'quiet'])
+        self.assertEqual(deferred, [(1, 'busy2'), (2, 'busy3'), (3, 'busy4')])
+
+    def test_only_sends_going_out_now_take_tokens(self):
+        scheduler = DispatchScheduler(60, 1, 0, 1)
+        ready, deferred = scheduler.plan([('busy.ng', 'us', i) for i in range(3)], now=0, window=5)
+        self.assertEqual((ready, deferred), ([0], [(1, 1), (2, 2)]))
+        # Planned again at its slot, a deferred send finds its token
+        self.assertEqual(scheduler.plan([('busy.ng', 'us', 1)], now=1, window=5), ([1], []))
+
+    def test_account_limit_applies_across_domains(self):
+        scheduler = DispatchScheduler(0, 1, 60, 1)
+        ready, deferred = scheduler.plan([(f'd{i}.ng', 'us', i) for i in range(3)], now=0, window=1)
+        self.assertEqual(ready, [0])
+        self.assertEqual(deferred, [(1, 1), (2, 2)])
+
+
+class ThrottledSendTests(TestCase):
+    def test_over_limit_sends_are_rescheduled(self):
+        user = User.objects.create(email='thr@test.com', username='thr@test.com', role=User.COMMERCIAL)
+        sequence = EmailSequence.objects.create(name='Blast', created_by=user)
+        template = EmailTemplate.objects.create(name='Blast', subject='Hi', body_html='<p>Hi</p>', body_text='Hi')
+        SequenceStep.objects.create(sequence=sequence, order=1, delay_days=0, template=template)
+        now = timezone.now()
+        for i in range(4):
+            domain = 'shared.ng' if i < 3 else 'other.eg'
+            prospect = Prospect.objects.create(name=f'School {i}', email=f's{i}@{domain}', country='NG', owner=user)
+            Enrollment.objects.create(prospect=prospect, sequence=sequence, started_at=now, next_send_at=now)
+
+        scheduler = DispatchScheduler(6, 2, 600, 100)
+        result = send_due_emails(now=now, scheduler=scheduler)
+        self.assertEqual((result['sent'], result['throttled']), (3, 1))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['s0@shared.ng', 's1@shared.ng', 's3@other.eg'])
+        self.assertEqual(EmailLog.objects.count(), 3)
+        # 6/min: the third message to shared.ng can go 10 seconds later
+        throttled = Enrollment.objects.get(prospect__email='s2@shared.ng')
+        self.assertEqual(throttled.next_send_at, now + timedelta(seconds=10))
+
+        self.assertEqual(send_due_emails(now=now + timedelta(seconds=10), scheduler=scheduler)['sent'], 1)
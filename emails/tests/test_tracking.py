@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from crm.models import Prospect, Interaction
+from emails.models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog
+from emails.services import send_due_emails
+from emails.throttle import reset_scheduler
+from emails.tracking import EngagementBuffer, engagement_events, apply_events, parse_webhook_events, tracking_token, OPEN, CLICK, REPLY, BOUNCE
+
+
+class ApplyEventsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(email='track@test.com', username='track@test.com', role=User.COMMERCIAL)
+        self.prospect = Prospect.objects.create(name='School', email='s@school.ng', country='NG', owner=user)
+        self.log = EmailLog.objects.create(prospect=self.prospect, to_email='s@school.ng', subject='Hello', status='sent')
+        self.now = timezone.now()
+
+    def test_events_are_coalesced(self):
+        events = [(OPEN, self.log.pk, self.now + timedelta(seconds=i)) for i in range(50)]
+        events += [(CLICK, self.log.pk, self.now + timedelta(seconds=5)), (OPEN, 999999, self.now)]
+        # Read logs, update logs, insert interaction, update prospect, mark rollup day (+ savepoints)
+        with self.assertNumQueries(7):
+            self.assertEqual(apply_events(events), 1)
+
+        log = EmailLog.objects.get(pk=self.log.pk)
+        self.assertEqual((log.status, log.opened_at, log.clicked_at), ('clicked', self.now, self.now + timedelta(seconds=5)))
+        self.assertEqual(Interaction.objects.get(prospect=self.prospect).summary, 'Clicked a link in "Hello"')
+        self.prospect.refresh_from_db()
+        self.assertEqual(self.prospect.last_interaction_at, self.now + timedelta(seconds=5))
+
+        # Repeats change nothing; a later open does not downgrade the status
+        apply_events([(OPEN, self.log.pk, self.now), (CLICK, self.log.pk, self.now)])
+        self.assertEqual(EmailLog.objects.get(pk=self.log.pk).status, 'clicked')
+        self.assertEqual(Interaction.objects.count(), 1)
+
+    def test_reply_and_bounce(self):
+        apply_events([(BOUNCE, self.log.pk, self.now)])
+        self.assertEqual(EmailLog.objects.get(pk=self.log.pk).status, 'bounced')
+        other = EmailLog.objects.create(prospect=self.prospect, to_email='s@school.ng', subject='Again', status='sent')
+        apply_events([(REPLY, other.pk, self.now), (BOUNCE, other.pk, self.now)])
+        other.refresh_from_db()
+        self.assertEqual((other.status, other.replied_at), ('replied', self.now))
+
+    def test_buffer_applies_on_flush(self):
+        buffer = EngagementBuffer(flush_interval=60, max_size=100)
+        buffer.start = lambda: None  # flush by hand instead of from the background thread
+        with self.assertNumQueries(0):
+            buffer.add(OPEN, self.log.pk)
+        self.assertIsNone(EmailLog.objects.get(pk=self.log.pk).opened_at)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(EmailLog.objects.get(pk=self.log.pk).status, 'opened')
+
+
+@override_settings(EMAIL_WEBHOOK_SECRET='s3cret', SITE_URL='https://crm.example.com')
+class TrackingEndpointTests(TestCase):
+    def setUp(self):
+        reset_scheduler()
+        user = User.objects.create(email='track@test.com', username='track@test.com', role=User.COMMERCIAL)
+        sequence = EmailSequence.objects.create(name='Intro', created_by=user)
+        template = EmailTemplate.objects.create(
+            name='Intro', subject='Hi', body_text='Hi',
+            body_html='<html><body><a href="https://edu.example.com/demo?a=1&amp;b=2">Book</a></body></html>',
+        )
+        SequenceStep.objects.create(sequence=sequence, order=1, delay_days=0, template=template)
+        prospect = Prospect.objects.create(name='School', email='s@school.ng', country='NG', owner=user)
+        now = timezone.now()
+        Enrollment.objects.create(prospect=prospect, sequence=sequence, started_at=now, next_send_at=now)
+        send_due_emails(now=now)
+        self.log = EmailLog.objects.get()
+        self.message = mail.outbox[0]
+        # Apply events inline instead of from the background flusher
+        self.addCleanup(setattr, engagement_events, 'flush_interval', engagement_events.flush_interval)
+        engagement_events.flush_interval = 0
+
+    def test_pixel_and_click_redirect(self):
+        html = self.message.alternatives[0][0]
+        self.assertEqual(self.message.extra_headers['X-Tracking-Token'], tracking_token(self.log.pk))
+        self.assertNotIn('edu.example.com', html)
+        pixel = html.split('<img src="https://crm.example.com')[1].split('"')[0]
+        link = html.split('href="https://crm.example.com')[1].split('"')[0]
+
+        response = self.client.get(pixel)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/gif'))
+        self.assertEqual(EmailLog.objects.get(pk=self.log.pk).status, 'opened')
+
+        response = self.client.get(link)
+        self.assertRedirects(response, 'https://edu.example.com/demo?a=1&b=2', fetch_redirect_response=False)
+        self.assertEqual(EmailLog.objects.get(pk=self.log.pk).status, 'clicked')
+        self.assertEqual(self.client.get(link[:-3] + 'xx/').status_code, 404)
+
+    def test_webhook(self):
+        url = reverse('emails:engagement_webhook')
+        payload = {'events': [
+            {'event': 'reply', 'token': tracking_token(self.log.pk), 'timestamp': 1700000000},
+            {'event': 'open', 'token': 'forged:token'},
+        ]}
+        self.assertEqual(self.client.post(url, payload, content_type='application/json').status_code, 403)
+        response = self.client.post(url, payload, content_type='application/json', HTTP_X_WEBHOOK_SECRET='s3cret')
+        self.assertEqual((response.status_code, response.json()), (202, {'accepted': 1}))
+        self.assertEqual(EmailLog.objects.get(pk=self.log.pk).status, 'replied')
+
+        response = self.client.post(url, {'events': [{'event': 'spam'}]}, content_type='application/json', HTTP_X_WEBHOOK_SECRET='s3cret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_webhook_timestamps(self):
+        token = tracking_token(self.log.pk)
+        seconds, millis = parse_webhook_events({'events': [
+            {'event': 'open', 'token': token, 'timestamp': 1700000000},
+            {'event': 'open', 'token': token, 'timestamp': 1700000000500},
+        ]})
+        self.assertEqual(millis[2] - seconds[2], timedelta(milliseconds=500))
+        url = reverse('emails:engagement_webhook')
+        for bad in (True, 1e300, float('inf')):
+            payload = {'events': [{'event': 'open', 'token': token, 'timestamp': bad}]}
+            response = self.client.post(url, payload, content_type='application/json', HTTP_X_WEBHOOK_SECRET='s3cret')
+            self.assertEqual(response.status_code, 400, bad)
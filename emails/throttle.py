@@ -0,0 +1,148 @@
+"""
+Rate-limited dispatch of sequence emails.
+
+Schools often share a handful of mail hosts, and providers throttle or
+blocklist senders that deliver too much to one domain at once. Every send is
+limited by two token buckets: one for the recipient domain
+(``EMAIL_DOMAIN_RATE`` per minute, bursts of ``EMAIL_DOMAIN_BURST``) and one for
+the sending account (``EMAIL_ACCOUNT_RATE``/``EMAIL_ACCOUNT_BURST``).
+
+``DispatchScheduler.plan`` orders a batch of sends with a priority queue keyed
+by the time each one next becomes eligible: sends the limits allow now go out
+immediately, and sends to a busy domain are handed back with the time they
+should be retried, staggered one slot apart over the dispatch window. Nothing
+waits in the worker; a retried send is claimed again once its slot comes.
+
+Buckets live in the worker process; with several workers each one applies the
+limits on its own.
+"""
+import heapq
+import threading
+
+from django.conf import settings
+
+# Idle buckets are dropped once this many exist
+MAX_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = None
+
+    def _refill(self, at):
+        if self.updated is None or at > self.updated:
+            if self.updated is not None:
+                self.tokens = min(self.capacity, self.tokens + (at - self.updated) * self.rate)
+            self.updated = at
+
+    def available_at(self, at):
+        """Earliest time, no sooner than ``at``, when a token can be taken."""
+        self._refill(at)
+        if self.tokens >= 1 or not self.rate:
+            return at
+        return at + (1 - self.tokens) / self.rate
+
+    def take(self, at):
+        self._refill(at)
+        self.tokens -= 1
+
+    def is_idle(self, at):
+        self._refill(at)
+        return self.tokens >= self.capacity
+
+
+class DispatchScheduler:
+    """Per-domain and per-account token buckets; rates are messages per minute (0 = unlimited)."""
+
+    def __init__(self, domain_rate, domain_burst, account_rate, account_burst):
+        self.limits = {
+            'domain': (domain_rate / 60, domain_burst),
+            'account': (account_rate / 60, account_burst),
+        }
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket_list(self, domain, account):
+        buckets = []
+        for kind, key in (('domain', domain), ('account', account)):
+            rate, burst = self.limits[kind]
+            if not rate:
+                continue
+            bucket = self._buckets.get((kind, key))
+            if bucket is None:
+                bucket = self._buckets[(kind, key)] = TokenBucket(rate, burst)
+            buckets.append(bucket)
+        return buckets
+
+    def plan(self, sends, now, window):
+        """Split ``sends``, an iterable of ``(domain, account, item)``, by when each can go out.
+
+        ``now`` and the returned times are POSIX timestamps. Returns ``(ready,
+        deferred)``: ``ready`` is the list of items that can be sent now, in
+        send order; ``deferred`` is a list of ``(at, item)`` for the rest.
+        Deferred sends within ``now + window`` get staggered slots as if the
+        earlier ones had gone out, but tokens are only taken for ``ready``:
+        deferred sends are charged when they are planned again at their slot.
+        """
+        # Entries are (eligible_at, position, domain, account, item); position keeps batch order stable
+        queue = [(now, position, domain.lower(), account, item) for position, (domain, account, item) in enumerate(sends)]
+        heapq.heapify(queue)
+        ready, deferred = [], []
+        # Bucket states before the first later slot was planned, restored below
+        saved = {}
+        with self._lock:
+            while queue:
+                at, position, domain, account, item = heapq.heappop(queue)
+                buckets = self._bucket_list(domain, account)
+                if at > now:
+                    for bucket in buckets:
+                        saved.setdefault(bucket, (bucket.tokens, bucket.updated))
+                eligible = max([bucket.available_at(at) for bucket in buckets], default=at)
+                if eligible > now + window:
+                    deferred.append((eligible, item))
+                elif eligible > at:
+                    heapq.heappush(queue, (eligible, position, domain, account, item))
+                else:
+                    for bucket in buckets:
+                        bucket.take(at)
+                    if at > now:
+                        deferred.append((at, item))
+                    else:
+                        ready.append(item)
+            for bucket, (tokens, updated) in saved.items():
+                bucket.tokens, bucket.updated = tokens, updated
+            self._prune(now)
+        return ready, deferred
+
+    def _prune(self, now):
+        if len(self._buckets) > MAX_BUCKETS:
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_idle(now)}
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Return this process's scheduler, built from settings on first use."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DispatchScheduler(
+            settings.EMAIL_DOMAIN_RATE, settings.EMAIL_DOMAIN_BURST,
+            settings.EMAIL_ACCOUNT_RATE, settings.EMAIL_ACCOUNT_BURST,
+        )
+    return _scheduler
+
+
+def reset_scheduler():
+    """Forget all buckets (and pick up changed settings on next use)."""
+    global _scheduler
+    _scheduler = None
+
+
+def recipient_domain(email):
+    return email.rpartition('@')[2].lower()
@@ -0,0 +1,208 @@
+"""
+Open, click, reply and bounce tracking for sent emails.
+
+Sent HTML bodies get a tracking pixel and their links rewritten to a redirect
+endpoint (``add_tracking``); both carry a signed ``EmailLog`` id. The pixel,
+the redirect and the provider webhook only queue an event in an in-process
+buffer (``edu_expand.buffers``). A daemon thread applies the buffer every
+``EMAIL_EVENTS_FLUSH_INTERVAL`` seconds (or once ``EMAIL_EVENTS_BUFFER_SIZE``
+events are waiting): events are
+coalesced per log and written with one read and a few bulk writes, so a burst
+of opens does not turn into a burst of single-row updates.
+
+A first click or reply also records an email ``Interaction`` on the prospect.
+Events still buffered when a process is killed are lost.
+"""
+import html
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytics.rollups import prospect_day, schedule_rollup_refresh
+from crm.models import Interaction, Prospect
+from edu_expand.buffers import BatchBuffer
+from .models import EmailLog
+
+logger = logging.getLogger('edu_expand.emails')
+
+OPEN = 'open'
+CLICK = 'click'
+REPLY = 'reply'
+BOUNCE = 'bounce'
+EVENTS = (OPEN, CLICK, REPLY, BOUNCE)
+
+# Event -> (EmailLog status, timestamp field)
+ENGAGEMENT = {
+    OPEN: ('opened', 'opened_at'),
+    CLICK: ('clicked', 'clicked_at'),
+    REPLY: ('replied', 'replied_at'),
+}
+# A log's status only moves forward: an open after a reply keeps it "replied"
+STATUS_RANK = {'opened': 1, 'clicked': 2, 'replied': 3}
+INTERACTION_SUMMARIES = {
+    CLICK: 'Clicked a link in "{subject}"',
+    REPLY: 'Replied to "{subject}"',
+}
+
+TOKEN_SALT = 'emails.tracking'
+LINK_RE = re.compile(r'''href=(["'])(https?://.+?)\1''', re.IGNORECASE)
+# Numeric timestamps above this are taken as milliseconds (1e11 seconds is past the year 5000)
+MILLISECOND_TIMESTAMPS = 1e11
+# 1x1 transparent GIF
+PIXEL = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\x00\x00\x00'
+    b'!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+def tracking_token(log_id):
+    return signing.Signer(salt=TOKEN_SALT).sign(str(log_id))
+
+
+def read_tracking_token(token):
+    """Return the ``EmailLog`` id in ``token``, or None if it was tampered with."""
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def click_token(log_id, url):
+    return signing.dumps({'log': log_id, 'url': url}, salt=TOKEN_SALT, compress=True)
+
+
+def read_click_token(token):
+    """Return ``(log_id, url)`` from a click token, or None if it was tampered with."""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+        return int(data['log']), data['url']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def add_tracking(body_html, log_id):
+    """Rewrite http(s) links in ``body_html`` through the click redirect and append the open pixel."""
+    base = settings.SITE_URL.rstrip('/')
+
+    def track_link(match):
+        url = base + reverse('emails:track_click', args=[click_token(log_id, html.unescape(match.group(2)))])
+        return f'href={match.group(1)}{url}{match.group(1)}'
+
+    pixel = f'<img src="{base}{reverse("emails:track_open", args=[tracking_token(log_id)])}" width="1" height="1" alt="">'
+    body_html = LINK_RE.sub(track_link, body_html)
+    head, body_end, tail = body_html.rpartition('</body>')
+    if body_end:
+        return f'{head}{pixel}{body_end}{tail}'
+    return body_html + pixel
+
+
+def parse_webhook_events(payload):
+    """Validate a webhook payload and return its ``(event, log_id, at)`` tuples.
+
+    Expects ``{"events": [{"event": "open", "token": "...", "timestamp": ...}]}``
+    where ``token`` is the ``X-Tracking-Token`` header of the sent message and
+    ``timestamp`` (optional) is an ISO 8601 string or Unix seconds. Events with a
+    tampered token are dropped. Raises ``ValueError`` on a malformed payload.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('events'), list):
+        raise ValueError('Expected an object with an "events" list')
+    events = []
+    for item in payload['events']:
+        if not isinstance(item, dict) or item.get('event') not in EVENTS:
+            raise ValueError(f'Each event needs an "event" in {", ".join(EVENTS)}')
+        log_id = read_tracking_token(str(item.get('token', '')))
+        if log_id is None:
+            continue
+        events.append((item['event'], log_id, _parse_timestamp(item.get('timestamp'))))
+    return events
+
+
+def _parse_timestamp(value):
+    """Parse an ISO 8601 string or a POSIX timestamp in seconds or milliseconds."""
+    if value is None:
+        return timezone.now()
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid timestamp: {value}')
+    if isinstance(value, (int, float)):
+        if abs(value) > MILLISECOND_TIMESTAMPS:
+            value /= 1000
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            raise ValueError(f'Timestamp out of range: {value}')
+    at = parse_datetime(str(value))
+    if at is None:
+        raise ValueError(f'Invalid timestamp: {value}')
+    return at if timezone.is_aware(at) else timezone.make_aware(at, dt_timezone.utc)
+
+
+def apply_events(events):
+    """Apply ``(event, log_id, at)`` tuples. Returns the number of logs changed.
+
+    Only the first occurrence of each event per log counts. Unknown log ids are
+    ignored. Costs one read plus one bulk write per table touched.
+    """
+    first = {}
+    for event, log_id, at in events:
+        if (log_id, event) not in first or at < first[(log_id, event)]:
+            first[(log_id, event)] = at
+    if not first:
+        return 0
+
+    with transaction.atomic():
+        logs = EmailLog.objects.select_related('prospect').in_bulk({log_id for log_id, _event in first})
+        changed, interactions, prospects = {}, [], {}
+        for (log_id, event), at in sorted(first.items(), key=lambda item: item[1]):
+            log = logs.get(log_id)
+            if log is None:
+                continue
+            if event == BOUNCE:
+                if log.status in ('pending', 'sent'):
+                    log.status = 'bounced'
+                    changed[log.pk] = log
+                continue
+
+            status, field = ENGAGEMENT[event]
+            if getattr(log, field) is not None:
+                continue
+            setattr(log, field, at)
+            if log.status != 'bounced' and STATUS_RANK[status] > STATUS_RANK.get(log.status, 0):
+                log.status = status
+            changed[log.pk] = log
+            if event in INTERACTION_SUMMARIES:
+                prospect = log.prospect
+                interactions.append(Interaction(
+                    prospect=prospect,
+                    interaction_type=Interaction.EMAIL,
+                    summary=INTERACTION_SUMMARIES[event].format(subject=log.subject),
+                ))
+                if prospect.last_interaction_at is None or prospect.last_interaction_at < at:
+                    prospect.last_interaction_at = at
+                prospects[prospect.pk] = prospect
+
+        EmailLog.objects.bulk_update(changed.values(), ['status', 'opened_at', 'clicked_at', 'replied_at'])
+        if interactions:
+            Interaction.objects.bulk_create(interactions)
+            Prospect.objects.bulk_update(prospects.values(), ['last_interaction_at'])
+            schedule_rollup_refresh(prospect_day(prospect) for prospect in prospects.values())
+    return len(changed)
+
+
+class EngagementBuffer(BatchBuffer):
+    """Buffer of engagement events applied in batches with ``apply_events``."""
+
+    def __init__(self, flush_interval, max_size):
+        super().__init__(apply_events, 'email-events', flush_interval, max_size)
+
+    def add(self, event, log_id, at=None):
+        super().add((event, log_id, at or timezone.now()))
+
+
+engagement_events = EngagementBuffer(settings.EMAIL_EVENTS_FLUSH_INTERVAL, settings.EMAIL_EVENTS_BUFFER_SIZE)
@@ -34,4 +34,9 @@ urlpatterns = [
     # Email logs
     path('logs/', views.EmailLogListView.as_view(), name='email_log_list'),
     path('logs/<int:pk>/', views.EmailLogDetailView.as_view(), name='email_log_detail'),
+    
+    # Engagement tracking
+    path('t/o/<str:token>/', views.TrackOpenView.as_view(), name='track_open'),
+    path('t/c/<str:token>/', views.TrackClickView.as_view(), name='track_click'),
+    path('webhooks/events/', views.EngagementWebhookView.as_view(), name='engagement_webhook'),
 ]
@@ -1,21 +1,29 @@
 """
 Email automation views.
 """
+import hmac
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import View, ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse_lazy
 from django.db.models import Q
 
 from accounts.models import User, AuditLog
 from crm.models import Prospect
-from .models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog
+from .models import EmailTemplate, EmailSequence, SequenceStep, Enrollment, EmailLog, ArchivedEmailLog
 from .forms import (
     EmailTemplateForm, EmailSequenceForm, SequenceStepForm,
     EnrollmentForm, EnrollmentActionForm
 )
+from .services import enroll_prospects
+from .tracking import OPEN, CLICK, PIXEL, engagement_events, parse_webhook_events, read_click_token, read_tracking_token
 
 
 class CommercialRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -245,25 +253,7 @@ class EnrollmentCreateView(CommercialRequiredMixin, CreateView):
     def form_valid(self, form):
         sequence = form.cleaned_data['sequence']
         
-        # Check if already enrolled
-        enrollment, created = Enrollment.objects.get_or_create(
-            prospect=self.prospect,
-            sequence=sequence
-        )
-        
-        if created:
-            enrollment.started_at = timezone.now()
-            enrollment.next_send_at = timezone.now() + timedelta(hours=1)
-            enrollment.save()
-            
-            AuditLog.objects.create(
-                user=self.request.user,
-                action='enrollment',
-                content_type='Enrollment',
-                object_id=enrollment.pk,
-                object_repr=f"{self.prospect.name} - {sequence.name}"
-            )
-            
+        if enroll_prospects(self.request.user, sequence, Prospect.objects.filter(pk=self.prospect.pk)):
             messages.success(self.request, f'Enrolled in {sequence.name}')
         else:
             messages.warning(self.request, 'Already enrolled in this sequence')
@@ -317,6 +307,7 @@ class EnrollmentResumeView(CommercialRequiredMixin, View):
         
         enrollment.status = 'active'
         enrollment.paused_at = None
+        enrollment.send_failures = 0
         enrollment.save()
         
         messages.success(request, 'Enrollment resumed')
@@ -372,12 +363,63 @@ class EmailLogDetailView(CommercialRequiredMixin, DetailView):
     model = EmailLog
     context_object_name = 'email_log'
     
+    def get_object(self, queryset=None):
+        # Old logs live in the archive table under the same id
+        if not hasattr(self, '_email_log'):
+            pk = self.kwargs['pk']
+            self._email_log = (
+                EmailLog.objects.select_related('body').filter(pk=pk).first()
+                or get_object_or_404(ArchivedEmailLog.objects.select_related('body'), pk=pk)
+            )
+        return self._email_log
+    
     def test_func(self):
         email_log = self.get_object()
         return (self.request.user.is_admin() or 
                 email_log.sent_by == self.request.user)
 
 
+# Engagement tracking (public endpoints: requests carry signed tokens, not a session)
+class TrackOpenView(View):
+    """Tracking pixel: record an open and return a 1x1 GIF."""
+    
+    def get(self, request, token):
+        log_id = read_tracking_token(token)
+        if log_id is not None:
+            engagement_events.add(OPEN, log_id)
+        response = HttpResponse(PIXEL, content_type='image/gif')
+        response['Cache-Control'] = 'no-store, private'
+        return response
+
+
+class TrackClickView(View):
+    """Record a click and redirect to the original link."""
+    
+    def get(self, request, token):
+        click = read_click_token(token)
+        if click is None:
+            raise Http404('Unknown link')
+        log_id, url = click
+        engagement_events.add(CLICK, log_id)
+        return HttpResponseRedirect(url)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EngagementWebhookView(View):
+    """Ingest open/click/reply/bounce events posted by the mail provider."""
+    
+    def post(self, request):
+        secret = settings.EMAIL_WEBHOOK_SECRET
+        if not secret or not hmac.compare_digest(request.headers.get('X-Webhook-Secret', ''), secret):
+            return JsonResponse({'error': 'Not authorized'}, status=403)
+        try:
+            events = parse_webhook_events(json.loads(request.body))
+        except (ValueError, OverflowError, OSError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        for event, log_id, at in events:
+            engagement_events.add(event, log_id, at)
+        return JsonResponse({'accepted': len(events)}, status=202)
+
 # Import timezone and timedelta for enrollment views
 from django.utils import timezone
 from datetime import timedelta
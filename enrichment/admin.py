@@ -2,14 +2,23 @@
 Django admin configuration for enrichment.
 """
 from django.contrib import admin
-from .models import ImportJob
+from .models import ImportJob, ColumnMapping
 
 
 @admin.register(ImportJob)
 class ImportJobAdmin(admin.ModelAdmin):
     """Import job admin."""
     
-    list_display = ('name', 'status', 'total_rows', 'imported_rows', 'failed_rows', 'created_at')
-    list_filter = ('status', 'created_at')
+    list_display = ('name', 'status', 'strategy', 'total_rows', 'imported_rows', 'updated_rows', 'failed_rows', 'created_at')
+    list_filter = ('status', 'strategy', 'created_at')
     search_fields = ('name', 'owner__email')
-    readonly_fields = ('created_at', 'started_at', 'completed_at', 'errors')
+    readonly_fields = ('created_at', 'started_at', 'completed_at', 'error_message', 'error_file')
+
+
+@admin.register(ColumnMapping)
+class ColumnMappingAdmin(admin.ModelAdmin):
+    """Column mapping admin."""
+    
+    list_display = ('source', 'created_by', 'updated_at')
+    search_fields = ('source',)
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,206 @@
+"""
+Benchmark the prospect import pipeline.
+
+Usage:
+  python manage.py benchmark_import                         # 10k, 100k and 1M rows
+  python manage.py benchmark_import --rows 10000 --error-rate 0.05
+  python manage.py benchmark_import --strategy update --output benchmarks/import.json
+
+Generates synthetic CSV files with Faker (same generator as ``seed_demo``),
+runs them through ``ProspectService.import_from_file`` with an error report
+and records rows/sec, queries per row, peak RSS and database size growth.
+Results are written as JSON so runs can be compared across releases.
+
+Run it against a scratch database: benchmark prospects use the
+``@bench.example.com`` domain and are deleted after each run unless --keep
+is given.
+"""
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from faker import Faker
+
+from django.contrib.auth import get_user_model
+from accounts.models import AuditLog
+from crm.models import Prospect
+from crm.services import ProspectService, IMPORT_CHUNK_SIZE
+from enrichment.models import ImportJob
+from enrichment.services import ImportErrorReport
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+User = get_user_model()
+faker = Faker()
+
+BENCH_DOMAIN = 'bench.example.com'
+CSV_COLUMNS = ['name', 'email', 'country', 'city', 'type_of_establishment', 'website', 'contact_name', 'contact_role', 'phone']
+
+
+class QueryCounter:
+    """Count queries through ``connection.execute_wrapper`` (works with DEBUG=False)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if os.uname().sysname == 'Darwin' else 1024
+    return round(usage / divisor, 1)
+
+
+def database_size():
+    """Return the current database size in bytes (None for unsupported backends)."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA page_count')
+            page_count = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            return page_count * cursor.fetchone()[0]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_database_size(current_database())')
+            return cursor.fetchone()[0]
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark prospect imports with synthetic CSV files and store the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000], help='Row counts to benchmark')
+        parser.add_argument('--duplicate-rate', type=float, default=0.05, help='Share of rows repeating an earlier email (0-1)')
+        parser.add_argument('--error-rate', type=float, default=0.01, help='Share of rows missing a required field (0-1)')
+        parser.add_argument('--strategy', choices=[choice for choice, _ in ImportJob.STRATEGY_CHOICES], default=ImportJob.SKIP)
+        parser.add_argument('--owner', help='Email of the user that owns imported prospects')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible files')
+        parser.add_argument('--output', help='JSON output path (default: benchmarks/import-<timestamp>.json)')
+        parser.add_argument('--keep', action='store_true', help='Keep benchmark prospects instead of deleting them')
+
+    def handle(self, *args, **options):
+        for option in ('duplicate_rate', 'error_rate'):
+            if not 0 <= options[option] <= 1:
+                raise CommandError(f'--{option.replace("_", "-")} must be between 0 and 1')
+
+        owner = None
+        if options['owner']:
+            owner = User.objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f'No user with email {options["owner"]}')
+
+        random.seed(options['seed'])
+        Faker.seed(options['seed'])
+
+        runs = []
+        for rows in options['rows']:
+            self.stdout.write(self.style.NOTICE(f'Generating {rows} rows...'))
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as tmp:
+                path = tmp.name
+            try:
+                self._write_csv(path, rows, options['duplicate_rate'], options['error_rate'])
+                self.stdout.write(self.style.NOTICE(f'Importing {rows} rows ({options["strategy"]})...'))
+                run = self._run(path, rows, owner, options['strategy'])
+            finally:
+                os.remove(path)
+                if not options['keep']:
+                    self._cleanup()
+
+            run.update({'duplicate_rate': options['duplicate_rate'], 'error_rate': options['error_rate']})
+            runs.append(run)
+            self.stdout.write(self.style.SUCCESS(
+                f"{rows} rows: {run['rows_per_sec']} rows/s, {run['queries_per_row']} queries/row, "
+                f"peak RSS {run['peak_rss_mb']} MB, DB +{run['db_size_growth_bytes']} bytes"
+            ))
+
+        output = Path(options['output'] or settings.BASE_DIR / 'benchmarks' / f'import-{timezone.now():%Y%m%d-%H%M%S}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'benchmark': 'import',
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'chunk_size': IMPORT_CHUNK_SIZE,
+            'strategy': options['strategy'],
+            'seed': options['seed'],
+            'runs': runs,
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def _write_csv(self, path, rows, duplicate_rate, error_rate):
+        """Write ``rows`` synthetic prospects; some repeat earlier emails, some miss required fields."""
+        establishments = [choice for choice, _ in Prospect.ESTABLISHMENT_CHOICES]
+        countries = list(settings.COUNTRIES.keys())
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for i in range(rows):
+                if i and random.random() < duplicate_rate:
+                    email = f'school{random.randrange(i)}@{BENCH_DOMAIN}'
+                else:
+                    email = f'school{i}@{BENCH_DOMAIN}'
+                row = [
+                    faker.company() + ' Academy',
+                    email,
+                    random.choice(countries),
+                    faker.city(),
+                    random.choice(establishments),
+                    faker.url(),
+                    faker.name(),
+                    faker.job(),
+                    faker.phone_number()[:20],
+                ]
+                if random.random() < error_rate:
+                    row[random.choice([0, 1, 2])] = ''
+                writer.writerow(row)
+
+    def _run(self, path, rows, owner, strategy):
+        counter = QueryCounter()
+        size_before = database_size()
+        report = ImportErrorReport()
+        try:
+            with open(path, 'rb') as f, connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                result = ProspectService.import_from_file(owner, f, owner=owner, strategy=strategy, error_report=report)
+                elapsed = time.perf_counter() - started
+        finally:
+            report.close()
+        size_after = database_size()
+
+        return {
+            'rows': rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+            'queries': counter.count,
+            'queries_per_row': round(counter.count / rows, 3) if rows else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'db_size_growth_bytes': size_after - size_before if size_before is not None and size_after is not None else None,
+            'imported': result['imported'],
+            'updated': result['updated'],
+            'skipped': result['skipped'],
+            'failed': result['failed'],
+        }
+
+    def _cleanup(self):
+        prospects = Prospect.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        AuditLog.objects.filter(content_type='Prospect', object_id__in=prospects.values('pk')).delete()
+        deleted, _ = prospects.delete()
+        if deleted:
+            self.stdout.write(self.style.WARNING(f'Removed {deleted} benchmark records'))
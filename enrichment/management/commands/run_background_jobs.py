@@ -1,10 +1,17 @@
+import logging
+
 from django.core.management.base import BaseCommand
+from analytics.rollups import refresh_pending_days
 from enrichment.models import ImportJob
-from enrichment.services import get_import_job_status
-from crm.services import ProspectService
-from emails.models import EmailLog
+from enrichment.services import process_import_job
+from emails.services import send_due_emails, SEND_BATCH_SIZE
 import time
 
+logger = logging.getLogger('edu_expand')
+
+# Send batches per tick, so a large backlog cannot starve imports and rollups
+EMAIL_MAX_BATCHES = 10
+
 
 class Command(BaseCommand):
     help = 'Run background jobs: process pending import jobs and send scheduled emails (simple loop)'
@@ -12,6 +19,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--once', action='store_true', help='Run one iteration and exit')
         parser.add_argument('--sleep', type=int, default=5, help='Seconds to sleep between iterations')
+        parser.add_argument('--email-batch-size', type=int, default=SEND_BATCH_SIZE, help='Enrollments claimed per send batch')
+        parser.add_argument('--email-max-batches', type=int, default=EMAIL_MAX_BATCHES, help='Send batches per iteration at most')
 
     def handle(self, *args, **options):
         once = options.get('once')
@@ -22,26 +31,28 @@ class Command(BaseCommand):
                 # Process pending import jobs
                 pending = ImportJob.objects.filter(status=ImportJob.PENDING)
                 for job in pending:
-                    try:
-                        self.stdout.write(f'Processing ImportJob {job.pk} ({job.name})')
-                        job.status = ImportJob.RUNNING
-                        job.save()
-                        # Open file and use service to import
-                        f = job.file.open('rb')
-                        result = ProspectService.import_from_file(job.owner, f, owner=job.owner)
-                        job.total_rows = result.get('imported', 0) + result.get('failed', 0)
-                        job.imported_rows = result.get('imported', 0)
-                        job.failed_rows = result.get('failed', 0)
-                        job.errors = {'errors': result.get('errors', [])[:100]}
-                        job.status = ImportJob.DONE
-                        job.save()
-                    except Exception as e:
-                        job.status = ImportJob.FAILED
-                        job.errors = {'errors': [str(e)]}
-                        job.save()
-
-                # Placeholder: process scheduled emails (not sending real mail here)
-                # This could be expanded to enqueue real SMTP sends or integrate with a provider.
+                    self.stdout.write(f'Processing ImportJob {job.pk} ({job.name})')
+                    process_import_job(job)
+
+                # Rebuild rollup days left behind by imports and other bulk writes
+                days = refresh_pending_days()
+                if days:
+                    self.stdout.write(f'Rollups: rebuilt {days} days')
+
+                # Send due sequence emails; keep going while batches come back full, up to the per-tick cap
+                try:
+                    for _batch in range(options['email_max_batches']):
+                        result = send_due_emails(batch_size=options['email_batch_size'])
+                        if result['claimed']:
+                            self.stdout.write(
+                                f"Emails: {result['sent']} sent, {result['failed']} failed, "
+                                f"{result['rescheduled']} rescheduled, {result['throttled']} throttled, {result['stopped']} stopped, {result['completed']} enrollments completed"
+                            )
+                        if result['claimed'] < options['email_batch_size']:
+                            break
+                except Exception:
+                    # One bad tick (e.g. the mail server is down) must not stop imports and rollups
+                    logger.exception('Sending sequence emails failed')
 
                 if once:
                     break
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrichment', '0004_alter_importjob_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='skipped_rows',
+            field=models.PositiveIntegerField(default=0, verbose_name='skipped rows'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='strategy',
+            field=models.CharField(choices=[('skip', 'Skip existing prospects'), ('update', 'Update changed fields'), ('fill_blanks', 'Fill blank fields only')], default='skip', max_length=20, verbose_name='existing prospects'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_rows',
+            field=models.PositiveIntegerField(default=0, verbose_name='updated rows'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrichment', '0005_importjob_strategy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColumnMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, unique=True, verbose_name='source')),
+                ('mapping', models.JSONField(blank=True, default=dict, help_text='e.g., {"School Name": "name", "E-mail": "email", "Country Code": "country"}', verbose_name='column mapping')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='column_mappings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['source'],
+            },
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='column_mapping',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='enrichment.columnmapping'),
+        ),
+    ]
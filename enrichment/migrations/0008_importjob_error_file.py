@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+def copy_errors_to_message(apps, schema_editor):
+    """Keep the error lines of existing jobs: ``errors`` held ``{"errors": [...]}``."""
+    ImportJob = apps.get_model('enrichment', 'ImportJob')
+    jobs = []
+    for job in ImportJob.objects.only('pk', 'errors').iterator():
+        errors = job.errors
+        if isinstance(errors, dict):
+            errors = errors.get('errors', [])
+        if not errors:
+            continue
+        job.error_message = '\n'.join(str(error) for error in errors) if isinstance(errors, list) else str(errors)
+        jobs.append(job)
+    ImportJob.objects.bulk_update(jobs, ['error_message'], batch_size=500)
+
+
+def copy_message_to_errors(apps, schema_editor):
+    ImportJob = apps.get_model('enrichment', 'ImportJob')
+    jobs = []
+    for job in ImportJob.objects.exclude(error_message='').only('pk', 'error_message').iterator():
+        job.errors = {'errors': job.error_message.splitlines()}
+        jobs.append(job)
+    ImportJob.objects.bulk_update(jobs, ['errors'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrichment', '0007_importjob_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='error_file',
+            field=models.FileField(blank=True, upload_to='imports/errors/', verbose_name='rejected rows'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='error message'),
+        ),
+        migrations.RunPython(copy_errors_to_message, copy_message_to_errors),
+        migrations.RemoveField(
+            model_name='importjob',
+            name='errors',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_duplicate_hashes(apps, schema_editor):
+    """Keep the hash only on the newest of any live jobs stored twice by concurrent uploads."""
+    ImportJob = apps.get_model('enrichment', 'ImportJob')
+    seen = set()
+    jobs = ImportJob.objects.exclude(status='failed').exclude(content_hash='').order_by('-created_at', '-pk')
+    for job in jobs.only('pk', 'owner_id', 'content_hash', 'strategy', 'column_mapping_id').iterator():
+        key = (job.owner_id, job.content_hash, job.strategy, job.column_mapping_id)
+        if key in seen:
+            ImportJob.objects.filter(pk=job.pk).update(content_hash='')
+        seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrichment', '0008_importjob_error_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='importjob',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('status', 'failed'), _negated=True), models.Q(('content_hash', ''), _negated=True), ('column_mapping__isnull', False)), fields=('owner', 'content_hash', 'strategy', 'column_mapping'), name='importjob_unique_upload_mapped'),
+        ),
+        migrations.AddConstraint(
+            model_name='importjob',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('status', 'failed'), _negated=True), models.Q(('content_hash', ''), _negated=True), ('column_mapping__isnull', True)), fields=('owner', 'content_hash', 'strategy'), name='importjob_unique_upload'),
+        ),
+    ]
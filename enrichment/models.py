@@ -6,6 +6,33 @@ from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
 
+class ColumnMapping(models.Model):
+    """Saved column mapping for an enrichment source (vendor file layout)."""
+
+    source = models.CharField(_('source'), max_length=100, unique=True)
+    mapping = models.JSONField(
+        _('column mapping'),
+        default=dict,
+        blank=True,
+        help_text=_('e.g., {"School Name": "name", "E-mail": "email", "Country Code": "country"}')
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='column_mappings'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['source']
+
+    def __str__(self):
+        return self.source
+
+
 class ImportJob(models.Model):
     """Track CSV import jobs."""
     # Status constants
@@ -21,6 +48,17 @@ class ImportJob(models.Model):
         (FAILED, _('Failed')),
     ]
 
+    # Strategies for rows whose email already exists
+    SKIP = 'skip'
+    UPDATE = 'update'
+    FILL_BLANKS = 'fill_blanks'
+
+    STRATEGY_CHOICES = [
+        (SKIP, _('Skip existing prospects')),
+        (UPDATE, _('Update changed fields')),
+        (FILL_BLANKS, _('Fill blank fields only')),
+    ]
+
     name = models.CharField(_('import name'), max_length=255)
     status = models.CharField(
         _('status'),
@@ -29,10 +67,27 @@ class ImportJob(models.Model):
         default=PENDING,
     )
     file = models.FileField(_('CSV file'), upload_to='imports/')
+    content_hash = models.CharField(_('content hash'), max_length=64, blank=True, db_index=True)
+    column_mapping = models.ForeignKey(
+        ColumnMapping,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs'
+    )
+    strategy = models.CharField(
+        _('existing prospects'),
+        max_length=20,
+        choices=STRATEGY_CHOICES,
+        default=SKIP,
+    )
     total_rows = models.PositiveIntegerField(_('total rows'), default=0)
     imported_rows = models.PositiveIntegerField(_('imported rows'), default=0)
+    updated_rows = models.PositiveIntegerField(_('updated rows'), default=0)
+    skipped_rows = models.PositiveIntegerField(_('skipped rows'), default=0)
     failed_rows = models.PositiveIntegerField(_('failed rows'), default=0)
-    errors = models.JSONField(_('errors'), default=dict, blank=True)
+    error_message = models.TextField(_('error message'), blank=True)
+    error_file = models.FileField(_('rejected rows'), upload_to='imports/errors/', blank=True)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -46,6 +101,36 @@ class ImportJob(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One live job per uploaded content (see enrichment.services.store_import_upload).
+            # NULLs never collide in a unique index, hence a separate constraint without a mapping.
+            models.UniqueConstraint(
+                fields=['owner', 'content_hash', 'strategy', 'column_mapping'],
+                condition=~models.Q(status='failed') & ~models.Q(content_hash='') & models.Q(column_mapping__isnull=False),
+                name='importjob_unique_upload_mapped',
+            ),
+            models.UniqueConstraint(
+                fields=['owner', 'content_hash', 'strategy'],
+                condition=~models.Q(status='failed') & ~models.Q(content_hash='') & models.Q(column_mapping__isnull=True),
+                name='importjob_unique_upload',
+            ),
+        ]
     
     def __str__(self):
         return self.name
+
+    def get_column_mapping(self):
+        """Return the saved ``{source column: prospect field}`` dict, or None."""
+        return self.column_mapping.mapping if self.column_mapping_id else None
+
+    def record_result(self, result):
+        """Copy counters from an ``import_from_file`` result dict and mark the job done."""
+        self.imported_rows = result.get('imported', 0)
+        self.updated_rows = result.get('updated', 0)
+        self.skipped_rows = result.get('skipped', 0)
+        self.failed_rows = result.get('failed', 0)
+        self.total_rows = self.imported_rows + self.updated_rows + self.skipped_rows + self.failed_rows
+        # Per-row errors live in ``error_file``; only file-level errors are kept here
+        self.error_message = '\n'.join(result.get('errors', []))
+        self.status = ImportJob.DONE
+        self.save()
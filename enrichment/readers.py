@@ -0,0 +1,121 @@
+"""
+Import file readers.
+
+Each reader turns an uploaded file into batches of ``{column: str}`` dicts so the
+import pipeline never needs the whole file in memory. Readers are looked up by
+file extension; register new formats in ``READERS``.
+
+openpyxl (XLSX) and pyarrow (Parquet) are imported lazily so CSV imports keep
+working on installs that do not have them.
+"""
+import csv
+import io
+import os
+
+
+def _cell_to_str(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store phone numbers and ids as floats
+        return str(int(value))
+    return str(value)
+
+
+class BaseReader:
+    """Interface for import readers."""
+
+    extensions = ()
+
+    def iter_batches(self, file_obj, batch_size):
+        """Yield lists of at most ``batch_size`` row dicts."""
+        raise NotImplementedError
+
+
+class CSVReader(BaseReader):
+    extensions = ('.csv',)
+
+    def iter_batches(self, file_obj, batch_size):
+        file_obj.seek(0)
+        reader = csv.DictReader(io.TextIOWrapper(file_obj, encoding='utf-8'))
+        batch = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class XLSXReader(BaseReader):
+    """Read the first worksheet; the first row holds the column names."""
+
+    extensions = ('.xlsx',)
+
+    def iter_batches(self, file_obj, batch_size):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError('XLSX import requires the openpyxl package')
+
+        file_obj.seek(0)
+        # read_only streams rows from the zip instead of building the full sheet
+        workbook = load_workbook(file_obj, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [_cell_to_str(cell).strip() for cell in next(rows, ())]
+            batch = []
+            for values in rows:
+                if not any(value is not None for value in values):
+                    continue
+                batch.append({column: _cell_to_str(value) for column, value in zip(header, values) if column})
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            workbook.close()
+
+
+class ParquetReader(BaseReader):
+    extensions = ('.parquet',)
+
+    def iter_batches(self, file_obj, batch_size):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('Parquet import requires the pyarrow package')
+
+        file_obj.seek(0)
+        parquet_file = pq.ParquetFile(file_obj)
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield [
+                {column: _cell_to_str(value) for column, value in row.items()}
+                for row in record_batch.to_pylist()
+            ]
+
+
+READERS = {
+    extension: reader_class
+    for reader_class in (CSVReader, XLSXReader, ParquetReader)
+    for extension in reader_class.extensions
+}
+
+
+def get_reader(filename):
+    """Return a reader instance for ``filename``; files without an extension are read as CSV."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if not extension:
+        return CSVReader()
+    if extension not in READERS:
+        raise ValueError(f'Unsupported file type: {extension}')
+    return READERS[extension]()
+
+
+def apply_column_mapping(row, mapping):
+    """Rename source columns to Prospect field names; unmapped columns pass through."""
+    if not mapping:
+        return row
+    return {mapping.get(column, column): value for column, value in row.items()}
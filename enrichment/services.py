@@ -3,11 +3,92 @@ Enrichment service helpers (import job status, import processing helpers).
 
 Keep lightweight logic for demo; production would move heavy processing to background workers.
 """
+import csv
+import hashlib
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
+from crm.services import ProspectService
 from .models import ImportJob
 
 
+class _HashingUpload(File):
+    """Wrap an upload so storage writes it chunk by chunk while we hash and size-check it.
+
+    Deliberately has no ``temporary_file_path`` so FileSystemStorage copies via
+    ``chunks()`` instead of moving the temp file behind our back. Once the size
+    cap is passed it stops yielding and sets ``too_large`` rather than raising,
+    so storage finishes the (truncated) file and reports its name for deletion.
+    """
+
+    def __init__(self, upload, max_size):
+        super().__init__(upload, name=upload.name)
+        self.max_size = max_size
+        self.bytes_read = 0
+        self.too_large = False
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self.max_size:
+                self.too_large = True
+                return
+            self.sha256.update(chunk)
+            yield chunk
+
+
+def store_import_upload(upload, **job_fields):
+    """Stream an uploaded import file to storage and return ``(job, created)``.
+
+    The file is hashed while it is written. If the same owner already has a job
+    for identical content with the same strategy and column mapping (and it did
+    not fail), the new copy is discarded and that job is returned instead. The
+    ``importjob_unique_upload*`` constraints make this hold for concurrent
+    uploads too.
+    """
+    max_size = settings.IMPORT_MAX_UPLOAD_SIZE
+    too_large = f'File exceeds the {max_size // (1024 * 1024)} MB import limit'
+    if upload.size is not None and upload.size > max_size:
+        raise ValueError(too_large)
+
+    job = ImportJob(name=upload.name, **job_fields)
+    content = _HashingUpload(upload, max_size)
+    job.file.save(upload.name, content, save=False)
+    if content.too_large:
+        job.file.delete(save=False)
+        raise ValueError(too_large)
+    job.content_hash = content.sha256.hexdigest()
+
+    duplicates = ImportJob.objects.filter(
+        content_hash=job.content_hash,
+        owner=job.owner,
+        strategy=job.strategy,
+        column_mapping=job.column_mapping,
+    ).exclude(status=ImportJob.FAILED)
+    existing = duplicates.first()
+    if existing is None:
+        try:
+            with transaction.atomic():
+                job.save()
+            return job, True
+        except IntegrityError:
+            # An identical upload was stored between our check and insert
+            existing = duplicates.first()
+            if existing is None:
+                job.file.delete(save=False)
+                raise
+
+    job.file.delete(save=False)
+    return existing, False
+
+
 def get_import_job_status(user, import_job_id):
     """Return a dict with import job status for API consumption.
 
@@ -27,10 +108,73 @@ def get_import_job_status(user, import_job_id):
         'name': job.name,
         'status': job.status,
         'total_rows': job.total_rows,
+        'strategy': job.strategy,
         'imported_rows': job.imported_rows,
+        'updated_rows': job.updated_rows,
+        'skipped_rows': job.skipped_rows,
         'failed_rows': job.failed_rows,
-        'errors': job.errors,
+        'error_message': job.error_message,
+        'error_report_url': reverse('enrichment:import_job_errors', args=[job.pk]) if job.error_file else None,
         'created_at': job.created_at.isoformat() if job.created_at else None,
         'started_at': job.started_at.isoformat() if job.started_at else None,
         'completed_at': job.completed_at.isoformat() if job.completed_at else None,
     }
+
+
+class ImportErrorReport:
+    """Collect rejected import rows in a CSV as the import runs.
+
+    Each line holds the source row number, the reason and the original columns,
+    so the file can be fixed and uploaded again (the extra ``row``/``reason``
+    columns are ignored by the importer). Rows are written to a temporary file,
+    not kept in memory.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._file = tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8')
+        self._writer = None
+
+    def add(self, row_num, row, reason):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=['row', 'reason'] + list(row), extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow({**row, 'row': row_num, 'reason': reason})
+        self.count += 1
+
+    def save_to(self, job):
+        """Attach the report to ``job.error_file`` (no-op when nothing was rejected)."""
+        if not self.count:
+            return
+        self._file.seek(0)
+        job.error_file.save(f'import_{job.pk}_errors.csv', File(self._file), save=False)
+
+    def close(self):
+        self._file.close()
+
+
+def process_import_job(job, user=None):
+    """Run the import for a stored ImportJob and record counters and the error report."""
+    job.status = ImportJob.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    report = ImportErrorReport()
+    try:
+        with job.file.open('rb') as file_obj:
+            result = ProspectService.import_from_file(
+                user or job.owner, file_obj, owner=job.owner, strategy=job.strategy,
+                column_mapping=job.get_column_mapping(), error_report=report,
+            )
+        report.save_to(job)
+        job.completed_at = timezone.now()
+        job.record_result(result)
+    except Exception as e:
+        job.status = ImportJob.FAILED
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save()
+        result = None
+    finally:
+        report.close()
+    return result
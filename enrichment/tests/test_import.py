@@ -1,6 +1,17 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from accounts.models import User
-from enrichment.models import ImportJob
+from crm.models import Prospect
+from crm.services import ProspectService
+from enrichment.models import ImportJob, ColumnMapping
+from enrichment.readers import get_reader
+from enrichment.services import store_import_upload, process_import_job
 
 
 class EnrichmentImportTests(TestCase):
@@ -11,3 +22,97 @@ class EnrichmentImportTests(TestCase):
         job = ImportJob.objects.create(owner=self.user, status=ImportJob.PENDING, total_rows=0)
         self.assertEqual(job.status, ImportJob.PENDING)
         self.assertEqual(job.owner, self.user)
+
+
+class ImportReaderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='reader@test.com', username='reader@test.com', role=User.COMMERCIAL)
+
+    def test_xlsx_import_with_column_mapping(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['School Name', 'E-mail', 'Country Code', 'Phone'])
+        sheet.append(['Xlsx Academy', 'xlsx@school.com', 'EG', 201001234567])
+        file_obj = io.BytesIO()
+        workbook.save(file_obj)
+        file_obj.name = 'vendor.xlsx'
+
+        mapping = ColumnMapping.objects.create(source='vendor', mapping={'School Name': 'name', 'E-mail': 'email', 'Country Code': 'country', 'Phone': 'phone'})
+        result = ProspectService.import_from_file(self.user, file_obj, owner=self.user, column_mapping=mapping.mapping)
+
+        self.assertEqual(result['imported'], 1)
+        prospect = Prospect.objects.get(email='xlsx@school.com')
+        self.assertEqual((prospect.name, prospect.country, prospect.phone), ('Xlsx Academy', 'EG', '201001234567'))
+
+    def test_parquet_reader_yields_batches(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({'name': [f'School {i}' for i in range(5)], 'email': [f's{i}@school.com' for i in range(5)]})
+        file_obj = io.BytesIO()
+        pq.write_table(table, file_obj)
+
+        batches = list(get_reader('vendor.parquet').iter_batches(file_obj, 2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[0][0], {'name': 'School 0', 'email': 's0@school.com'})
+
+
+class ImportUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='upload@test.com', username='upload@test.com', role=User.COMMERCIAL)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def _upload(self, content=b'name,email,country\nA,a@school.com,NG\n'):
+        return SimpleUploadedFile('schools.csv', content, content_type='text/csv')
+
+    def test_identical_upload_reuses_job(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job, created = store_import_upload(self._upload(), owner=self.user)
+            self.assertTrue(created)
+            self.assertEqual(len(job.content_hash), 64)
+
+            again, created = store_import_upload(self._upload(), owner=self.user)
+            self.assertFalse(created)
+            self.assertEqual(again.pk, job.pk)
+            self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'imports'))), 1)
+
+            other, created = store_import_upload(self._upload(b'name,email,country\nB,b@school.com,EG\n'), owner=self.user)
+            self.assertTrue(created)
+
+    def test_rejected_rows_written_to_error_file(self):
+        content = b'name,email,country,city\nGood,good@school.com,NG,Lagos\nNo Email,,EG,Cairo\n'
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job, _ = store_import_upload(self._upload(content), owner=self.user)
+            process_import_job(job)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.imported_rows, job.failed_rows), (ImportJob.DONE, 1, 1))
+
+            with job.error_file.open('r') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['row'], rows[0]['name'], rows[0]['city']), ('3', 'No Email', 'Cairo'))
+        self.assertIn('email', rows[0]['reason'])
+
+    def test_upload_size_cap(self):
+        with override_settings(MEDIA_ROOT=self.media_root, IMPORT_MAX_UPLOAD_SIZE=10):
+            with self.assertRaises(ValueError):
+                store_import_upload(self._upload(), owner=self.user)
+            # Without a declared size the cap is hit while streaming; the partial file is removed
+            upload = self._upload()
+            upload.size = None
+            with self.assertRaises(ValueError):
+                store_import_upload(upload, owner=self.user)
+        self.assertFalse(ImportJob.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'imports')), [])
+
+    def test_concurrent_identical_upload_reuses_job(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job, _ = store_import_upload(self._upload(), owner=self.user)
+            # Simulate a second request that passed the duplicate check before the first job was saved
+            with mock.patch('django.db.models.query.QuerySet.first', side_effect=[None, job]):
+                again, created = store_import_upload(self._upload(), owner=self.user)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(ImportJob.objects.count(), 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'imports'))), 1)
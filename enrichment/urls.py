@@ -11,5 +11,6 @@ urlpatterns = [
     path('import/', views.ProspectImportView.as_view(), name='prospect_import'),
     path('import-jobs/', views.ImportJobListView.as_view(), name='import_job_list'),
     path('import-jobs/<int:pk>/', views.ImportJobDetailView.as_view(), name='import_job_detail'),
+    path('import-jobs/<int:pk>/errors.csv', views.ImportJobErrorReportView.as_view(), name='import_job_errors'),
     path('api/import-jobs/<int:pk>/status/', api.ImportJobStatusAPI.as_view(), name='api_import_job_status'),
 ]
@@ -1,13 +1,11 @@
 """
 Enrichment and data import views.
 """
-import csv
-import io
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import View, ListView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, FileResponse, Http404
 
 from accounts.models import AuditLog
 from crm.models import Prospect
@@ -65,3 +63,15 @@ class ImportJobDetailView(CommercialRequiredMixin, DetailView):
         job = self.get_object()
         return (self.request.user.is_admin() or 
                 job.owner == self.request.user)
+
+
+class ImportJobErrorReportView(CommercialRequiredMixin, View):
+    """Download the rejected rows of an import job as CSV."""
+    
+    def get(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        if not (request.user.is_admin() or job.owner == request.user):
+            return HttpResponseForbidden()
+        if not job.error_file:
+            raise Http404('No rejected rows for this import')
+        return FileResponse(job.error_file.open('rb'), as_attachment=True, filename=f'{job.name}.errors.csv')